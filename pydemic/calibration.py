@@ -0,0 +1,312 @@
+"""
+A module to calibrate the model to many regions in parallel.
+
+Each region is calibrated by an `OptimizationProblem` built by a user supplied function, and the
+calibrations are scheduled over worker processes, with at most `number_of_workers` running at the
+same time. Each calibration runs in its own (non-daemonic) process, so it can use worker processes
+itself, and a calibration exceeding its timeout (or crashing) is terminated, together with its
+worker processes, without affecting the others. The results are collected in a single
+`pandas.DataFrame`, with one row per region.
+"""
+
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+from enum import Enum
+from multiprocessing.connection import wait
+from typing import Any, Callable, Sequence
+
+import attr
+import numpy as np
+import pandas as pd
+
+from pydemic.parallel import set_thread_limits
+
+
+class CalibrationStatus(Enum):
+    """
+    The outcome of the calibration of a region.
+    """
+
+    SUCCESS = "success"
+    FAILED = "failed"
+    TIMEOUT = "timeout"
+
+
+@attr.s(auto_attribs=True)
+class CalibrationResult:
+    """
+    The result of the calibration of a region.
+
+    Members
+    ----------------
+
+    :ivar region:
+        The region, as given to the runner.
+
+    :ivar CalibrationStatus status:
+        The outcome of the calibration.
+
+    :ivar numpy.ndarray x:
+        The calibrated decision variables, or None if the calibration did not finish.
+
+    :ivar float fun:
+        The objective at `x`, or NaN if the calibration did not finish.
+
+    :ivar int nfev:
+        The number of objective evaluations, if reported by the solver.
+
+    :ivar float wall_time:
+        The elapsed time of the calibration, in seconds.
+
+    :ivar str message:
+        The error traceback of failed calibrations, or the timeout description.
+    """
+
+    region: Any
+    status: CalibrationStatus
+    x: np.ndarray = None
+    fun: float = np.nan
+    nfev: int = None
+    wall_time: float = np.nan
+    message: str = ""
+
+
+def _calibrate_region(problem_builder, region, connection, threads_per_worker):
+    start_time = time.perf_counter()
+    if hasattr(os, "setpgrp"):
+        # A process group of its own, so the processes it starts are terminated with it
+        os.setpgrp()
+    try:
+        if threads_per_worker is not None:
+            set_thread_limits(threads_per_worker)
+        solution = problem_builder(region).solve_minimization()
+        nfev = getattr(solution, "nfev", None)
+        result = CalibrationResult(
+            region=region,
+            status=CalibrationStatus.SUCCESS,
+            x=np.asarray(solution.x, dtype=np.float64),
+            fun=float(np.ravel(solution.fun)[0]),
+            nfev=None if nfev is None else int(nfev),
+            wall_time=time.perf_counter() - start_time,
+        )
+    except Exception:
+        result = CalibrationResult(
+            region=region,
+            status=CalibrationStatus.FAILED,
+            wall_time=time.perf_counter() - start_time,
+            message=traceback.format_exc(),
+        )
+    connection.send(result)
+    connection.close()
+
+
+@attr.s(auto_attribs=True)
+class _RunningCalibration:
+    index: int
+    process: multiprocessing.Process
+    connection: Any
+    start_time: float
+
+
+@attr.s(auto_attribs=True)
+class CalibrationRunner:
+    """
+    Calibrates many regions in parallel, one worker process per calibration.
+
+    Members
+    ----------------
+
+    :ivar callable problem_builder:
+        A function receiving a region and returning its `OptimizationProblem`. It must be
+        picklable (e.g. a module level function) unless the start method is `"fork"`.
+
+    :ivar int number_of_workers:
+        The maximum number of calibrations running at the same time. Supply -1 to use all
+        available CPU cores.
+
+    :ivar float timeout:
+        The maximum time of each calibration, in seconds. Calibrations exceeding it are
+        terminated. If None, calibrations are not limited.
+
+    :ivar str start_method:
+        The `multiprocessing` start method (`"fork"`, `"spawn"` or `"forkserver"`). If None, the
+        platform default is used.
+
+    :ivar list parameter_names:
+        The names of the decision variables, used as the columns of the results table. If None,
+        the columns are named `x_0`, `x_1` and so on.
+
+    :ivar int threads_per_worker:
+        The thread limit of each calibration process (see `pydemic.parallel.set_thread_limits`).
+        If None, the processes keep the limits they inherit.
+    """
+
+    problem_builder: Callable
+    number_of_workers: int = -1
+    timeout: float = None
+    start_method: str = None
+    parameter_names: Sequence[str] = None
+    threads_per_worker: int = None
+
+    def __attrs_post_init__(self):
+        if self.number_of_workers == -1:
+            self.number_of_workers = os.cpu_count()
+        elif self.number_of_workers <= 0:
+            raise ValueError("Number of workers must be greater than 0, or -1 for all cores.")
+        if self.timeout is not None and self.timeout <= 0:
+            raise ValueError("Timeout must be greater than 0.")
+        if self.threads_per_worker is not None and self.threads_per_worker <= 0:
+            raise ValueError("Number of threads per worker must be greater than 0.")
+
+    def run(self, regions: Sequence) -> pd.DataFrame:
+        """
+        Calibrate the regions.
+
+        :param regions:
+            The regions to calibrate, each passed to `problem_builder`.
+
+        :return:
+            The results table, with one row per region (in the given order) and the columns
+            `region`, `status`, `fun`, `nfev`, `wall_time`, `message` and one per decision
+            variable.
+        :rtype: pandas.DataFrame
+        """
+        return calibration_results_table(self.calibrate(regions), self.parameter_names)
+
+    def calibrate(self, regions: Sequence) -> list:
+        """
+        Calibrate the regions.
+
+        :param regions:
+            The regions to calibrate, each passed to `problem_builder`.
+
+        :return:
+            The `CalibrationResult` of each region, in the given order.
+        :rtype: list
+        """
+        regions = list(regions)
+        context = multiprocessing.get_context(self.start_method)
+        results = [None] * len(regions)
+        pending_indices = list(range(len(regions)))[::-1]
+        running = {}
+        try:
+            while pending_indices or running:
+                while pending_indices and len(running) < self.number_of_workers:
+                    index = pending_indices.pop()
+                    calibration = self._start_calibration(context, index, regions[index])
+                    running[calibration.connection] = calibration
+
+                ready_connections = wait(list(running), timeout=self._time_to_next_timeout(running))
+                for connection in ready_connections:
+                    calibration = running.pop(connection)
+                    results[calibration.index] = self._finish_calibration(
+                        calibration, regions[calibration.index]
+                    )
+
+                for connection, calibration in list(running.items()):
+                    elapsed_time = time.perf_counter() - calibration.start_time
+                    if self.timeout is not None and elapsed_time >= self.timeout:
+                        self._terminate(calibration)
+                        del running[connection]
+                        results[calibration.index] = CalibrationResult(
+                            region=regions[calibration.index],
+                            status=CalibrationStatus.TIMEOUT,
+                            wall_time=elapsed_time,
+                            message=f"Calibration exceeded the timeout of {self.timeout} s.",
+                        )
+        finally:
+            for calibration in running.values():
+                self._terminate(calibration)
+        return results
+
+    def _start_calibration(self, context, index, region):
+        receiving_connection, sending_connection = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_calibrate_region,
+            args=(self.problem_builder, region, sending_connection, self.threads_per_worker),
+        )
+        start_time = time.perf_counter()
+        process.start()
+        sending_connection.close()
+        return _RunningCalibration(index, process, receiving_connection, start_time)
+
+    def _time_to_next_timeout(self, running):
+        if self.timeout is None:
+            return None
+        now = time.perf_counter()
+        return max(
+            0.0,
+            min(calibration.start_time + self.timeout - now for calibration in running.values()),
+        )
+
+    @staticmethod
+    def _finish_calibration(calibration, region):
+        try:
+            result = calibration.connection.recv()
+        except EOFError:
+            # The process exited without sending a result, e.g. it was killed or crashed
+            calibration.process.join()
+            result = CalibrationResult(
+                region=region,
+                status=CalibrationStatus.FAILED,
+                wall_time=time.perf_counter() - calibration.start_time,
+                message=f"Calibration process exited with code {calibration.process.exitcode}.",
+            )
+        calibration.connection.close()
+        calibration.process.join()
+        return result
+
+    @staticmethod
+    def _terminate(calibration):
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(calibration.process.pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                # The process group is not created yet (or is gone)
+                pass
+        calibration.process.terminate()
+        calibration.process.join()
+        calibration.connection.close()
+
+
+def calibration_results_table(results: Sequence[CalibrationResult], parameter_names=None):
+    """
+    Collect calibration results in a table.
+
+    :param results:
+        The `CalibrationResult` of each region.
+
+    :param list parameter_names:
+        The names of the decision variables. If None, they are named `x_0`, `x_1` and so on.
+
+    :return:
+        One row per region, with the columns `region`, `status`, `fun`, `nfev`, `wall_time`,
+        `message` and one per decision variable (NaN for calibrations that did not finish).
+    :rtype: pandas.DataFrame
+    """
+    number_of_decision_variables = max(
+        (len(result.x) for result in results if result.x is not None), default=0
+    )
+    if parameter_names is None:
+        parameter_names = [f"x_{i}" for i in range(number_of_decision_variables)]
+    elif results and len(parameter_names) < number_of_decision_variables:
+        raise ValueError("There must be one parameter name per decision variable.")
+
+    rows = []
+    for result in results:
+        row = {
+            "region": result.region,
+            "status": result.status.value,
+            "fun": result.fun,
+            "nfev": result.nfev,
+            "wall_time": result.wall_time,
+            "message": result.message,
+        }
+        x = result.x if result.x is not None else np.full(len(parameter_names), np.nan)
+        row.update(zip(parameter_names, x))
+        rows.append(row)
+    columns = ["region", "status", "fun", "nfev", "wall_time", "message", *parameter_names]
+    return pd.DataFrame(rows, columns=columns)
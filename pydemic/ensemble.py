@@ -0,0 +1,338 @@
+"""
+A module to integrate ensembles of compartmental model trajectories in a single ODE solve.
+
+Posterior-predictive analyses solve the same ODE system once for each parameter realization. Here,
+all realizations are stacked into one state vector (realization-major, i.e.
+``[S_1, E_1, ..., S_2, E_2, ...]``) and integrated at once. Since realizations do not interact, the
+Jacobian of the stacked system is block diagonal, which is informed to the stiff solvers as a band
+(LSODA) or as a sparsity pattern (BDF and Radau). When the diagonal blocks can be computed
+analytically (see ``ensemble_jacobian`` in `pydemic.models`), they are given to the solvers in
+the same banded or sparse formats.
+"""
+
+from typing import Callable, Sequence, Tuple, Union
+
+import attr
+import numpy as np
+from scipy.integrate import solve_ivp
+from scipy.sparse import block_diag, bsr_matrix, csr_matrix
+
+_SCIPY_STIFF_METHODS_WITH_SPARSITY = ("BDF", "Radau")
+
+
+@attr.s(auto_attribs=True)
+class EnsembleSolution:
+    """
+    Stores the trajectories of an ensemble integration.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points where the trajectories were evaluated.
+
+    :ivar numpy.ndarray y:
+        The trajectories, with shape `(number_of_realizations, number_of_compartments, len(t))`.
+
+    :ivar tuple compartments:
+        The compartment names, in state order.
+
+    :ivar bool success:
+        True if every batch was successfully integrated.
+
+    :ivar str message:
+        The solver message of the first failed batch, or of the last batch if all succeeded.
+
+    :ivar int nfev:
+        Total number of RHS evaluations (each one evaluates a whole batch).
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    compartments: tuple
+    success: bool = True
+    message: str = ""
+    nfev: int = 0
+
+    @property
+    def number_of_realizations(self):
+        return self.y.shape[0]
+
+    def get_compartment(self, compartment_name):
+        """
+        Get the trajectories of a compartment for all realizations.
+
+        :param str compartment_name:
+            The compartment name.
+
+        :return:
+            A `(number_of_realizations, len(t))` view of the trajectories.
+        :rtype: numpy.ndarray
+        """
+        if compartment_name not in self.compartments:
+            raise ValueError(f"Unknown compartment: {compartment_name}.")
+        return self.y[:, self.compartments.index(compartment_name), :]
+
+
+def build_parameter_matrix(
+    number_of_realizations: int,
+    parameter_names: Sequence[str],
+    default_parameters: dict = None,
+    **parameter_values,
+) -> np.ndarray:
+    """
+    Build a `(number_of_realizations, number_of_parameters)` parameter matrix, broadcasting scalar
+    values and filling missing parameters with defaults.
+
+    :param int number_of_realizations:
+        The number of realizations (rows).
+
+    :param parameter_names:
+        The parameter names, in column order.
+
+    :param dict default_parameters:
+        Values for the parameters not given in `parameter_values`.
+
+    :param parameter_values:
+        Scalars or arrays with length `number_of_realizations` for each parameter to set.
+
+    :return:
+        The parameter matrix.
+    :rtype: numpy.ndarray
+    """
+    if default_parameters is None:
+        default_parameters = dict()
+    unknown_parameters = set(parameter_values) - set(parameter_names)
+    if unknown_parameters:
+        raise ValueError(f"Unknown parameters: {sorted(unknown_parameters)}.")
+
+    parameters = np.empty((number_of_realizations, len(parameter_names)), dtype=np.float64)
+    for column, parameter_name in enumerate(parameter_names):
+        if parameter_name in parameter_values:
+            value = parameter_values[parameter_name]
+        elif parameter_name in default_parameters:
+            value = default_parameters[parameter_name]
+        else:
+            raise ValueError(f"Missing value for parameter {parameter_name}.")
+        parameters[:, column] = value
+    return parameters
+
+
+def ensemble_jacobian_sparsity(
+    number_of_realizations: int, number_of_compartments: int
+) -> csr_matrix:
+    """
+    The block diagonal sparsity pattern of the Jacobian of a stacked ensemble.
+
+    :param int number_of_realizations:
+        The number of stacked realizations.
+
+    :param int number_of_compartments:
+        The number of compartments of each realization.
+
+    :return:
+        The sparsity pattern.
+    :rtype: scipy.sparse.csr_matrix
+    """
+    block = np.ones((number_of_compartments, number_of_compartments))
+    return block_diag(number_of_realizations * [block], format="csr")
+
+
+def solve_ensemble(
+    ensemble_model: Callable,
+    parameters: np.ndarray,
+    initial_conditions: np.ndarray,
+    t_span: Tuple[float, float],
+    t_eval: np.ndarray = None,
+    compartments: Sequence[str] = None,
+    method: str = "LSODA",
+    rtol: float = 1e-3,
+    atol: Union[float, np.ndarray] = 1e-6,
+    realizations_per_batch: int = None,
+    ensemble_jacobian: Callable = None,
+) -> EnsembleSolution:
+    """
+    Integrate all realizations of an ensemble as a single vectorized state.
+
+    All realizations in a batch share the adaptive time steps, which are chosen by the hardest
+    realization. Limiting `realizations_per_batch` avoids that a few stiff realizations slow down
+    the whole ensemble.
+
+    :param ensemble_model:
+        A function `f(t, y, parameters)` returning the stacked derivatives, such as the
+        `ensemble_rhs` kernel of the models in `pydemic.models`.
+
+    :param numpy.ndarray parameters:
+        The `(number_of_realizations, number_of_parameters)` parameter matrix.
+
+    :param numpy.ndarray initial_conditions:
+        The `(number_of_realizations, number_of_compartments)` initial conditions. A 1D array is
+        used for all the realizations.
+
+    :param tuple t_span:
+        The integration interval.
+
+    :param numpy.ndarray t_eval:
+        Times where the trajectories are stored. If None, the solver chosen points are used, which
+        is only allowed with a single batch.
+
+    :param compartments:
+        The compartment names. Defaults to `X0, X1, ...`.
+
+    :param str method:
+        The `scipy.integrate.solve_ivp` method.
+
+    :param float rtol:
+        Relative tolerance.
+
+    :param float|numpy.ndarray atol:
+        Absolute tolerance, as a scalar or one value per compartment.
+
+    :param int realizations_per_batch:
+        The maximum number of realizations integrated together. If None, all at once.
+
+    :param ensemble_jacobian:
+        An optional function `J(t, y, parameters)` returning the diagonal blocks of the Jacobian,
+        with shape `(number_of_realizations, number_of_compartments, number_of_compartments)`,
+        used by the LSODA, BDF and Radau methods. If None, the Jacobian is approximated by
+        finite differences.
+
+    :return:
+        The ensemble trajectories.
+    :rtype: EnsembleSolution
+    """
+    parameters = np.atleast_2d(np.asarray(parameters, dtype=np.float64))
+    number_of_realizations = parameters.shape[0]
+    initial_conditions = np.asarray(initial_conditions, dtype=np.float64)
+    if initial_conditions.ndim == 1:
+        initial_conditions = np.tile(initial_conditions, (number_of_realizations, 1))
+    if initial_conditions.shape[0] != number_of_realizations:
+        raise ValueError(
+            "Initial conditions and parameters must have the same number of realizations."
+        )
+    number_of_compartments = initial_conditions.shape[1]
+
+    if compartments is None:
+        compartments = tuple(f"X{i}" for i in range(number_of_compartments))
+    compartments = tuple(compartments)
+    if len(compartments) != number_of_compartments:
+        raise ValueError("Number of compartment names and initial conditions mismatch.")
+
+    if realizations_per_batch is None:
+        realizations_per_batch = number_of_realizations
+    elif realizations_per_batch <= 0:
+        raise ValueError("Number of realizations per batch must be greater than 0.")
+    if t_eval is None and realizations_per_batch < number_of_realizations:
+        raise ValueError("t_eval is required when the ensemble is split in batches.")
+
+    atol = np.asarray(atol, dtype=np.float64)
+    if atol.ndim == 1 and atol.size != number_of_compartments:
+        raise ValueError("atol must be a scalar or have one value per compartment.")
+
+    trajectories = None
+    t = None
+    success = True
+    message = ""
+    nfev = 0
+    for batch_start in range(0, number_of_realizations, realizations_per_batch):
+        batch_slice = slice(batch_start, batch_start + realizations_per_batch)
+        batch_parameters = np.ascontiguousarray(parameters[batch_slice])
+        batch_initial_conditions = initial_conditions[batch_slice]
+        batch_size = batch_parameters.shape[0]
+
+        solution = solve_ivp(
+            fun=lambda t, y: ensemble_model(t, y, batch_parameters),
+            t_span=t_span,
+            y0=batch_initial_conditions.ravel(),
+            t_eval=t_eval,
+            method=method,
+            rtol=rtol,
+            atol=np.tile(atol, batch_size) if atol.ndim == 1 else atol,
+            **_stiff_solver_options(
+                method, batch_size, number_of_compartments, ensemble_jacobian, batch_parameters
+            ),
+        )
+        nfev += solution.nfev
+        if success:
+            message = solution.message
+        if not solution.success:
+            success = False
+
+        if trajectories is None:
+            # Without t_eval there is a single batch, stored at the solver chosen times
+            t = solution.t if t_eval is None else np.asarray(t_eval, dtype=np.float64)
+            trajectories = np.empty(
+                (number_of_realizations, number_of_compartments, t.size), dtype=np.float64
+            )
+        if solution.t.size != t.size:  # the solver stopped before the final time
+            trajectories[batch_slice] = np.nan
+            trajectories[batch_slice, :, : solution.t.size] = solution.y.reshape(
+                batch_size, number_of_compartments, -1
+            )
+        else:
+            trajectories[batch_slice] = solution.y.reshape(batch_size, number_of_compartments, -1)
+
+    return EnsembleSolution(
+        t=t,
+        y=trajectories,
+        compartments=compartments,
+        success=success,
+        message=message,
+        nfev=nfev,
+    )
+
+
+def _stiff_solver_options(
+    method, number_of_realizations, number_of_compartments, ensemble_jacobian=None, parameters=None
+):
+    if method == "LSODA":
+        bandwidth = number_of_compartments - 1
+        options = dict(lband=bandwidth, uband=bandwidth)
+        if ensemble_jacobian is not None:
+            options["jac"] = _banded_jacobian(
+                ensemble_jacobian, parameters, number_of_realizations, number_of_compartments
+            )
+        return options
+    elif method in _SCIPY_STIFF_METHODS_WITH_SPARSITY:
+        if ensemble_jacobian is not None:
+            return dict(
+                jac=_block_sparse_jacobian(ensemble_jacobian, parameters, number_of_realizations)
+            )
+        return dict(
+            jac_sparsity=ensemble_jacobian_sparsity(number_of_realizations, number_of_compartments)
+        )
+    return dict()
+
+
+def _banded_jacobian(ensemble_jacobian, parameters, number_of_realizations, number_of_compartments):
+    """
+    Wrap the diagonal blocks into the LSODA packed banded format,
+    `packed[uband + i - j, j] = J[i, j]`.
+    """
+    rows, columns = np.indices((number_of_compartments, number_of_compartments))
+    packed_rows = np.broadcast_to(
+        number_of_compartments - 1 + rows - columns,
+        (number_of_realizations, number_of_compartments, number_of_compartments),
+    )
+    packed_columns = (
+        number_of_compartments * np.arange(number_of_realizations)[:, np.newaxis, np.newaxis]
+        + columns
+    )
+    packed_shape = (2 * number_of_compartments - 1, number_of_realizations * number_of_compartments)
+
+    def jacobian(t, y):
+        packed = np.zeros(packed_shape)
+        packed[packed_rows, packed_columns] = ensemble_jacobian(t, y, parameters)
+        return packed
+
+    return jacobian
+
+
+def _block_sparse_jacobian(ensemble_jacobian, parameters, number_of_realizations):
+    block_indices = np.arange(number_of_realizations)
+    block_pointers = np.arange(number_of_realizations + 1)
+
+    def jacobian(t, y):
+        return bsr_matrix((ensemble_jacobian(t, y, parameters), block_indices, block_pointers))
+
+    return jacobian
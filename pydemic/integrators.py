@@ -0,0 +1,570 @@
+"""
+A module with compiled (Numba) ODE integrators for compartmental models.
+
+The integration loops are compiled together with the model RHS, so a whole trajectory is computed
+without returning to the Python interpreter. The RHS must be a Numba compiled function with the
+signature ``rhs(t, y, parameters)`` returning the time derivatives as a new array, and the optional
+Jacobian must follow ``jacobian(t, y, parameters)`` returning a ``(n, n)`` array.
+
+The kernels (`rk4_solve`, `dopri5_solve` and `rosenbrock23_solve`) can also be called from other
+compiled functions, e.g. least-squares objectives.
+"""
+
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Tuple
+
+import attr
+import numpy as np
+from numba import jit
+
+STATUS_SUCCESS = 0
+STATUS_MAX_STEPS_REACHED = -1
+STATUS_STEP_SIZE_TOO_SMALL = -2
+STATUS_NOT_FINITE = -3
+
+_STATUS_MESSAGES = {
+    STATUS_SUCCESS: "The solver successfully reached the end of the integration interval.",
+    STATUS_MAX_STEPS_REACHED: "Maximum number of steps reached.",
+    STATUS_STEP_SIZE_TOO_SMALL: "Required step size is less than spacing between numbers.",
+    STATUS_NOT_FINITE: "The solution is not finite.",
+}
+
+_SAFETY_FACTOR = 0.9
+_MIN_STEP_FACTOR = 0.2
+_MAX_STEP_FACTOR = 10.0
+
+
+class IntegrationMethod(Enum):
+    """
+    Available compiled integrators:
+
+    1. RK4: classic fixed-step fourth order Runge-Kutta;
+
+    2. DOPRI5: adaptive explicit Dormand-Prince 5(4) for non-stiff problems;
+
+    3. ROSENBROCK23: adaptive linearly implicit Rosenbrock 2(3) (Shampine's modified Rosenbrock,
+    as MATLAB's ode23s) for stiff problems.
+    """
+
+    RK4 = 1
+    DOPRI5 = 2
+    ROSENBROCK23 = 3
+
+
+@attr.s(auto_attribs=True)
+class IntegrationResult:
+    """
+    Stores the solution computed by a compiled integrator.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points where the solution was evaluated.
+
+    :ivar numpy.ndarray y:
+        The solution, with shape `(n, len(t))`, like `scipy.integrate.solve_ivp`.
+
+    :ivar int status:
+        The solver status. Zero means success, negative values mean failure.
+
+    :ivar int nfev:
+        Number of RHS evaluations.
+
+    :ivar int njev:
+        Number of Jacobian evaluations.
+
+    :ivar int nsteps:
+        Number of accepted steps.
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    status: int
+    nfev: int
+    njev: int = 0
+    nsteps: int = 0
+
+    @property
+    def success(self):
+        return self.status == STATUS_SUCCESS
+
+    @property
+    def message(self):
+        return _STATUS_MESSAGES[self.status]
+
+
+@jit(nopython=True)
+def _weighted_rms_norm(error, y_old, y_new, rtol, atol):
+    total = 0.0
+    n = error.shape[0]
+    for i in range(n):
+        scale = atol + rtol * max(abs(y_old[i]), abs(y_new[i]))
+        total += (error[i] / scale) ** 2
+    return np.sqrt(total / n)
+
+
+@jit(nopython=True)
+def _is_finite(y):
+    for i in range(y.shape[0]):
+        if not np.isfinite(y[i]):
+            return False
+    return True
+
+
+@jit(nopython=True)
+def _hermite_interpolation(t, t_old, h, y_old, f_old, y_new, f_new):
+    theta = (t - t_old) / h
+    theta_minus_one = theta - 1.0
+    return (
+        (1.0 - theta) * y_old
+        + theta * y_new
+        + theta
+        * theta_minus_one
+        * ((1.0 - 2.0 * theta) * (y_new - y_old) + theta_minus_one * h * f_old + theta * h * f_new)
+    )
+
+
+@jit(nopython=True)
+def _store_dense_output(y_out, t_eval, next_output, t_old, t_new, y_old, f_old, y_new, f_new):
+    h = t_new - t_old
+    while next_output < t_eval.shape[0] and t_eval[next_output] <= t_new:
+        if t_eval[next_output] == t_new:
+            y_out[:, next_output] = y_new
+        else:
+            y_out[:, next_output] = _hermite_interpolation(
+                t_eval[next_output], t_old, h, y_old, f_old, y_new, f_new
+            )
+        next_output += 1
+    return next_output
+
+
+@jit(nopython=True)
+def _initial_step(rhs, t0, y0, f0, parameters, order, rtol, atol):
+    # Hairer, Norsett and Wanner (1993), Solving Ordinary Differential Equations I, Sec. II.4
+    scale = atol + np.abs(y0) * rtol
+    d0 = np.sqrt(np.mean((y0 / scale) ** 2))
+    d1 = np.sqrt(np.mean((f0 / scale) ** 2))
+    if d0 < 1e-5 or d1 < 1e-5:
+        h0 = 1e-6
+    else:
+        h0 = 0.01 * d0 / d1
+    y1 = y0 + h0 * f0
+    f1 = rhs(t0 + h0, y1, parameters)
+    d2 = np.sqrt(np.mean(((f1 - f0) / scale) ** 2)) / h0
+    if d1 <= 1e-15 and d2 <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** (1.0 / (order + 1))
+    return min(100 * h0, h1)
+
+
+@jit(nopython=True)
+def rk4_solve(rhs, parameters, y0, t_eval, steps_per_interval):
+    """
+    Classic fourth order Runge-Kutta with a fixed number of steps between output times.
+
+    :return:
+        A tuple `(y, status, nfev)`, with `y` shaped `(n, len(t_eval))`.
+    """
+    n = y0.shape[0]
+    y_out = np.empty((n, t_eval.shape[0]))
+    y = y0.astype(np.float64)
+    y_out[:, 0] = y
+    nfev = 0
+    for output_index in range(1, t_eval.shape[0]):
+        t = t_eval[output_index - 1]
+        h = (t_eval[output_index] - t) / steps_per_interval
+        for _ in range(steps_per_interval):
+            k1 = rhs(t, y, parameters)
+            k2 = rhs(t + 0.5 * h, y + 0.5 * h * k1, parameters)
+            k3 = rhs(t + 0.5 * h, y + 0.5 * h * k2, parameters)
+            k4 = rhs(t + h, y + h * k3, parameters)
+            y = y + h / 6.0 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+            t += h
+            nfev += 4
+        if not _is_finite(y):
+            y_out[:, output_index:] = np.nan
+            return y_out, STATUS_NOT_FINITE, nfev
+        y_out[:, output_index] = y
+    return y_out, STATUS_SUCCESS, nfev
+
+
+@jit(nopython=True)
+def dopri5_solve(rhs, parameters, y0, t_eval, rtol, atol, first_step, max_step, max_steps):
+    """
+    Adaptive Dormand-Prince 5(4) with FSAL and cubic Hermite dense output at `t_eval`.
+
+    The integration goes from `t_eval[0]` to `t_eval[-1]`. A non-positive `first_step` means that
+    the initial step is estimated.
+
+    :return:
+        A tuple `(y, status, nfev, nsteps)`, with `y` shaped `(n, len(t_eval))`.
+    """
+    c2, c3, c4, c5 = 1.0 / 5.0, 3.0 / 10.0, 4.0 / 5.0, 8.0 / 9.0
+    a21 = 1.0 / 5.0
+    a31, a32 = 3.0 / 40.0, 9.0 / 40.0
+    a41, a42, a43 = 44.0 / 45.0, -56.0 / 15.0, 32.0 / 9.0
+    a51, a52, a53, a54 = 19372.0 / 6561.0, -25360.0 / 2187.0, 64448.0 / 6561.0, -212.0 / 729.0
+    a61, a62, a63 = 9017.0 / 3168.0, -355.0 / 33.0, 46732.0 / 5247.0
+    a64, a65 = 49.0 / 176.0, -5103.0 / 18656.0
+    b1, b3, b4 = 35.0 / 384.0, 500.0 / 1113.0, 125.0 / 192.0
+    b5, b6 = -2187.0 / 6784.0, 11.0 / 84.0
+    e1, e3, e4 = 71.0 / 57600.0, -71.0 / 16695.0, 71.0 / 1920.0
+    e5, e6, e7 = -17253.0 / 339200.0, 22.0 / 525.0, -1.0 / 40.0
+
+    n = y0.shape[0]
+    number_of_outputs = t_eval.shape[0]
+    y_out = np.full((n, number_of_outputs), np.nan)
+    t = t_eval[0]
+    t_final = t_eval[-1]
+    y = y0.astype(np.float64)
+    y_out[:, 0] = y
+    next_output = 1
+
+    k1 = rhs(t, y, parameters)
+    nfev = 1
+    if first_step > 0.0:
+        h = first_step
+    else:
+        h = _initial_step(rhs, t, y, k1, parameters, 4, rtol, atol)
+        nfev += 1
+    h = min(h, max_step)
+
+    nsteps = 0
+    while next_output < number_of_outputs:
+        if nsteps >= max_steps:
+            return y_out, STATUS_MAX_STEPS_REACHED, nfev, nsteps
+        min_step = 10.0 * abs(np.nextafter(t, np.inf) - t)
+        if h < min_step:
+            return y_out, STATUS_STEP_SIZE_TOO_SMALL, nfev, nsteps
+        t_new = t + h
+        if t_new >= t_final or t_final - t_new < min_step:
+            t_new = t_final
+            h = t_new - t
+
+        k2 = rhs(t + c2 * h, y + h * a21 * k1, parameters)
+        k3 = rhs(t + c3 * h, y + h * (a31 * k1 + a32 * k2), parameters)
+        k4 = rhs(t + c4 * h, y + h * (a41 * k1 + a42 * k2 + a43 * k3), parameters)
+        k5 = rhs(t + c5 * h, y + h * (a51 * k1 + a52 * k2 + a53 * k3 + a54 * k4), parameters)
+        k6 = rhs(t + h, y + h * (a61 * k1 + a62 * k2 + a63 * k3 + a64 * k4 + a65 * k5), parameters)
+        y_new = y + h * (b1 * k1 + b3 * k3 + b4 * k4 + b5 * k5 + b6 * k6)
+        k7 = rhs(t + h, y_new, parameters)
+        nfev += 6
+
+        error = h * (e1 * k1 + e3 * k3 + e4 * k4 + e5 * k5 + e6 * k6 + e7 * k7)
+        error_norm = _weighted_rms_norm(error, y, y_new, rtol, atol)
+        if not np.isfinite(error_norm):
+            if not _is_finite(y_new) and h < min_step * 1e3:
+                return y_out, STATUS_NOT_FINITE, nfev, nsteps
+            h *= _MIN_STEP_FACTOR
+            continue
+
+        if error_norm <= 1.0:
+            next_output = _store_dense_output(
+                y_out, t_eval, next_output, t, t_new, y, k1, y_new, k7
+            )
+            t = t_new
+            y = y_new
+            k1 = k7
+            nsteps += 1
+            if error_norm == 0.0:
+                factor = _MAX_STEP_FACTOR
+            else:
+                factor = min(_MAX_STEP_FACTOR, _SAFETY_FACTOR * error_norm**-0.2)
+            h = min(h * factor, max_step)
+        else:
+            h *= max(_MIN_STEP_FACTOR, _SAFETY_FACTOR * error_norm**-0.2)
+
+    return y_out, STATUS_SUCCESS, nfev, nsteps
+
+
+@jit(nopython=True)
+def _lu_factor(A):
+    n = A.shape[0]
+    LU = A.copy()
+    pivots = np.arange(n)
+    for k in range(n):
+        pivot = k
+        pivot_value = abs(LU[k, k])
+        for i in range(k + 1, n):
+            if abs(LU[i, k]) > pivot_value:
+                pivot = i
+                pivot_value = abs(LU[i, k])
+        if pivot != k:
+            for j in range(n):
+                LU[k, j], LU[pivot, j] = LU[pivot, j], LU[k, j]
+            pivots[k], pivots[pivot] = pivots[pivot], pivots[k]
+        if LU[k, k] == 0.0:
+            continue
+        for i in range(k + 1, n):
+            LU[i, k] /= LU[k, k]
+            for j in range(k + 1, n):
+                LU[i, j] -= LU[i, k] * LU[k, j]
+    return LU, pivots
+
+
+@jit(nopython=True)
+def _lu_solve(LU, pivots, b):
+    n = LU.shape[0]
+    x = np.empty(n)
+    for i in range(n):
+        x[i] = b[pivots[i]]
+    for i in range(n):
+        for j in range(i):
+            x[i] -= LU[i, j] * x[j]
+    for i in range(n - 1, -1, -1):
+        for j in range(i + 1, n):
+            x[i] -= LU[i, j] * x[j]
+        x[i] /= LU[i, i]
+    return x
+
+
+@jit(nopython=True)
+def rosenbrock23_solve(
+    rhs, jacobian, parameters, y0, t_eval, rtol, atol, first_step, max_step, max_steps
+):
+    """
+    Adaptive modified Rosenbrock 2(3) method for stiff problems.
+
+    Reference: L. F. Shampine and M. W. Reichelt, "The MATLAB ODE Suite", SIAM J. Sci. Comput.,
+    18(1), pp. 1-22, 1997. The time derivative of the RHS is approximated by finite differences.
+
+    :return:
+        A tuple `(y, status, nfev, njev, nsteps)`, with `y` shaped `(n, len(t_eval))`.
+    """
+    d = 1.0 / (2.0 + np.sqrt(2.0))
+    e32 = 6.0 + np.sqrt(2.0)
+
+    n = y0.shape[0]
+    number_of_outputs = t_eval.shape[0]
+    y_out = np.full((n, number_of_outputs), np.nan)
+    t = t_eval[0]
+    t_final = t_eval[-1]
+    y = y0.astype(np.float64)
+    y_out[:, 0] = y
+    next_output = 1
+
+    F0 = rhs(t, y, parameters)
+    nfev = 1
+    if first_step > 0.0:
+        h = first_step
+    else:
+        h = _initial_step(rhs, t, y, F0, parameters, 2, rtol, atol)
+        nfev += 1
+    h = min(h, max_step)
+
+    njev = 0
+    nsteps = 0
+    identity = np.eye(n)
+    jacobian_is_current = False
+    J = np.empty((n, n))
+    T = np.empty(n)
+    while next_output < number_of_outputs:
+        if nsteps >= max_steps:
+            return y_out, STATUS_MAX_STEPS_REACHED, nfev, njev, nsteps
+        min_step = 10.0 * abs(np.nextafter(t, np.inf) - t)
+        if h < min_step:
+            return y_out, STATUS_STEP_SIZE_TOO_SMALL, nfev, njev, nsteps
+        t_new = t + h
+        if t_new >= t_final or t_final - t_new < min_step:
+            t_new = t_final
+            h = t_new - t
+
+        if not jacobian_is_current:
+            J = jacobian(t, y, parameters)
+            delta_t = np.sqrt(np.finfo(np.float64).eps) * max(abs(t), 1.0)
+            T = (rhs(t + delta_t, y, parameters) - F0) / delta_t
+            njev += 1
+            nfev += 1
+            jacobian_is_current = True
+
+        LU, pivots = _lu_factor(identity - h * d * J)
+        k1 = _lu_solve(LU, pivots, F0 + h * d * T)
+        F1 = rhs(t + 0.5 * h, y + 0.5 * h * k1, parameters)
+        k2 = _lu_solve(LU, pivots, F1 - k1) + k1
+        y_new = y + h * k2
+        F2 = rhs(t + h, y_new, parameters)
+        k3 = _lu_solve(LU, pivots, F2 - e32 * (k2 - F1) - 2.0 * (k1 - F0) + h * d * T)
+        nfev += 2
+
+        error = h / 6.0 * (k1 - 2.0 * k2 + k3)
+        error_norm = _weighted_rms_norm(error, y, y_new, rtol, atol)
+        if not np.isfinite(error_norm):
+            if not _is_finite(y_new) and h < min_step * 1e3:
+                return y_out, STATUS_NOT_FINITE, nfev, njev, nsteps
+            h *= _MIN_STEP_FACTOR
+            continue
+
+        if error_norm <= 1.0:
+            next_output = _store_dense_output(
+                y_out, t_eval, next_output, t, t_new, y, F0, y_new, F2
+            )
+            t = t_new
+            y = y_new
+            F0 = F2
+            nsteps += 1
+            jacobian_is_current = False
+            if error_norm == 0.0:
+                factor = _MAX_STEP_FACTOR
+            else:
+                factor = min(_MAX_STEP_FACTOR, _SAFETY_FACTOR * error_norm ** (-1.0 / 3.0))
+            h = min(h * factor, max_step)
+        else:
+            h *= max(_MIN_STEP_FACTOR, _SAFETY_FACTOR * error_norm ** (-1.0 / 3.0))
+
+    return y_out, STATUS_SUCCESS, nfev, njev, nsteps
+
+
+@lru_cache(maxsize=None)
+def make_finite_difference_jacobian(rhs: Callable) -> Callable:
+    """
+    Build a compiled forward finite differences Jacobian for a compiled RHS.
+
+    The Jacobian is cached for each RHS, so the integrators compiled with it are reused.
+
+    :param rhs:
+        A Numba compiled function `rhs(t, y, parameters)`.
+
+    :return:
+        A Numba compiled function `jacobian(t, y, parameters)`.
+    """
+
+    @jit(nopython=True)
+    def finite_difference_jacobian(t, y, parameters):
+        n = y.shape[0]
+        f0 = rhs(t, y, parameters)
+        J = np.empty((n, n))
+        sqrt_eps = np.sqrt(np.finfo(np.float64).eps)
+        for j in range(n):
+            delta = sqrt_eps * max(abs(y[j]), 1.0)
+            y_perturbed = y.copy()
+            y_perturbed[j] += delta
+            J[:, j] = (rhs(t, y_perturbed, parameters) - f0) / delta
+        return J
+
+    return finite_difference_jacobian
+
+
+def integrate(
+    rhs: Callable,
+    t_span: Tuple[float, float],
+    y0: np.ndarray,
+    parameters: np.ndarray,
+    t_eval: np.ndarray = None,
+    method: IntegrationMethod = IntegrationMethod.DOPRI5,
+    jacobian: Callable = None,
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+    first_step: float = None,
+    max_step: float = np.inf,
+    max_steps: int = 100000,
+    steps_per_interval: int = 10,
+) -> IntegrationResult:
+    """
+    Integrate a compiled RHS with a compiled integrator. It mimics `scipy.integrate.solve_ivp`.
+
+    :param rhs:
+        A Numba compiled function `rhs(t, y, parameters)`.
+
+    :param tuple t_span:
+        The integration interval.
+
+    :param numpy.ndarray y0:
+        The initial conditions.
+
+    :param numpy.ndarray parameters:
+        The parameter array passed as-is to the RHS (and Jacobian).
+
+    :param numpy.ndarray t_eval:
+        Times to store the solution, within `t_span`. If None, only the interval end points.
+
+    :param IntegrationMethod method:
+        The integrator.
+
+    :param jacobian:
+        A Numba compiled function `jacobian(t, y, parameters)`, only used by implicit methods. If
+        None, a compiled finite differences Jacobian is used.
+
+    :param float rtol:
+        Relative tolerance, for adaptive methods.
+
+    :param float atol:
+        Absolute tolerance, for adaptive methods.
+
+    :param float first_step:
+        The initial step. If None, it is estimated.
+
+    :param float max_step:
+        The maximum allowed step, for adaptive methods.
+
+    :param int max_steps:
+        The maximum number of accepted steps, for adaptive methods.
+
+    :param int steps_per_interval:
+        Number of steps between consecutive `t_eval` points, for fixed-step methods.
+
+    :return:
+        The solution.
+    :rtype: IntegrationResult
+    """
+    t0, t_final = float(t_span[0]), float(t_span[1])
+    if t_final <= t0:
+        raise ValueError("Only forward integration is supported: t_span[1] must be > t_span[0].")
+    if t_eval is None:
+        t_eval = np.array([t0, t_final])
+    t_eval = np.asarray(t_eval, dtype=np.float64)
+    if t_eval.min() < t0 or t_eval.max() > t_final:
+        raise ValueError("Values in t_eval are not within t_span.")
+    if np.any(np.diff(t_eval) <= 0):
+        raise ValueError("Values in t_eval must be strictly increasing.")
+
+    # Outputs are computed over a grid starting at t0 and ending at t_final
+    starts_at_t0 = t_eval[0] == t0
+    ends_at_t_final = t_eval[-1] == t_final
+    solver_times = t_eval
+    if not starts_at_t0:
+        solver_times = np.concatenate(([t0], solver_times))
+    if not ends_at_t_final:
+        solver_times = np.concatenate((solver_times, [t_final]))
+    output_slice = slice(0 if starts_at_t0 else 1, None if ends_at_t_final else -1)
+
+    y0 = np.asarray(y0, dtype=np.float64)
+    first_step = 0.0 if first_step is None else float(first_step)
+    njev = 0
+    if method == IntegrationMethod.RK4:
+        if steps_per_interval <= 0:
+            raise ValueError("Number of steps per interval must be greater than 0.")
+        y, status, nfev = rk4_solve(rhs, parameters, y0, solver_times, int(steps_per_interval))
+        nsteps = steps_per_interval * (solver_times.size - 1)
+    elif method == IntegrationMethod.DOPRI5:
+        y, status, nfev, nsteps = dopri5_solve(
+            rhs, parameters, y0, solver_times, rtol, atol, first_step, max_step, max_steps
+        )
+    elif method == IntegrationMethod.ROSENBROCK23:
+        if jacobian is None:
+            jacobian = make_finite_difference_jacobian(rhs)
+        y, status, nfev, njev, nsteps = rosenbrock23_solve(
+            rhs,
+            jacobian,
+            parameters,
+            y0,
+            solver_times,
+            rtol,
+            atol,
+            first_step,
+            max_step,
+            max_steps,
+        )
+    else:
+        raise NotImplementedError("Unavailable integration method.")
+
+    return IntegrationResult(
+        t=t_eval,
+        y=y[:, output_slice],
+        status=int(status),
+        nfev=int(nfev),
+        njev=int(njev),
+        nsteps=int(nsteps),
+    )
@@ -1,11 +1,23 @@
 import attr
+import copy
+import os
+import pickle
+import re
+import time
 import types
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from functools import partial
 from typing import Union
 from enum import Enum
 import numpy as np
-from scipy.optimize import differential_evolution
+import scipy
+from scipy.optimize import differential_evolution, minimize
 import pygmo as pg
 
+from pydemic.parallel import BroadcastValue, WorkerPool
+from pydemic.surrogate import SurrogateModelType, create_surrogate, propose_points
+
 
 class OptimizationMethod(Enum):
     """
@@ -14,6 +26,262 @@ class OptimizationMethod(Enum):
 
     SCIPY_DE = 1
     PYGMO_DE1220 = 2
+    MULTISTART_LOCAL = 3
+    PYGMO_CMAES = 4
+    PYGMO_XNES = 5
+    PYGMO_PSO_GEN = 6
+    PYGMO_SADE = 7
+    SURROGATE = 8
+    PYGMO_BATCH_DE1220 = 9
+
+
+# The self-adaptive differential evolution methods configured by `PygmoSelfAdaptiveDESettings`
+_PYGMO_DE1220_METHODS = (OptimizationMethod.PYGMO_DE1220, OptimizationMethod.PYGMO_BATCH_DE1220)
+
+# The pygmo algorithms configured by `PygmoAlgorithmSettings`
+_PYGMO_ALGORITHMS = {
+    OptimizationMethod.PYGMO_CMAES: pg.cmaes,
+    OptimizationMethod.PYGMO_XNES: pg.xnes,
+    OptimizationMethod.PYGMO_PSO_GEN: pg.pso_gen,
+    OptimizationMethod.PYGMO_SADE: pg.sade,
+}
+
+# SciPy >= 1.12 passes the population energies to differential evolution callbacks
+_SCIPY_INTERMEDIATE_RESULT_CALLBACK = tuple(
+    int(number) for number in re.match(r"(\d+)\.(\d+)", scipy.__version__).groups()
+) >= (1, 12)
+
+
+@attr.s(auto_attribs=True)
+class EarlyStoppingSettings:
+    """
+    Convergence-aware stopping criteria, checked after every generation. Serial pygmo runs are
+    then evolved one generation at a time: this is equivalent to a single evolution, except for
+    `pg.de1220` with `variant_adptv=2`, whose parameter adaptation restarts from the first
+    individual at every generation (use `variant_adptv=1` for identical runs).
+
+    Members
+    ----------------
+
+    :ivar int stall_generations:
+        Stop when the best objective has not improved for this number of generations. None
+        disables this criterion.
+
+    :ivar float improvement_tolerance:
+        The relative decrease of the best objective that counts as an improvement.
+
+    :ivar float spread_tolerance:
+        Stop when the difference between the worst and the best objectives in the population is
+        not greater than this value. None disables this criterion.
+    """
+
+    stall_generations: int = None
+    improvement_tolerance: float = 0.0
+    spread_tolerance: float = None
+
+    def __attrs_post_init__(self):
+        if self.stall_generations is not None and self.stall_generations <= 0:
+            raise ValueError("Stall generations must be greater than 0.")
+        if self.improvement_tolerance < 0:
+            raise ValueError("Improvement tolerance must be non-negative.")
+        if self.spread_tolerance is not None and self.spread_tolerance < 0:
+            raise ValueError("Spread tolerance must be non-negative.")
+
+
+@attr.s(auto_attribs=True)
+class GenerationTelemetry:
+    """
+    The progress of a minimization after one generation.
+
+    Members
+    ----------------
+
+    :ivar int generation:
+        The generation number, starting at 1.
+
+    :ivar float best_fun:
+        The best objective found so far.
+
+    :ivar float mean_fun:
+        The mean objective of the current population.
+
+    :ivar int evaluations:
+        The number of objective evaluations so far.
+
+    :ivar float wall_time:
+        The seconds elapsed since the minimization started.
+    """
+
+    generation: int
+    best_fun: float
+    mean_fun: float
+    evaluations: int
+    wall_time: float
+
+
+def evaluations_to_target(telemetry: list, target: float) -> int:
+    """
+    The number of objective evaluations until a minimization reached an objective value, to
+    compare algorithms from their recorded telemetry.
+
+    :param list telemetry:
+        The `GenerationTelemetry` records of a minimization.
+
+    :param float target:
+        The objective value to reach.
+
+    :return:
+        The evaluations at the first generation whose best objective is not greater than
+        `target`, or None if it was never reached.
+    :rtype: int
+    """
+    for record in telemetry:
+        if record.best_fun <= target:
+            return record.evaluations
+    return None
+
+
+_is_early_stopping_settings = attr.validators.instance_of(EarlyStoppingSettings)
+_is_bool = attr.validators.instance_of(bool)
+_is_str = attr.validators.instance_of(str)
+
+
+def _is_positive_integer(instance, attribute, value):
+    if not isinstance(value, (int, np.integer)) or isinstance(value, bool):
+        raise TypeError(f"{attribute.name} must be an integer.")
+    if value <= 0:
+        raise ValueError(f"{attribute.name} must be greater than 0.")
+
+
+def _is_number_of_workers(instance, attribute, value):
+    if value is None:
+        return
+    if not isinstance(value, (int, np.integer)) or isinstance(value, bool):
+        raise TypeError(f"{attribute.name} must be an integer.")
+    if value != -1 and value <= 0:
+        raise ValueError(f"{attribute.name} must be greater than 0, or -1 for all cores.")
+
+
+def _are_bounds(instance, attribute, value):
+    bounds = np.asarray(value, dtype=np.float64)
+    if bounds.ndim != 2 or bounds.shape[1] != 2 or len(bounds) == 0:
+        raise ValueError("Bounds must be a (lower, upper) pair per decision variable.")
+    if np.any(bounds[:, 0] > bounds[:, 1]):
+        raise ValueError("Lower bounds must not be greater than upper bounds.")
+
+
+@attr.s(auto_attribs=True)
+class _GenerationMonitor:
+    """
+    Records the telemetry of each generation and checks the early stopping criteria.
+    """
+
+    early_stopping: EarlyStoppingSettings = None
+    record_telemetry: bool = False
+    telemetry: list = attr.ib(factory=list)
+    stop_message: str = None
+    _best_fun: float = np.inf
+    _stalled_generations: int = 0
+    _generation: int = 0
+    _start_time: float = attr.ib(factory=time.perf_counter)
+
+    @property
+    def stopped(self):
+        return self.stop_message is not None
+
+    def update(self, best_fun, population_fun, evaluations) -> bool:
+        """
+        Register a generation, returning True if the minimization should stop.
+        """
+        self._generation += 1
+        best_fun = float(best_fun)
+        if self.record_telemetry:
+            self.telemetry.append(
+                GenerationTelemetry(
+                    generation=self._generation,
+                    best_fun=best_fun,
+                    mean_fun=float(np.mean(population_fun)),
+                    evaluations=int(evaluations),
+                    wall_time=time.perf_counter() - self._start_time,
+                )
+            )
+        if self.early_stopping is None:
+            return False
+
+        improvement_threshold = self.early_stopping.improvement_tolerance * abs(self._best_fun)
+        if self._best_fun == np.inf or best_fun < self._best_fun - improvement_threshold:
+            self._stalled_generations = 0
+        else:
+            self._stalled_generations += 1
+        self._best_fun = min(self._best_fun, best_fun)
+
+        stall_generations = self.early_stopping.stall_generations
+        spread_tolerance = self.early_stopping.spread_tolerance
+        if stall_generations is not None and self._stalled_generations >= stall_generations:
+            self.stop_message = f"No improvement in the last {stall_generations} generations."
+        elif spread_tolerance is not None and np.ptp(population_fun) <= spread_tolerance:
+            self.stop_message = "Population objective spread below tolerance."
+        return self.stopped
+
+
+@attr.s(auto_attribs=True)
+class _ScipyPopulationRecorder:
+    """
+    Reconstructs the population objective values of SciPy's differential evolution from the
+    objective values it receives, for the callbacks of SciPy < 1.12, which only receive the best
+    point. As in `scipy.optimize.DifferentialEvolutionSolver`, trials replace their population
+    member when not worse, and the best member is swapped into the first position (at every
+    generation, or at every new best with immediate updating).
+    """
+
+    immediate_updating: bool
+    _values: list = attr.ib(factory=list)
+    _number_of_consumed_values: int = 0
+    _population_fun: np.ndarray = None
+
+    @property
+    def evaluations(self):
+        return len(self._values)
+
+    def record(self, values):
+        self._values.extend(np.ravel(values).tolist())
+        return values
+
+    def recorded_objective(self, objective_function):
+        def objective(*args):
+            return self.record(objective_function(*args))
+
+        return objective
+
+    def recorded_map(self, map_function):
+        def recorded_map_function(function, iterable):
+            return self.record(list(map_function(function, iterable)))
+
+        return recorded_map_function
+
+    def population_fun(self) -> np.ndarray:
+        """
+        The population objective values after the last generation.
+        """
+        values = np.array(self._values[self._number_of_consumed_values :], dtype=np.float64)
+        self._number_of_consumed_values = len(self._values)
+        if self._population_fun is None:
+            # The initial population is evaluated together with the first generation
+            number_of_members = len(values) // 2
+            self._population_fun, values = values[:number_of_members], values[number_of_members:]
+            self._promote_lowest_value()
+        for member, value in enumerate(values):
+            if value <= self._population_fun[member]:
+                self._population_fun[member] = value
+                if self.immediate_updating and value <= self._population_fun[0]:
+                    self._promote_lowest_value()
+        if not self.immediate_updating:
+            self._promote_lowest_value()
+        return self._population_fun
+
+    def _promote_lowest_value(self):
+        best_member = np.argmin(self._population_fun)
+        self._population_fun[[0, best_member]] = self._population_fun[[best_member, 0]]
 
 
 @attr.s(auto_attribs=True)
@@ -59,6 +327,12 @@ class ScipyDifferentialEvolutionSettings:
     :ivar polish:
         If True (default), then `scipy.optimize.minimize` with the `L-BFGS-B` method is used to polish the best
         population member at the end, which can improve the minimization slightly.
+
+    :ivar EarlyStoppingSettings early_stopping:
+        Optional stall-detection criteria to stop before the convergence tolerance is reached.
+
+    :ivar bool record_telemetry:
+        If True, the result's `telemetry` holds a `GenerationTelemetry` for each generation.
     """
 
     number_of_decision_variables: int
@@ -73,6 +347,10 @@ class ScipyDifferentialEvolutionSettings:
     popsize: int = None
     population_size_for_each_variable: int = 15
     total_population_size_limit: int = 100
+    early_stopping: EarlyStoppingSettings = attr.ib(
+        default=None, validator=attr.validators.optional(_is_early_stopping_settings)
+    )
+    record_telemetry: bool = attr.ib(default=False, validator=_is_bool)
 
     def __attrs_post_init__(self):
         if self.popsize is None:
@@ -111,7 +389,75 @@ class ScipyDifferentialEvolutionSettings:
 
 @attr.s(auto_attribs=True)
 class PygmoSelfAdaptiveDESettings:
-    # TODO: docs and validations
+    """
+    Settings of pygmo's self-adaptive differential evolution (`pg.de1220`), selected by
+    `OptimizationMethod.PYGMO_DE1220`, or of its batch variant `PygmoBatchSelfAdaptiveDE`,
+    selected by `OptimizationMethod.PYGMO_BATCH_DE1220`.
+
+    Members
+    ----------------
+
+    :ivar int gen:
+        The number of generations of each algorithm evolution.
+
+    :ivar int popsize:
+        The population size (of each island, in archipelagos).
+
+    :ivar list allowed_variants:
+        The mutation variants the algorithm adapts among.
+
+    :ivar int variant_adptv:
+        The parameter adaptation scheme: 1 (jDE) or 2 (iDE).
+
+    :ivar float ftol:
+        The stopping tolerance on the objective spread of the population.
+
+    :ivar float xtol:
+        The stopping tolerance on the decision vector spread of the population.
+
+    :ivar bool memory:
+        If True, the adapted parameters are kept between evolutions.
+
+    :ivar int seed:
+        The seed of the algorithm and of the initial population.
+
+    :ivar bool polish:
+        If True, the champion is polished with the pygmo NLopt `polish_method` (serial runs).
+
+    :ivar str polish_method:
+        The NLopt local solver used for polishing.
+
+    :ivar bool parallel_execution:
+        If True, the algorithm runs on an archipelago of `number_of_islands` islands, evolved
+        `archipelago_gen` times.
+
+    :ivar int number_of_islands:
+        The number of islands of the archipelago.
+
+    :ivar int archipelago_gen:
+        The number of evolutions of the archipelago.
+
+    :ivar int batch_evaluation_workers:
+        The number of processes evaluating the populations of serial runs (-1 for all cores).
+        `pg.de1220` only evaluates the initial population in batch, while
+        `OptimizationMethod.PYGMO_BATCH_DE1220` evaluates every generation in batch. The
+        processes are kept by the problem until its `close()`.
+
+    :ivar str checkpoint_path:
+        If given, the archipelago state is saved to this file as an `ArchipelagoCheckpoint`, and
+        an interrupted run with the same settings resumes from it (parallel runs).
+
+    :ivar int checkpoint_interval:
+        The number of archipelago evolutions between checkpoints.
+
+    :ivar EarlyStoppingSettings early_stopping:
+        Convergence-aware stopping criteria, checked after each generation (serial runs) or each
+        archipelago evolution (parallel runs). None disables early stopping.
+
+    :ivar bool record_telemetry:
+        If True, the solution's `telemetry` holds a `GenerationTelemetry` for each generation
+        (serial runs) or archipelago evolution (parallel runs).
+    """
 
     gen: int
     popsize: int
@@ -126,23 +472,354 @@ class PygmoSelfAdaptiveDESettings:
     parallel_execution: bool = False
     number_of_islands: int = 2
     archipelago_gen: int = 50
+    batch_evaluation_workers: int = attr.ib(default=None, validator=_is_number_of_workers)
+    checkpoint_path: str = attr.ib(default=None, validator=attr.validators.optional(_is_str))
+    checkpoint_interval: int = attr.ib(default=10, validator=_is_positive_integer)
+    early_stopping: EarlyStoppingSettings = attr.ib(
+        default=None, validator=attr.validators.optional(_is_early_stopping_settings)
+    )
+    record_telemetry: bool = attr.ib(default=False, validator=_is_bool)
 
 
 @attr.s(auto_attribs=True)
-class PygmoOptimizationProblemWrapper:
-    # TODO: docs and validations
+class PygmoAlgorithmSettings:
+    """
+    Settings of the pygmo algorithms selected by `OptimizationMethod.PYGMO_CMAES`, `PYGMO_XNES`,
+    `PYGMO_PSO_GEN` and `PYGMO_SADE`. The execution settings (polishing, archipelagos, batch
+    evaluation, checkpoints, early stopping and telemetry) are the same as in
+    `PygmoSelfAdaptiveDESettings`.
+
+    Members
+    ----------------
+
+    :ivar int gen:
+        The number of generations of each algorithm evolution.
+
+    :ivar int popsize:
+        The population size (of each island, in archipelagos).
+
+    :ivar dict algorithm_options:
+        Extra arguments of the pygmo algorithm constructor, e.g. `{"sigma0": 0.3}` for CMA-ES or
+        `{"variant": 5}` for PSO.
+
+    :ivar int seed:
+        The seed of the algorithm and of the initial population.
+
+    :ivar bool polish:
+        If True, the champion is polished with the pygmo NLopt `polish_method` (serial runs).
+
+    :ivar bool parallel_execution:
+        If True, the algorithm runs on an archipelago of `number_of_islands` islands, evolved
+        `archipelago_gen` times.
+
+    :ivar int batch_evaluation_workers:
+        The number of processes evaluating the populations of serial runs (-1 for all cores).
+        Only the initial population is evaluated in batch by the algorithms without a batch
+        fitness evaluator (xNES and SaDE); CMA-ES and PSO evaluate every generation in batch.
+    """
+
+    gen: int
+    popsize: int
+    algorithm_options: dict = attr.ib(factory=dict)
+    seed: int = int(np.random.randint(0, 2000))
+    polish: bool = True
+    polish_method: str = "tnewton_precond_restart"
+    parallel_execution: bool = False
+    number_of_islands: int = 2
+    archipelago_gen: int = 50
+    batch_evaluation_workers: int = attr.ib(default=None, validator=_is_number_of_workers)
+    checkpoint_path: str = attr.ib(default=None, validator=attr.validators.optional(_is_str))
+    checkpoint_interval: int = attr.ib(default=10, validator=_is_positive_integer)
+    early_stopping: EarlyStoppingSettings = attr.ib(
+        default=None, validator=attr.validators.optional(_is_early_stopping_settings)
+    )
+    record_telemetry: bool = attr.ib(default=False, validator=_is_bool)
+
+    def __attrs_post_init__(self):
+        if self.gen <= 0:
+            raise ValueError("Number of generations must be greater than 0.")
+        if self.popsize <= 0:
+            raise ValueError("Number of individuals must be greater than 0.")
+
+
+_BOUNDED_LOCAL_METHODS = ("L-BFGS-B", "TNC", "SLSQP", "Powell", "Nelder-Mead", "trust-constr")
+
+
+@attr.s(auto_attribs=True)
+class MultistartLocalSettings:
+    """
+    Settings of the multi-start local minimization, which runs a bounded local solver from each
+    point of a Latin hypercube design over the bounds.
+
+    Members
+    ----------------
+
+    :ivar int number_of_starts:
+        The number of Latin hypercube starting points. An `initial_population` given to the
+        problem replaces them.
+
+    :ivar str local_method:
+        The bounded `scipy.optimize.minimize` method used from each start. Should be one of
+        'L-BFGS-B', 'TNC', 'SLSQP', 'Powell', 'Nelder-Mead' or 'trust-constr'.
+
+    :ivar dict options:
+        Options passed to the local method.
+
+    :ivar int seed:
+        The seed of the Latin hypercube design.
+
+    :ivar int workers:
+        The number of processes running the local minimizations in parallel. Supply -1 to use all
+        available CPU cores. The problem's `worker_pool` is used instead when given.
+    """
+
+    number_of_starts: int = 20
+    local_method: str = "L-BFGS-B"
+    options: dict = attr.ib(factory=dict)
+    seed: int = None
+    workers: int = 1
+
+    def __attrs_post_init__(self):
+        if self.number_of_starts <= 0:
+            raise ValueError("Number of starts must be greater than 0.")
+        if self.local_method not in _BOUNDED_LOCAL_METHODS:
+            raise ValueError(f"Local method must be one of {', '.join(_BOUNDED_LOCAL_METHODS)}.")
+        if self.workers != -1 and self.workers <= 0:
+            raise ValueError("Number of workers must be greater than 0, or -1 for all cores.")
+
+
+@attr.s(auto_attribs=True)
+class _LocalMinimizer:
+    """
+    Runs one bounded local minimization of the objective function from a starting point.
+    """
 
     objective_function: types.FunctionType
     bounds: list
+    args: tuple = ()
+    gradient_function: types.FunctionType = None
+    vectorized: bool = False
+    method: str = "L-BFGS-B"
+    options: dict = attr.ib(factory=dict)
+
+    def _evaluate_single(self, x, *args):
+        if self.vectorized:
+            return self.objective_function(np.atleast_2d(x), *args)[0]
+        return self.objective_function(x, *args)
+
+    def __call__(self, x0):
+        # Gradient-free methods do not accept a `jac`
+        jac = self.gradient_function if self.method not in ("Powell", "Nelder-Mead") else None
+        return minimize(
+            self._evaluate_single,
+            x0,
+            args=self.args,
+            method=self.method,
+            jac=jac,
+            bounds=self.bounds,
+            options=self.options,
+        )
+
+
+@attr.s(auto_attribs=True)
+class MultistartSolution:
+    """
+    The solution of a multi-start local minimization.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray x:
+        The best local minimum.
+
+    :ivar float fun:
+        The objective at `x`.
+
+    :ivar int nfev:
+        The number of objective evaluations of all local minimizations.
+
+    :ivar numpy.ndarray population:
+        The local minima found from each start, sorted by their objective.
+
+    :ivar numpy.ndarray population_fun:
+        The objective at each local minimum of `population`.
+
+    :ivar list local_results:
+        The `scipy.optimize.OptimizeResult` of each local minimization, in the order of
+        `population`.
+    """
+
+    x: np.ndarray
+    fun: float
+    nfev: int
+    population: np.ndarray
+    population_fun: np.ndarray
+    local_results: list
+
+
+@attr.s(auto_attribs=True)
+class SurrogateSettings:
+    """
+    Settings of the surrogate-assisted minimization (see `pydemic.surrogate`). After an initial
+    Latin hypercube design, a surrogate of the objective is fitted to all evaluated points at
+    each iteration, and proposes the next `batch_size` points to evaluate.
+
+    Members
+    ----------------
+
+    :ivar int max_evaluations:
+        The budget of objective evaluations, including the initial design.
+
+    :ivar int number_of_initial_samples:
+        The size of the initial Latin hypercube design. If None, `2 * (number_of_decision_variables
+        + 1)` samples are used. An `initial_population` given to the problem replaces it.
+
+    :ivar SurrogateModelType surrogate_model:
+        A Gaussian process (candidates by expected improvement) or a radial basis function
+        interpolant (candidates by a weighted score of the predictions and the distances to the
+        evaluated points).
+
+    :ivar int batch_size:
+        The number of points proposed per iteration, evaluated together (in parallel by the
+        `workers`, the problem's `worker_pool`, or as a population when `vectorized`).
+
+    :ivar int number_of_candidates:
+        The number of random candidates scored by the surrogate per iteration. If None,
+        `min(100 * number_of_decision_variables, 2000)` candidates are used.
+
+    :ivar float exploration:
+        The expected improvement margin, relative to the standard deviation of the objective
+        values. Larger values favor exploration.
+
+    :ivar int seed:
+        The seed of the design and of the candidates.
+
+    :ivar int workers:
+        The number of processes evaluating each batch. Supply -1 to use all available CPU cores.
+
+    :ivar bool polish:
+        If True, the best point is polished with L-BFGS-B on the true objective, using the
+        problem's `gradient_function` when given.
+
+    :ivar EarlyStoppingSettings early_stopping:
+        Optional stall-detection criteria, checked after each iteration.
+
+    :ivar bool record_telemetry:
+        If True, the solution's `telemetry` holds a `GenerationTelemetry` for each iteration
+        (the initial design being the first).
+    """
+
+    max_evaluations: int = 100
+    number_of_initial_samples: int = None
+    surrogate_model: SurrogateModelType = SurrogateModelType.GAUSSIAN_PROCESS
+    batch_size: int = 1
+    number_of_candidates: int = None
+    exploration: float = 0.01
+    seed: int = None
+    workers: int = 1
+    polish: bool = False
+    early_stopping: EarlyStoppingSettings = None
+    record_telemetry: bool = False
+
+    def __attrs_post_init__(self):
+        if self.max_evaluations <= 0:
+            raise ValueError("Maximum number of evaluations must be greater than 0.")
+        if self.number_of_initial_samples is not None and self.number_of_initial_samples < 2:
+            raise ValueError("Number of initial samples must be at least 2.")
+        if self.batch_size <= 0:
+            raise ValueError("Batch size must be greater than 0.")
+        if self.exploration < 0:
+            raise ValueError("Exploration must be non-negative.")
+        if self.workers != -1 and self.workers <= 0:
+            raise ValueError("Number of workers must be greater than 0, or -1 for all cores.")
+
+
+@attr.s(auto_attribs=True)
+class SurrogateSolution:
+    """
+    The solution of a surrogate-assisted minimization.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray x:
+        The best evaluated (or polished) point.
+
+    :ivar float fun:
+        The objective at `x`.
+
+    :ivar int nfev:
+        The number of objective evaluations.
+
+    :ivar numpy.ndarray population:
+        The evaluated points, sorted by their objective.
+
+    :ivar numpy.ndarray population_fun:
+        The objective at each point of `population`.
+
+    :ivar list telemetry:
+        The `GenerationTelemetry` of each iteration, when recorded.
+    """
+
+    x: np.ndarray
+    fun: float
+    nfev: int
+    population: np.ndarray
+    population_fun: np.ndarray
+    telemetry: list = None
+
+
+@attr.s(auto_attribs=True)
+class PygmoOptimizationProblemWrapper:
+    """
+    A pygmo user-defined problem (UDP) evaluating an `OptimizationProblem` objective.
+
+    Members
+    ----------------
+
+    :ivar callable objective_function:
+        The objective, `objective_function(x, *args)`, or `objective_function(population,
+        *args)` if `vectorized`.
+
+    :ivar list bounds:
+        The (lower, upper) bounds of each decision variable.
+
+    :ivar list args:
+        The extra arguments of the objective and of the gradient.
+
+    :ivar callable gradient_function:
+        The gradient, `gradient_function(x, *args)`, used by the polishing. If None, it is
+        estimated by finite differences.
+
+    :ivar bool vectorized:
+        If True, the objective evaluates a population matrix at once.
+    """
+
+    objective_function: types.FunctionType = attr.ib(validator=attr.validators.is_callable())
+    bounds: list = attr.ib(validator=_are_bounds)
     args: list = []
+    gradient_function: types.FunctionType = attr.ib(
+        default=None, validator=attr.validators.optional(attr.validators.is_callable())
+    )
+    vectorized: bool = attr.ib(default=False, validator=_is_bool)
 
     def fitness(self, x):
+        if self.vectorized:
+            return [self.objective_function(np.atleast_2d(x), *self.args)[0]]
         return [self.objective_function(x, *self.args)]
 
+    def batch_fitness(self, dvs):
+        population = np.reshape(dvs, (-1, len(self.bounds)))
+        if self.vectorized:
+            return np.asarray(self.objective_function(population, *self.args), dtype=np.float64)
+        return np.array([self.objective_function(x, *self.args) for x in population])
+
     def get_bounds(self):
         return self._transform_bounds_to_pygmo_standard
 
     def gradient(self, x):
+        if self.gradient_function is not None:
+            return self.gradient_function(x, *self.args)
         return pg.estimate_gradient_h(lambda x: self.fitness(x), x)
 
     @property
@@ -153,142 +830,1479 @@ class PygmoOptimizationProblemWrapper:
         return lower_bounds, upper_bounds
 
 
+def _evaluate_pygmo_batch_fitness(population, problem_wrapper):
+    return problem_wrapper.batch_fitness(np.ravel(population))
+
+
 @attr.s(auto_attribs=True)
-class PygmoSolutionWrapperSerial:
-    # TODO: docs and validations
+class PygmoBatchFitnessEvaluator:
+    """
+    A pygmo user-defined batch fitness evaluator (UDBFE) that splits the decision vectors among
+    the processes of a persistent `WorkerPool`. Only problems wrapped by
+    `PygmoOptimizationProblemWrapper` are supported, and their objective must be picklable.
 
-    solution: pg.core.population
+    Members
+    ----------------
 
-    @property
-    def fun(self):
-        return self.solution.champion_f
+    :ivar WorkerPool worker_pool:
+        The worker processes.
+    """
 
-    @property
-    def x(self):
-        return self.solution.champion_x
+    worker_pool: WorkerPool
+
+    def __call__(self, problem, dvs):
+        problem_wrapper = problem.extract(PygmoOptimizationProblemWrapper)
+        if problem_wrapper is None:
+            raise TypeError(
+                "Only problems wrapped by PygmoOptimizationProblemWrapper are supported."
+            )
+        population = np.reshape(dvs, (-1, problem.get_nx()))
+        # The gradient is only used by the polishing, in this process
+        problem_wrapper = attr.evolve(problem_wrapper, gradient_function=None)
+        return self.worker_pool.map_chunks(
+            _evaluate_pygmo_batch_fitness, population, problem_wrapper
+        )
 
+    def __deepcopy__(self, memo):
+        # pygmo deep copies UDBFEs, which must keep sharing the worker processes
+        return self
 
-@attr.s(auto_attribs=True)
-class PygmoSolutionWrapperParallel:
-    # TODO: docs and validations
+    def get_name(self):
+        return "Process pool batch fitness evaluator"
 
-    champion_x: np.ndarray
-    champion_f: Union[float, np.float64, np.ndarray]
 
-    @property
-    def fun(self):
-        return self.champion_f
+# The (base vector, number of difference vectors, crossover) of each `pg.de1220` variant
+_DE1220_VARIANTS = {
+    1: ("best", 1, "exp"),
+    2: ("rand", 1, "exp"),
+    3: ("rand-to-best", 1, "exp"),
+    4: ("best", 2, "exp"),
+    5: ("rand", 2, "exp"),
+    6: ("best", 1, "bin"),
+    7: ("rand", 1, "bin"),
+    8: ("rand-to-best", 1, "bin"),
+    9: ("best", 2, "bin"),
+    10: ("rand", 2, "bin"),
+    11: ("rand", 3, "exp"),
+    12: ("rand", 3, "bin"),
+    13: ("best", 3, "exp"),
+    14: ("best", 3, "bin"),
+    15: ("rand-to-current", 2, "exp"),
+    16: ("rand-to-current", 2, "bin"),
+    17: ("rand-to-best-and-current", 2, "exp"),
+    18: ("rand-to-best-and-current", 2, "bin"),
+}
 
-    @property
-    def x(self):
-        return self.champion_x
+# The number of random individuals used by the mutations of `pg.de1220`
+_DE1220_RANDOM_INDIVIDUALS = 7
 
 
 @attr.s(auto_attribs=True)
-class OptimizationProblem:
-    """
-    This class stores and solve optimization problems with the available solvers.
+class PygmoBatchSelfAdaptiveDE:
     """
+    A pygmo user-defined algorithm (UDA) running the self-adaptive differential evolution of
+    `pg.de1220` with a batch fitness evaluator. The trial vectors of a generation are built from
+    the previous generation and evaluated in a single batch, e.g. by the processes of a
+    `WorkerPool`, while `pg.de1220` evaluates them one by one. `OptimizationProblem` uses it
+    for `OptimizationMethod.PYGMO_BATCH_DE1220`.
 
-    # TODO: docs and validations
-    objective_function: types.FunctionType
-    bounds: list
-    optimization_method: OptimizationMethod
-    solver_args: Union[ScipyDifferentialEvolutionSettings, PygmoSelfAdaptiveDESettings]
+    The mutation variants, the parameter adaptation and the stopping tolerances are those of
+    `pg.de1220`, but the random numbers are drawn differently, so the same seed does not give
+    the same results. The trial vectors of a generation are all built from the previous
+    generation, instead of from the partially updated population, so the convergence per
+    generation differs from `pg.de1220` (mostly with the iDE adaptation, `variant_adptv=2`): it
+    is an opt-in alternative, not a drop-in replacement.
+
+    Members
+    ----------------
+
+    :ivar int gen:
+        The number of generations of each evolution.
+
+    :ivar pygmo.bfe batch_evaluator:
+        The batch fitness evaluator of the trial vectors.
+
+    :ivar list allowed_variants:
+        The mutation variants the algorithm adapts among (1 to 18, as in `pg.de1220`).
+
+    :ivar int variant_adptv:
+        The parameter adaptation scheme: 1 (jDE) or 2 (iDE).
+
+    :ivar float ftol:
+        The stopping tolerance on the objective spread of the population.
+
+    :ivar float xtol:
+        The stopping tolerance on the decision vector spread of the population.
+
+    :ivar bool memory:
+        If True, the adapted parameters are kept between evolutions.
+
+    :ivar int seed:
+        The seed of the algorithm.
+    """
+
+    gen: int
+    batch_evaluator: pg.bfe
+    allowed_variants: list = [2, 6, 7]
+    variant_adptv: int = 2
+    ftol: float = 1e-6
+    xtol: float = 1e-6
+    memory: bool = True
+    seed: int = int(np.random.randint(0, 2000))
+    _random_state: np.random.RandomState = attr.ib(default=None, init=False, repr=False)
+    _parameters: tuple = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if any(variant not in _DE1220_VARIANTS for variant in self.allowed_variants):
+            raise ValueError("Allowed variants must be between 1 and 18.")
+        if self.variant_adptv not in (1, 2):
+            raise ValueError("Parameter adaptation scheme must be 1 or 2.")
+        self._random_state = np.random.RandomState(self.seed)
+
+    def set_seed(self, seed):
+        self.seed = seed
+        self._random_state = np.random.RandomState(seed)
+
+    def evolve(self, population):
+        decision_vectors, fitness = population.get_x(), population.get_f()[:, 0]
+        population_size = len(decision_vectors)
+        if self.gen == 0 or population_size == 0:
+            return population
+        if population_size <= _DE1220_RANDOM_INDIVIDUALS:
+            raise ValueError(f"Population size must be greater than {_DE1220_RANDOM_INDIVIDUALS}.")
+        problem = population.problem
+        lower_bounds, upper_bounds = (np.asarray(b, dtype=np.float64) for b in problem.get_bounds())
+
+        random_state = self._random_state
+        if (
+            not self.memory
+            or self._parameters is None
+            or len(self._parameters[0]) != population_size
+        ):
+            self._parameters = (
+                0.1 + 0.9 * random_state.random_sample(population_size),
+                random_state.random_sample(population_size),
+                random_state.choice(self.allowed_variants, population_size),
+            )
+
+        replaced = np.zeros(population_size, dtype=bool)
+        for _ in range(self.gen):
+            trials, *trial_parameters = self._trial_vectors(decision_vectors, fitness)
+            out_of_bounds = (trials < lower_bounds) | (trials > upper_bounds)
+            trials[out_of_bounds] = random_state.uniform(
+                np.broadcast_to(lower_bounds, trials.shape)[out_of_bounds],
+                np.broadcast_to(upper_bounds, trials.shape)[out_of_bounds],
+            )
+            trial_fitness = np.reshape(
+                self.batch_evaluator(problem, trials.ravel()), (population_size, -1)
+            )[:, 0]
+
+            improved = trial_fitness <= fitness
+            decision_vectors[improved] = trials[improved]
+            fitness[improved] = trial_fitness[improved]
+            for parameters, trial_values in zip(self._parameters, trial_parameters):
+                parameters[improved] = trial_values[improved]
+            replaced |= improved
+
+            best_index, worst_index = np.argmin(fitness), np.argmax(fitness)
+            dx = np.sum(np.abs(decision_vectors[worst_index] - decision_vectors[best_index]))
+            df = np.abs(fitness[worst_index] - fitness[best_index])
+            if dx < self.xtol or df < self.ftol:
+                break
+
+        for index in np.flatnonzero(replaced):
+            population.set_xf(int(index), decision_vectors[index], [fitness[index]])
+        return population
+
+    def _trial_vectors(self, decision_vectors, fitness):
+        random_state = self._random_state
+        population_size, number_of_decision_variables = decision_vectors.shape
+        mutation_factors, crossover_rates, variants = self._parameters
+        best_index = np.argmin(fitness)
+
+        # Distinct random individuals, other than the target, for each target
+        keys = random_state.random_sample((population_size, population_size))
+        np.fill_diagonal(keys, np.inf)
+        random_indices = np.argsort(keys, axis=1)[:, :_DE1220_RANDOM_INDIVIDUALS]
+        first, second = random_indices[:, 0], random_indices[:, 1]
+
+        if self.variant_adptv == 1:
+            resampled = random_state.random_sample(population_size) < 0.1
+            trial_mutation_factors = np.where(
+                resampled, 0.1 + 0.9 * random_state.random_sample(population_size), mutation_factors
+            )
+            resampled = random_state.random_sample(population_size) < 0.1
+            trial_crossover_rates = np.where(
+                resampled, random_state.random_sample(population_size), crossover_rates
+            )
+        else:
+            trial_mutation_factors = mutation_factors[best_index] + 0.5 * random_state.normal(
+                size=population_size
+            ) * (mutation_factors[first] - mutation_factors[second])
+            trial_crossover_rates = crossover_rates[best_index] + 0.5 * random_state.normal(
+                size=population_size
+            ) * (crossover_rates[first] - crossover_rates[second])
+            trial_crossover_rates = np.clip(trial_crossover_rates, 0.0, 1.0)
+        resampled = random_state.random_sample(population_size) < 0.1
+        trial_variants = np.where(
+            resampled, random_state.choice(self.allowed_variants, population_size), variants
+        )
+
+        mutants = np.empty_like(decision_vectors)
+        exponential_crossover = np.zeros(population_size, dtype=bool)
+        for variant in np.unique(trial_variants):
+            rows = trial_variants == variant
+            base, number_of_differences, crossover = _DE1220_VARIANTS[variant]
+            mutants[rows] = self._mutant_vectors(
+                base,
+                number_of_differences,
+                decision_vectors[rows],
+                decision_vectors[best_index],
+                decision_vectors[random_indices[rows]],
+                trial_mutation_factors[rows, np.newaxis],
+            )
+            exponential_crossover[rows] = crossover == "exp"
+
+        # Both crossovers take the component at a random start position, then the binomial one
+        # takes each other component with probability CR, and the exponential one takes a
+        # cyclic run of components while random draws are below CR
+        start_positions = random_state.randint(number_of_decision_variables, size=population_size)
+        offsets = (np.arange(number_of_decision_variables) - start_positions[:, np.newaxis]) % (
+            number_of_decision_variables
+        )
+        crossover_rate_column = trial_crossover_rates[:, np.newaxis]
+        binomial = (
+            random_state.random_sample((population_size, number_of_decision_variables))
+            < crossover_rate_column
+        ) | (offsets == 0)
+        continued = (
+            random_state.random_sample((population_size, number_of_decision_variables - 1))
+            < crossover_rate_column
+        )
+        run_lengths = 1 + np.sum(np.cumprod(continued, axis=1), axis=1)
+        exponential = offsets < run_lengths[:, np.newaxis]
+        crossed = np.where(exponential_crossover[:, np.newaxis], exponential, binomial)
+        trials = np.where(crossed, mutants, decision_vectors)
+        return trials, trial_mutation_factors, trial_crossover_rates, trial_variants
+
+    @staticmethod
+    def _mutant_vectors(base, number_of_differences, current, best, randoms, mutation_factors):
+        def differences(first_index):
+            return sum(
+                randoms[:, first_index + 2 * i] - randoms[:, first_index + 2 * i + 1]
+                for i in range(number_of_differences)
+            )
+
+        if base == "best":
+            return best + mutation_factors * differences(0)
+        if base == "rand":
+            return randoms[:, 0] + mutation_factors * differences(1)
+        if base == "rand-to-best":
+            return current + mutation_factors * (best - current + differences(0))
+        if base == "rand-to-current":
+            return randoms[:, 0] + mutation_factors * (
+                randoms[:, 1] - current + randoms[:, 2] - randoms[:, 3]
+            )
+        return randoms[:, 0] + mutation_factors * (randoms[:, 1] - current + best - randoms[:, 2])
+
+    def get_name(self):
+        return "Self-adaptive differential evolution with batch fitness evaluation"
+
+
+@attr.s(auto_attribs=True)
+class PygmoSolutionWrapperSerial:
+    """
+    The solution of a serial pygmo minimization.
+
+    Members
+    ----------------
+
+    :ivar pygmo.population solution:
+        The final population, whose champion is the solution.
+
+    :ivar list telemetry:
+        The `GenerationTelemetry` of each generation, if recorded.
+    """
+
+    solution: pg.core.population
+    telemetry: list = None
+
+    @property
+    def fun(self):
+        return self.solution.champion_f
+
+    @property
+    def x(self):
+        return self.solution.champion_x
+
+    @property
+    def population(self):
+        return self.solution.get_x()
+
+
+@attr.s(auto_attribs=True)
+class PygmoSolutionWrapperParallel:
+    """
+    The solution of a pygmo minimization over an archipelago.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray champion_x:
+        The best decision vector among the islands.
+
+    :ivar champion_f:
+        The objective at `champion_x`.
+
+    :ivar numpy.ndarray population:
+        The decision vectors of all islands.
+
+    :ivar list telemetry:
+        The `GenerationTelemetry` of each archipelago evolution, if recorded.
+    """
+
+    champion_x: np.ndarray
+    champion_f: Union[float, np.float64, np.ndarray]
+    population: np.ndarray = None
+    telemetry: list = None
+
+    @property
+    def fun(self):
+        return self.champion_f
+
+    @property
+    def x(self):
+        return self.champion_x
+
+
+@attr.s(auto_attribs=True)
+class _BroadcastObjectiveFunction:
+    """
+    An objective function whose function and arguments were broadcast to the worker processes.
+    """
+
+    broadcast_value: BroadcastValue
+
+    def __call__(self, x):
+        objective_function, args = self.broadcast_value.get()
+        return objective_function(x, *args)
+
+
+def _evaluate_population_chunk(population, objective_function):
+    return objective_function(population)
+
+
+@attr.s(auto_attribs=True)
+class ScipyVectorizedObjectiveWrapper:
+    """
+    Adapts a population objective to SciPy's vectorized convention, where candidates are the
+    columns of `x`.
+    """
+
+    objective_function: types.FunctionType
+
+    def __call__(self, x, *args):
+        if np.ndim(x) == 1:
+            return self.objective_function(np.atleast_2d(x), *args)[0]
+        return self.objective_function(np.transpose(x), *args)
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+@attr.s(auto_attribs=True)
+class ObjectiveFunctionCache:
+    """
+    A least-recently-used cache of objective function values, keyed on decision vectors
+    quantized to a number of significant digits. A cache holds the values of a single objective
+    function and arguments: clear it before reusing it with other ones. When pickled (e.g. sent
+    to worker processes), only its settings are kept.
+
+    Members
+    ----------------
+
+    :ivar int maxsize:
+        The maximum number of cached values. The least recently used ones are discarded first.
+
+    :ivar int significant_digits:
+        Decision vectors whose components agree to this number of significant digits share
+        the same cached value.
+    """
+
+    maxsize: int = 10000
+    significant_digits: int = 12
+    hits: int = attr.ib(default=0, init=False)
+    misses: int = attr.ib(default=0, init=False)
+    _values: OrderedDict = attr.ib(factory=OrderedDict, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if self.maxsize <= 0:
+            raise ValueError("Cache size must be greater than 0.")
+        if not 1 <= self.significant_digits <= 17:
+            raise ValueError("Significant digits must be between 1 and 17.")
+
+    def __deepcopy__(self, memo):
+        # Copies (e.g. of the problems made by pygmo) share the cached values
+        return self
+
+    def __getstate__(self):
+        return {"maxsize": self.maxsize, "significant_digits": self.significant_digits}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def hit_rate(self):
+        evaluations = self.hits + self.misses
+        return self.hits / evaluations if evaluations > 0 else 0.0
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._values))
+
+    def clear(self):
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, x) -> bytes:
+        # Decimal rounding of each component, so that the quantization does not depend on the
+        # scale (binary mantissas of values close to a power of two are rounded apart). Adding
+        # 0.0 turns -0.0 into 0.0
+        precision = self.significant_digits - 1
+        return " ".join(
+            f"{value:.{precision}e}" for value in np.asarray(x, dtype=np.float64).ravel() + 0.0
+        ).encode()
+
+    def evaluate(self, objective_function, x, *args):
+        """
+        Evaluate `objective_function(x, *args)`, unless a value is cached for `x`.
+        """
+        key = self.key(x)
+        if key in self._values:
+            return self._hit(key)
+        value = objective_function(x, *args)
+        self._store(key, value)
+        return value
+
+    def evaluate_population(self, objective_function, population, *args) -> np.ndarray:
+        """
+        Evaluate a population objective `objective_function(population, *args)` only at the
+        candidates (rows of `population`) without cached values.
+        """
+        population = np.atleast_2d(population)
+        keys = [self.key(x) for x in population]
+        values = np.empty(len(keys))
+        missing_candidates = {}
+        for candidate, key in enumerate(keys):
+            if key in self._values:
+                values[candidate] = self._hit(key)
+            else:
+                missing_candidates.setdefault(key, []).append(candidate)
+        if missing_candidates:
+            first_candidates = [candidates[0] for candidates in missing_candidates.values()]
+            missing_values = objective_function(population[first_candidates], *args)
+            for (key, candidates), value in zip(missing_candidates.items(), missing_values):
+                values[candidates] = value
+                self._store(key, value)
+                self.hits += len(candidates) - 1
+        return values
+
+    def map(self, map_function, objective_function, iterable) -> list:
+        """
+        Evaluate `map_function(objective_function, candidates)` (e.g. `WorkerPool.map`) only
+        over the candidates without cached values.
+        """
+        candidates = list(iterable)
+        keys = [self.key(x) for x in candidates]
+        values = [None] * len(keys)
+        missing_candidates = {}
+        for candidate, key in enumerate(keys):
+            if key in self._values:
+                values[candidate] = self._hit(key)
+            else:
+                missing_candidates.setdefault(key, []).append(candidate)
+        missing_values = map_function(
+            objective_function,
+            [candidates[indices[0]] for indices in missing_candidates.values()],
+        )
+        for (key, indices), value in zip(missing_candidates.items(), missing_values):
+            for candidate in indices:
+                values[candidate] = value
+            self._store(key, value)
+            self.hits += len(indices) - 1
+        return values
+
+    def _hit(self, key):
+        self.hits += 1
+        self._values.move_to_end(key)
+        return self._values[key]
+
+    def _store(self, key, value):
+        self.misses += 1
+        self._values[key] = value
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+
+# The settings which do not change the archipelago evolution, so a checkpoint can be resumed with
+# other values (the seed only changes the initial populations, which are restored)
+_CHECKPOINT_EXECUTION_SETTINGS = (
+    "seed",
+    "polish",
+    "polish_method",
+    "parallel_execution",
+    "archipelago_gen",
+    "batch_evaluation_workers",
+    "checkpoint_path",
+    "checkpoint_interval",
+    "early_stopping",
+    "record_telemetry",
+)
+
+
+@attr.s(auto_attribs=True)
+class ArchipelagoCheckpoint:
+    """
+    The state of a pygmo archipelago run, saved every `checkpoint_interval` evolutions when
+    `PygmoSelfAdaptiveDESettings.checkpoint_path` is set. Solving the problem again with the
+    same settings resumes from it.
+
+    Members
+    ----------------
+
+    :ivar int completed_generations:
+        The number of archipelago evolutions already performed.
+
+    :ivar list decision_vectors:
+        The decision vectors of each island population.
+
+    :ivar list fitness:
+        The fitness of each island population.
+
+    :ivar list algorithms:
+        The pygmo algorithm of each island, including its random number generator state.
+
+    :ivar list migrants_db:
+        The migrants waiting in the archipelago, as returned by `get_migrants_db`.
+
+    :ivar dict settings:
+        The problem and solver settings defining the run. A run only resumes from a checkpoint
+        with the same settings (the seed and the execution settings, such as `archipelago_gen`,
+        may differ).
+
+    :ivar bool finished:
+        True if the run completed (or stopped early). Finished checkpoints are not resumed: the
+        next run starts over.
+    """
+
+    completed_generations: int
+    decision_vectors: list
+    fitness: list
+    algorithms: list
+    migrants_db: list
+    settings: dict = None
+    finished: bool = False
+
+    @classmethod
+    def from_archipelago(cls, archipelago, completed_generations, settings=None, finished=False):
+        populations = [island.get_population() for island in archipelago]
+        return cls(
+            completed_generations=completed_generations,
+            decision_vectors=[population.get_x() for population in populations],
+            fitness=[population.get_f() for population in populations],
+            algorithms=[island.get_algorithm() for island in archipelago],
+            migrants_db=archipelago.get_migrants_db(),
+            settings=settings,
+            finished=finished,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as checkpoint_file:
+            return pickle.load(checkpoint_file)
+
+    def save(self, path):
+        """
+        Write the checkpoint, replacing the previous one only once it is complete.
+        """
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as checkpoint_file:
+            pickle.dump(self, checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+
+    def restore_archipelago(self, problem):
+        archipelago = pg.archipelago()
+        for algorithm, decision_vectors, fitness in zip(
+            self.algorithms, self.decision_vectors, self.fitness
+        ):
+            population = pg.population(prob=problem, size=0)
+            for x, f in zip(decision_vectors, fitness):
+                population.push_back(x, f)
+            archipelago.push_back(algo=algorithm, pop=population)
+        archipelago.set_migrants_db(self.migrants_db)
+        return archipelago
+
+
+def _as_initial_population(population):
+    if population is None:
+        return None
+    if isinstance(population, pg.population):
+        population = population.get_x()
+    return np.atleast_2d(np.asarray(population, dtype=np.float64))
+
+
+def _latin_hypercube_sample(bounds, number_of_points, seed):
+    # scipy.stats.qmc only exists from SciPy 1.7, so it is only imported by the solvers using it
+    from scipy.stats import qmc
+
+    bounds = np.asarray(bounds, dtype=np.float64)
+    sample = qmc.LatinHypercube(d=len(bounds), seed=seed).random(n=number_of_points)
+    return qmc.scale(sample, bounds[:, 0], bounds[:, 1])
+
+
+def warm_start_population(
+    x: np.ndarray, bounds: list, size: int, spread: float = 0.05, seed: int = None
+) -> np.ndarray:
+    """
+    Build an initial population around a previous solution, for `OptimizationProblem`'s
+    `initial_population` when only the previous optimum is available.
+
+    :param numpy.ndarray x:
+        The previous solution, kept as the first candidate.
+
+    :param list bounds:
+        The `(lower, upper)` bounds of each decision variable.
+
+    :param int size:
+        The number of candidates.
+
+    :param float spread:
+        The standard deviation of the normal perturbations of the other candidates, relative to
+        the width of the bounds.
+
+    :param int seed:
+        The seed of the random perturbations.
+
+    :return:
+        The `(size, number_of_decision_variables)` population, clipped to the bounds.
+    :rtype: numpy.ndarray
+    """
+    if size < 1:
+        raise ValueError("Population size must be greater than 0.")
+    if spread < 0:
+        raise ValueError("Spread must be non-negative.")
+    bounds = np.asarray(bounds, dtype=np.float64)
+    lower_bounds, upper_bounds = bounds[:, 0], bounds[:, 1]
+    random_state = np.random.RandomState(seed)
+    perturbations = random_state.normal(size=(size, len(bounds))) * spread
+    population = np.asarray(x, dtype=np.float64) + perturbations * (upper_bounds - lower_bounds)
+    population[0] = x
+    return np.clip(population, lower_bounds, upper_bounds)
+
+
+@attr.s(auto_attribs=True)
+class PreviousSolutionCheck:
+    """
+    The outcome of `OptimizationProblem.check_previous_solution`.
+
+    Members
+    ----------------
+
+    :ivar bool is_valid:
+        Whether the previous solution is still an optimum within the tolerances.
+
+    :ivar numpy.ndarray x:
+        The previous solution.
+
+    :ivar float fun:
+        The objective at the previous solution, with the current data.
+
+    :ivar numpy.ndarray polished_x:
+        The local minimum found from the previous solution.
+
+    :ivar float polished_fun:
+        The objective at `polished_x`.
+
+    :ivar int nfev:
+        The number of objective evaluations used by the check.
+    """
+
+    is_valid: bool
+    x: np.ndarray
+    fun: float
+    polished_x: np.ndarray
+    polished_fun: float
+    nfev: int
+
+
+@attr.s(auto_attribs=True)
+class OptimizationProblem:
+    """
+    This class stores and solve optimization problems with the available solvers.
+
+    If `vectorized` is True, `objective_function(population, *args)` evaluates a whole
+    `(number_of_candidates, number_of_decision_variables)` population matrix at once (e.g.
+    `pydemic.sensitivity.LeastSquaresObjective.evaluate_population`), returning one value per
+    candidate. SciPy evaluates each generation in a single call. Pygmo calls it through the
+    problem's `batch_fitness`, which is used for the initial populations, by the algorithms
+    that accept a batch fitness evaluator and by `OptimizationMethod.PYGMO_BATCH_DE1220` (see
+    `PygmoBatchSelfAdaptiveDE`).
+
+    An optional `gradient_function(x, *args)` (e.g. `pydemic.sensitivity.LeastSquaresObjective`'s
+    `gradient`, with forward sensitivities or adjoints) replaces finite differences in the
+    gradient-based polishing of the solutions.
+
+    An optional `worker_pool` (`pydemic.parallel.WorkerPool`) evaluates the candidates in
+    processes that persist across `solve_minimization` calls, replacing SciPy's `workers` and
+    pygmo's `batch_evaluation_workers`. The objective function and `args` are broadcast to the
+    workers once per solve, instead of being pickled with every generation. Pools are not
+    closed by the problem; use them as context managers:
+
+        with WorkerPool() as worker_pool:
+            for problem in problems:
+                problem.worker_pool = worker_pool
+                solutions.append(problem.solve_minimization())
+
+    Without a `worker_pool`, the processes started for the settings' workers (pygmo's
+    `batch_evaluation_workers`, or the `workers` of the multistart and surrogate solvers) are
+    kept by the problem across `solve_minimization` calls, until `close()`. The problem is also
+    a context manager, closing them at exit.
+
+    An optional `objective_cache` (`ObjectiveFunctionCache`) reuses the objective values of
+    decision vectors evaluated before, e.g. by the polishing step or by an earlier solve of the
+    same problem. Its `cache_info()` reports the hits and misses. With a `worker_pool` or
+    parallel SciPy `workers`, cached candidates are not sent to the workers: SciPy's workers are
+    then the processes of a `WorkerPool` kept by the problem.
+
+    An optional `initial_population` (a `(number_of_candidates, number_of_decision_variables)`
+    array or a pygmo population, e.g. the `population` of a previous solution, or one built with
+    `warm_start_population`) replaces the random initial population, and its size overrides
+    `popsize`. When new data arrive, `check_previous_solution` tells whether the previous
+    optimum is still valid, so that the global search can be skipped or warm started.
+
+    `OptimizationMethod.MULTISTART_LOCAL` replaces the global search by bounded local
+    minimizations (using `gradient_function` when given) from a Latin hypercube design, which
+    is usually much cheaper for well-posed problems. See `MultistartLocalSettings`.
+
+    `OptimizationMethod.SURROGATE` spends the objective evaluations where a surrogate model
+    (Gaussian process or radial basis functions) predicts them to be informative, for expensive
+    objectives with a small evaluation budget. See `SurrogateSettings`.
+
+    Members
+    ----------------
+
+    :ivar callable objective_function:
+        The objective, `objective_function(x, *args)`, or `objective_function(population,
+        *args)` if `vectorized`.
+
+    :ivar list bounds:
+        The (lower, upper) bounds of each decision variable.
+
+    :ivar OptimizationMethod optimization_method:
+        The solver.
+
+    :ivar solver_args:
+        The settings of the solver. They can be None for `SCIPY_DE`, `MULTISTART_LOCAL` and
+        `SURROGATE`, which then use their default settings.
+
+    :ivar list args:
+        The extra arguments of the objective and of the gradient.
+
+    :ivar callable gradient_function:
+        The gradient, `gradient_function(x, *args)`, used by the local searches.
+
+    :ivar bool vectorized:
+        If True, the objective evaluates a population matrix at once.
+
+    :ivar WorkerPool worker_pool:
+        The worker processes evaluating the candidates, not closed by the problem.
+
+    :ivar ObjectiveFunctionCache objective_cache:
+        The cache of objective values.
+
+    :ivar numpy.ndarray initial_population:
+        The initial population, one decision vector per row.
+    """
+
+    objective_function: types.FunctionType = attr.ib(validator=attr.validators.is_callable())
+    bounds: list = attr.ib(validator=_are_bounds)
+    optimization_method: OptimizationMethod = attr.ib(
+        validator=attr.validators.instance_of(OptimizationMethod)
+    )
+    solver_args: Union[
+        ScipyDifferentialEvolutionSettings,
+        PygmoSelfAdaptiveDESettings,
+        PygmoAlgorithmSettings,
+        MultistartLocalSettings,
+        SurrogateSettings,
+    ]
     args: list = []
+    gradient_function: types.FunctionType = attr.ib(
+        default=None, validator=attr.validators.optional(attr.validators.is_callable())
+    )
+    vectorized: bool = attr.ib(default=False, validator=_is_bool)
+    worker_pool: WorkerPool = attr.ib(
+        default=None, validator=attr.validators.optional(attr.validators.instance_of(WorkerPool))
+    )
+    objective_cache: ObjectiveFunctionCache = attr.ib(
+        default=None,
+        validator=attr.validators.optional(attr.validators.instance_of(ObjectiveFunctionCache)),
+    )
+    initial_population: np.ndarray = attr.ib(default=None, converter=_as_initial_population)
+    _settings_worker_pool: WorkerPool = attr.ib(default=None, init=False, repr=False)
 
     def __attrs_post_init__(self):
         if self.optimization_method == OptimizationMethod.SCIPY_DE and self.solver_args is None:
             self.solver_args = ScipyDifferentialEvolutionSettings(
                 self._number_of_decision_variables
             )
+        if (
+            self.optimization_method == OptimizationMethod.MULTISTART_LOCAL
+            and self.solver_args is None
+        ):
+            self.solver_args = MultistartLocalSettings()
+        if self.optimization_method == OptimizationMethod.SURROGATE and self.solver_args is None:
+            self.solver_args = SurrogateSettings()
+        if self.optimization_method in _PYGMO_ALGORITHMS and not isinstance(
+            self.solver_args, PygmoAlgorithmSettings
+        ):
+            raise ValueError(f"{self.optimization_method} requires PygmoAlgorithmSettings.")
+        if (
+            self.initial_population is not None
+            and self.initial_population.shape[1] != self._number_of_decision_variables
+        ):
+            raise ValueError("Initial population does not match the number of decision variables.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Close the worker processes started for the settings' workers. The `worker_pool` given
+        to the problem is not closed.
+        """
+        if self._settings_worker_pool is not None:
+            self._settings_worker_pool.close()
+            self._settings_worker_pool = None
+
+    def _get_settings_worker_pool(self, number_of_workers):
+        """
+        The worker pool of a run with the settings' `number_of_workers`: the problem's
+        `worker_pool` if given, else a pool kept by the problem across solves (None for serial
+        runs).
+        """
+        if self.worker_pool is not None:
+            return self.worker_pool
+        if number_of_workers is None or number_of_workers == 1:
+            return None
+        if number_of_workers == -1:
+            number_of_workers = os.cpu_count()
+        if (
+            self._settings_worker_pool is not None
+            and self._settings_worker_pool.number_of_workers != number_of_workers
+        ):
+            self.close()
+        if self._settings_worker_pool is None:
+            self._settings_worker_pool = WorkerPool(number_of_workers)
+        return self._settings_worker_pool
+
+    @property
+    def _initial_population_within_bounds(self):
+        bounds = np.asarray(self.bounds, dtype=np.float64)
+        return np.clip(self.initial_population, bounds[:, 0], bounds[:, 1])
 
     @property
     def _number_of_decision_variables(self):
         return len(self.bounds)
 
     def solve_minimization(self):
+        if self.optimization_method == OptimizationMethod.MULTISTART_LOCAL:
+            return self._run_multistart()
+        if self.optimization_method == OptimizationMethod.SURROGATE:
+            return self._run_surrogate()
+
+        if self.worker_pool is None:
+            return self._solve_minimization(self.objective_function, self.args)
+
+        broadcast_value = self.worker_pool.broadcast((self.objective_function, tuple(self.args)))
+        try:
+            return self._solve_minimization(_BroadcastObjectiveFunction(broadcast_value), ())
+        finally:
+            self.worker_pool.release(broadcast_value)
+
+    def _solve_minimization(self, objective_function, args):
+        monitor = self._create_generation_monitor()
         if self.optimization_method == OptimizationMethod.SCIPY_DE:
+            workers = self.solver_args.workers
+            if self.vectorized:
+                workers = 1
+                if self.worker_pool is not None:
+                    objective_function = self._pooled_population_objective(objective_function)
+                objective_function = ScipyVectorizedObjectiveWrapper(
+                    self._cached_objective(objective_function)
+                )
+            else:
+                # The polishing evaluates the objective function in this process
+                objective_function = self._cached_objective(objective_function)
+                if self.objective_cache is not None and (
+                    self.worker_pool is not None or workers != 1
+                ):
+                    # The cache lives in this process, so the populations are mapped from it
+                    workers = partial(
+                        self.objective_cache.map, self._get_settings_worker_pool(workers).map
+                    )
+                elif self.worker_pool is not None:
+                    workers = self.worker_pool.map
+            init = "latinhypercube"
+            if self.initial_population is not None:
+                init = self._initial_population_within_bounds
+            if self.vectorized:
+                # The keyword only exists from SciPy 1.9
+                vectorized_options = dict(vectorized=True)
+            else:
+                vectorized_options = {}
+            updating = "deferred" if self.vectorized or workers != 1 else "immediate"
+
+            recorder = None
+            if monitor is not None and not _SCIPY_INTERMEDIATE_RESULT_CALLBACK:
+                # The objective values are recorded in this process to monitor the population
+                recorder = _ScipyPopulationRecorder(immediate_updating=updating == "immediate")
+                if workers == 1:
+                    objective_function = recorder.recorded_objective(objective_function)
+                else:
+                    if not callable(workers):
+                        workers = self._get_settings_worker_pool(workers).map
+                    workers = recorder.recorded_map(workers)
             result = differential_evolution(
-                self.objective_function,
+                objective_function,
                 bounds=self.bounds,
-                args=self.args,
+                args=args,
                 strategy=self.solver_args.strategy,
                 popsize=self.solver_args.popsize,
+                init=init,
                 recombination=self.solver_args.recombination,
                 mutation=self.solver_args.mutation,
                 tol=self.solver_args.tol,
                 disp=self.solver_args.disp,
-                polish=self.solver_args.polish,
+                polish=self.solver_args.polish and self.gradient_function is None,
                 seed=self.solver_args.seed,
-                workers=self.solver_args.workers,
+                workers=workers,
+                updating=updating,
+                callback=self._scipy_callback(monitor, recorder),
+                **vectorized_options,
             )
+            if monitor is not None:
+                result.telemetry = monitor.telemetry
+                if monitor.stopped:
+                    result.success = True
+                    result.message = monitor.stop_message
+            if self.solver_args.polish and self.gradient_function is not None:
+                result = self._polish_scipy_result(result)
             return result
 
-        elif self.optimization_method == OptimizationMethod.PYGMO_DE1220:
+        elif (
+            self.optimization_method in _PYGMO_DE1220_METHODS
+            or self.optimization_method in _PYGMO_ALGORITHMS
+        ):
             problem_wrapper = PygmoOptimizationProblemWrapper(
-                objective_function=self.objective_function, bounds=self.bounds, args=self.args
-            )
-            pygmo_algorithm = pg.algorithm(
-                pg.de1220(
-                    gen=self.solver_args.gen,
-                    allowed_variants=self.solver_args.allowed_variants,
-                    variant_adptv=self.solver_args.variant_adptv,
-                    ftol=self.solver_args.ftol,
-                    xtol=self.solver_args.xtol,
-                    memory=self.solver_args.memory,
-                    seed=self.solver_args.seed,
-                )
+                objective_function=self._cached_objective(objective_function),
+                bounds=self.bounds,
+                args=args,
+                gradient_function=self.gradient_function,
+                vectorized=self.vectorized,
             )
+            # A monitored serial run evolves one generation at a time, keeping the adapted
+            # parameters between calls when `memory` is set. This reproduces an unmonitored run
+            # except for de1220 with variant_adptv=2, which restarts its tracking of the best F
+            # and CR at every call. Archipelagos are monitored after each of their evolutions.
+            generations_per_evolution = self.solver_args.gen
+            if monitor is not None and not self.solver_args.parallel_execution:
+                generations_per_evolution = 1
+            sliced = generations_per_evolution != self.solver_args.gen
             pygmo_problem = pg.problem(problem_wrapper)
 
             if self.solver_args.parallel_execution:
+                batch_evaluator = self._create_pygmo_batch_evaluator()
+                pygmo_user_algorithm = self._create_pygmo_user_algorithm(
+                    generations_per_evolution, sliced, batch_evaluator
+                )
+                pygmo_algorithm = self._set_pygmo_batch_evaluator(
+                    pygmo_user_algorithm, batch_evaluator
+                )
                 solution_wrapper = self._run_pygmo_parallel(
                     pygmo_algorithm,
                     pygmo_problem,
                     number_of_islands=self.solver_args.number_of_islands,
                     archipelago_gen=self.solver_args.archipelago_gen,
+                    monitor=monitor,
                 )
             else:
-                pygmo_solution = self._run_pygmo_serial(pygmo_algorithm, pygmo_problem)
+                worker_pool = self._get_settings_worker_pool(
+                    self.solver_args.batch_evaluation_workers
+                )
+                batch_evaluator = self._create_pygmo_batch_evaluator(worker_pool)
+                pygmo_user_algorithm = self._create_pygmo_user_algorithm(
+                    generations_per_evolution, sliced, batch_evaluator
+                )
+                pygmo_algorithm = self._set_pygmo_batch_evaluator(
+                    pygmo_user_algorithm, batch_evaluator
+                )
+                pygmo_solution = self._run_pygmo_serial(
+                    pygmo_algorithm, pygmo_problem, batch_evaluator, monitor
+                )
                 if self.solver_args.polish:
                     pygmo_solution = self._polish_pygmo_population(pygmo_solution)
 
-                solution_wrapper = PygmoSolutionWrapperSerial(pygmo_solution)
+                solution_wrapper = PygmoSolutionWrapperSerial(
+                    pygmo_solution, telemetry=None if monitor is None else monitor.telemetry
+                )
 
             return solution_wrapper
 
         else:
             raise NotImplementedError("Unavailable optimization method.")
 
+    def _multistart_points(self):
+        if self.initial_population is not None:
+            return self._initial_population_within_bounds
+        return _latin_hypercube_sample(
+            self.bounds, self.solver_args.number_of_starts, self.solver_args.seed
+        )
+
+    def _run_multistart(self):
+        starting_points = self._multistart_points()
+        local_minimizer = _LocalMinimizer(
+            objective_function=self.objective_function,
+            bounds=self.bounds,
+            args=tuple(self.args),
+            gradient_function=self.gradient_function,
+            vectorized=self.vectorized,
+            method=self.solver_args.local_method,
+            options=self.solver_args.options,
+        )
+        with self._broadcast_to_workers((local_minimizer, ())) as (worker_pool, broadcast):
+            if worker_pool is None:
+                local_minimizer.objective_function = self._cached_objective(self.objective_function)
+                local_results = [local_minimizer(x0) for x0 in starting_points]
+            else:
+                local_results = worker_pool.map(broadcast, starting_points)
+
+        local_results = sorted(local_results, key=lambda result: result.fun)
+        return MultistartSolution(
+            x=local_results[0].x,
+            fun=local_results[0].fun,
+            nfev=sum(result.nfev for result in local_results),
+            population=np.array([result.x for result in local_results]),
+            population_fun=np.array([result.fun for result in local_results]),
+            local_results=local_results,
+        )
+
+    @contextmanager
+    def _broadcast_to_workers(self, value):
+        """
+        Broadcast `(function, args)` to the problem's worker pool, or to the one it keeps when
+        the settings ask for `workers`, yielding the pool and the broadcast function. The pool
+        is None for serial runs.
+        """
+        worker_pool = self._get_settings_worker_pool(self.solver_args.workers)
+        if worker_pool is None:
+            yield None, None
+            return
+
+        broadcast_value = worker_pool.broadcast(value)
+        try:
+            yield worker_pool, _BroadcastObjectiveFunction(broadcast_value)
+        finally:
+            worker_pool.release(broadcast_value)
+
+    def _evaluate_points(self, points, worker_pool=None, broadcast_objective=None):
+        if worker_pool is None:
+            objective_function = self._cached_objective(self.objective_function)
+            if self.vectorized:
+                return np.asarray(objective_function(points, *self.args), dtype=np.float64)
+            return np.array([objective_function(x, *self.args) for x in points])
+        if self.vectorized:
+            population_objective = self._pooled_population_objective(broadcast_objective)
+            return np.asarray(self._cached_objective(population_objective)(points))
+        if self.objective_cache is not None:
+            return np.array(self.objective_cache.map(worker_pool.map, broadcast_objective, points))
+        return np.array(worker_pool.map(broadcast_objective, points))
+
+    def _run_surrogate(self):
+        number_of_decision_variables = self._number_of_decision_variables
+        settings = self.solver_args
+        random_state = np.random.RandomState(settings.seed)
+        if self.initial_population is not None:
+            X = self._initial_population_within_bounds
+        else:
+            number_of_initial_samples = settings.number_of_initial_samples
+            if number_of_initial_samples is None:
+                number_of_initial_samples = 2 * (number_of_decision_variables + 1)
+            X = _latin_hypercube_sample(
+                self.bounds,
+                min(number_of_initial_samples, settings.max_evaluations),
+                random_state,
+            )
+        number_of_candidates = settings.number_of_candidates
+        if number_of_candidates is None:
+            number_of_candidates = min(100 * number_of_decision_variables, 2000)
+        surrogate = create_surrogate(settings.surrogate_model, self.bounds)
+        monitor = self._create_generation_monitor()
+
+        objective = (self.objective_function, tuple(self.args))
+        with self._broadcast_to_workers(objective) as (worker_pool, broadcast_objective):
+            y = self._evaluate_points(X, worker_pool, broadcast_objective)
+            stop = monitor is not None and monitor.update(np.nanmin(y), y, len(y))
+            iteration = 0
+            while len(y) < settings.max_evaluations and not stop:
+                surrogate.fit(X, y)
+                points = propose_points(
+                    surrogate,
+                    X,
+                    y,
+                    self.bounds,
+                    batch_size=min(settings.batch_size, settings.max_evaluations - len(y)),
+                    number_of_candidates=number_of_candidates,
+                    exploration=settings.exploration,
+                    iteration=iteration,
+                    random_state=random_state,
+                )
+                values = self._evaluate_points(points, worker_pool, broadcast_objective)
+                X = np.vstack([X, points])
+                y = np.append(y, values)
+                iteration += 1
+                stop = monitor is not None and monitor.update(np.nanmin(y), values, len(y))
+
+        order = np.argsort(np.where(np.isnan(y), np.inf, y))
+        x, fun, nfev = X[order[0]], y[order[0]], len(y)
+        if settings.polish:
+            polished_result = self._minimize_locally(x)
+            nfev += polished_result.nfev
+            if polished_result.fun < fun:
+                x, fun = polished_result.x, polished_result.fun
+        return SurrogateSolution(
+            x=x,
+            fun=fun,
+            nfev=nfev,
+            population=X[order],
+            population_fun=y[order],
+            telemetry=None if monitor is None else monitor.telemetry,
+        )
+
+    def _create_generation_monitor(self):
+        early_stopping = self.solver_args.early_stopping
+        if early_stopping is None and not self.solver_args.record_telemetry:
+            return None
+        return _GenerationMonitor(early_stopping, self.solver_args.record_telemetry)
+
+    @staticmethod
+    def _scipy_callback(monitor, recorder=None):
+        if monitor is None:
+            return None
+
+        if recorder is not None:
+
+            def legacy_callback(xk, convergence):
+                population_fun = recorder.population_fun()
+                return monitor.update(population_fun[0], population_fun, recorder.evaluations)
+
+            return legacy_callback
+
+        def callback(intermediate_result):
+            return monitor.update(
+                intermediate_result.fun,
+                intermediate_result.population_energies,
+                intermediate_result.nfev,
+            )
+
+        return callback
+
+    def _create_pygmo_user_algorithm(self, generations, sliced=False, batch_evaluator=None):
+        if self.optimization_method == OptimizationMethod.PYGMO_BATCH_DE1220:
+            if batch_evaluator is None:
+                batch_evaluator = pg.bfe(pg.member_bfe())
+            return PygmoBatchSelfAdaptiveDE(
+                gen=generations,
+                batch_evaluator=batch_evaluator,
+                allowed_variants=self.solver_args.allowed_variants,
+                variant_adptv=self.solver_args.variant_adptv,
+                ftol=self.solver_args.ftol,
+                xtol=self.solver_args.xtol,
+                memory=self.solver_args.memory,
+                seed=self.solver_args.seed,
+            )
+        if self.optimization_method == OptimizationMethod.PYGMO_DE1220:
+            return pg.de1220(
+                gen=generations,
+                allowed_variants=self.solver_args.allowed_variants,
+                variant_adptv=self.solver_args.variant_adptv,
+                ftol=self.solver_args.ftol,
+                xtol=self.solver_args.xtol,
+                memory=self.solver_args.memory,
+                seed=self.solver_args.seed,
+            )
+        algorithm_options = dict(self.solver_args.algorithm_options)
+        if sliced:
+            # Keep the adapted state (e.g. the CMA-ES covariance) between the sliced evolutions
+            algorithm_options.setdefault("memory", True)
+        return _PYGMO_ALGORITHMS[self.optimization_method](
+            gen=generations, seed=self.solver_args.seed, **algorithm_options
+        )
+
+    def _pygmo_tolerances_reached(self, population):
+        # The exit conditions checked by the differential evolution algorithms after each
+        # generation. The other algorithms only stop by the generation budget and the early
+        # stopping criteria when evolved one generation at a time.
+        if self.optimization_method in _PYGMO_DE1220_METHODS:
+            xtol, ftol = self.solver_args.xtol, self.solver_args.ftol
+        elif self.optimization_method == OptimizationMethod.PYGMO_SADE:
+            xtol = self.solver_args.algorithm_options.get("xtol", 1e-6)
+            ftol = self.solver_args.algorithm_options.get("ftol", 1e-6)
+        else:
+            return False
+        best_index, worst_index = population.best_idx(), population.worst_idx()
+        decision_vectors, fitness = population.get_x(), population.get_f()
+        dx = np.sum(np.abs(decision_vectors[worst_index] - decision_vectors[best_index]))
+        df = np.abs(fitness[worst_index, 0] - fitness[best_index, 0])
+        return dx < xtol or df < ftol
+
+    def _cached_objective(self, objective_function):
+        if self.objective_cache is None:
+            return objective_function
+        if self.vectorized:
+            return partial(self.objective_cache.evaluate_population, objective_function)
+        return partial(self.objective_cache.evaluate, objective_function)
+
+    def _pooled_population_objective(self, objective_function):
+        def evaluate_population(population):
+            return self.worker_pool.map_chunks(
+                _evaluate_population_chunk, population, objective_function
+            )
+
+        return evaluate_population
+
+    def _create_pygmo_batch_evaluator(self, worker_pool=None):
+        if worker_pool is not None:
+            return pg.bfe(PygmoBatchFitnessEvaluator(worker_pool))
+        if self.vectorized:
+            return pg.bfe(pg.member_bfe())
+        return None
+
+    @staticmethod
+    def _set_pygmo_batch_evaluator(user_algorithm, batch_evaluator):
+        # Only some pygmo algorithms (e.g. pso_gen and cmaes, but not de1220) evaluate their
+        # generations with a batch fitness evaluator. PygmoBatchSelfAdaptiveDE receives it when
+        # created
+        if batch_evaluator is not None and hasattr(user_algorithm, "set_bfe"):
+            user_algorithm.set_bfe(batch_evaluator)
+        return pg.algorithm(user_algorithm)
+
+    def _evaluate_single(self, x, *args):
+        objective_function = self._cached_objective(self.objective_function)
+        if self.vectorized:
+            return objective_function(np.atleast_2d(x), *args)[0]
+        return objective_function(x, *args)
+
+    def _minimize_locally(self, x0):
+        return minimize(
+            self._evaluate_single,
+            x0,
+            args=tuple(self.args),
+            method="L-BFGS-B",
+            jac=self.gradient_function,
+            bounds=self.bounds,
+        )
+
+    def check_previous_solution(
+        self, x: np.ndarray, xtol: float = 1e-3, ftol: float = 1e-3
+    ) -> PreviousSolutionCheck:
+        """
+        Check whether a previous solution (e.g. calibrated before the last data arrived) is still
+        an optimum, with a local L-BFGS-B search started from it. This uses `gradient_function`
+        when given.
+
+        :param numpy.ndarray x:
+            The previous solution.
+
+        :param float xtol:
+            The largest move of each decision variable, relative to the width of its bounds.
+
+        :param float ftol:
+            The largest decrease of the objective, relative to its value at `x`.
+
+        :return:
+            The check outcome. If the previous solution is not valid, its `polished_x` is a good
+            candidate for `warm_start_population`.
+        :rtype: PreviousSolutionCheck
+        """
+        x = np.asarray(x, dtype=np.float64)
+        fun = self._evaluate_single(x, *self.args)
+        polished_result = self._minimize_locally(x)
+        bounds = np.asarray(self.bounds, dtype=np.float64)
+        moved_within_tolerance = np.all(
+            np.abs(polished_result.x - x) <= xtol * (bounds[:, 1] - bounds[:, 0])
+        )
+        decreased_within_tolerance = fun - polished_result.fun <= ftol * abs(fun)
+        return PreviousSolutionCheck(
+            is_valid=bool(moved_within_tolerance and decreased_within_tolerance),
+            x=x,
+            fun=fun,
+            polished_x=polished_result.x,
+            polished_fun=polished_result.fun,
+            nfev=polished_result.nfev + 1,
+        )
+
+    def _polish_scipy_result(self, result):
+        """
+        Polish the differential evolution solution with L-BFGS-B and the given gradient, as
+        SciPy does with finite differences.
+        """
+        polished_result = self._minimize_locally(result.x)
+        result.nfev += polished_result.nfev
+        if polished_result.fun < result.fun:
+            result.fun = polished_result.fun
+            result.x = polished_result.x
+            result.jac = polished_result.jac
+        return result
+
     @staticmethod
     def _select_best_pygmo_archipelago_solution(champions_x, champions_f):
         best_index = np.argmin(champions_f)
         return champions_x[best_index], champions_f[best_index]
 
-    def _run_pygmo_parallel(self, algorithm, problem, number_of_islands=2, archipelago_gen=50):
-        pygmo_archipelago = pg.archipelago(
-            n=number_of_islands,
-            algo=algorithm,
-            prob=problem,
-            pop_size=self.solver_args.popsize,
-            seed=self.solver_args.seed,
-        )
-        pygmo_archipelago.evolve(n=archipelago_gen)
-        pygmo_archipelago.wait()
+    def _run_pygmo_parallel(
+        self, algorithm, problem, number_of_islands=2, archipelago_gen=50, monitor=None
+    ):
+        checkpoint_path = self.solver_args.checkpoint_path
+        checkpoint_settings = self._checkpoint_settings(number_of_islands)
+        checkpoint = None
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            checkpoint = ArchipelagoCheckpoint.load(checkpoint_path)
+            if getattr(checkpoint, "finished", False):
+                # The run it belongs to is over, so this run starts over
+                checkpoint = None
+            elif getattr(checkpoint, "settings", None) != checkpoint_settings:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} was written by a run with other settings."
+                )
+
+        batch_evaluator = self._create_pygmo_batch_evaluator()
+        if checkpoint is not None:
+            pygmo_archipelago = checkpoint.restore_archipelago(problem)
+        elif self.initial_population is None:
+            pygmo_archipelago = pg.archipelago(
+                n=number_of_islands,
+                algo=algorithm,
+                prob=problem,
+                pop_size=self.solver_args.popsize,
+                seed=self.solver_args.seed,
+                b=batch_evaluator,
+            )
+        else:
+            # The islands start from the same population, so their algorithms need distinct seeds
+            population = self._create_pygmo_initial_population(problem, batch_evaluator)
+            pygmo_archipelago = pg.archipelago()
+            for island in range(number_of_islands):
+                island_algorithm = copy.deepcopy(algorithm)
+                island_algorithm.set_seed(self.solver_args.seed + island)
+                pygmo_archipelago.push_back(algo=island_algorithm, pop=population)
+
+        completed_generations = 0 if checkpoint is None else checkpoint.completed_generations
+        while completed_generations < archipelago_gen:
+            generations = archipelago_gen - completed_generations
+            if monitor is not None:
+                generations = 1
+            elif checkpoint_path is not None:
+                generations = min(generations, self.solver_args.checkpoint_interval)
+            pygmo_archipelago.evolve(n=generations)
+            pygmo_archipelago.wait()
+            completed_generations += generations
+            stop = monitor is not None and self._update_archipelago_monitor(
+                monitor, pygmo_archipelago
+            )
+            finished = completed_generations >= archipelago_gen or stop
+            checkpoint_due = (
+                completed_generations % self.solver_args.checkpoint_interval == 0 or finished
+            )
+            if checkpoint_path is not None and checkpoint_due:
+                ArchipelagoCheckpoint.from_archipelago(
+                    pygmo_archipelago, completed_generations, checkpoint_settings, finished
+                ).save(checkpoint_path)
+            if stop:
+                break
+
         champions_x = pygmo_archipelago.get_champions_x()
         champions_f = pygmo_archipelago.get_champions_f()
         champion_x, champion_f = self._select_best_pygmo_archipelago_solution(
             champions_x, champions_f
         )
-        return PygmoSolutionWrapperParallel(champion_x=champion_x, champion_f=champion_f)
+        population = np.concatenate(
+            [island.get_population().get_x() for island in pygmo_archipelago]
+        )
+        return PygmoSolutionWrapperParallel(
+            champion_x=champion_x,
+            champion_f=champion_f,
+            population=population,
+            telemetry=None if monitor is None else monitor.telemetry,
+        )
+
+    def _checkpoint_settings(self, number_of_islands):
+        settings = attr.asdict(
+            self.solver_args,
+            recurse=False,
+            filter=lambda attribute, _: attribute.name not in _CHECKPOINT_EXECUTION_SETTINGS,
+        )
+        settings.update(
+            optimization_method=self.optimization_method.name,
+            bounds=np.asarray(self.bounds, dtype=np.float64).tolist(),
+            number_of_islands=number_of_islands,
+        )
+        return settings
+
+    @staticmethod
+    def _update_archipelago_monitor(monitor, archipelago):
+        populations = [island.get_population() for island in archipelago]
+        return monitor.update(
+            np.min(archipelago.get_champions_f()),
+            np.concatenate([population.get_f()[:, 0] for population in populations]),
+            sum(population.problem.get_fevals() for population in populations),
+        )
 
-    def _run_pygmo_serial(self, algorithm, problem):
-        population = pg.population(
-            prob=problem, size=self.solver_args.popsize, seed=self.solver_args.seed
+    def _create_pygmo_initial_population(self, problem, batch_evaluator=None):
+        if self.initial_population is None:
+            return pg.population(
+                prob=problem,
+                size=self.solver_args.popsize,
+                b=batch_evaluator,
+                seed=self.solver_args.seed,
+            )
+        population = pg.population(prob=problem, size=0, seed=self.solver_args.seed)
+        initial_population = self._initial_population_within_bounds
+        if batch_evaluator is None:
+            batch_evaluator = pg.bfe(pg.member_bfe())
+        fitness = np.reshape(
+            batch_evaluator(problem, initial_population.ravel()), (len(initial_population), -1)
         )
-        solution = algorithm.evolve(population)
-        return solution
+        for x, f in zip(initial_population, fitness):
+            population.push_back(x, f)
+        return population
+
+    def _run_pygmo_serial(self, algorithm, problem, batch_evaluator=None, monitor=None):
+        population = self._create_pygmo_initial_population(problem, batch_evaluator)
+        if monitor is None:
+            return algorithm.evolve(population)
+
+        for _ in range(self.solver_args.gen):
+            population = algorithm.evolve(population)
+            stop = monitor.update(
+                population.champion_f[0], population.get_f()[:, 0], population.problem.get_fevals()
+            )
+            if stop or self._pygmo_tolerances_reached(population):
+                break
+        return population
 
     def _polish_pygmo_population(self, population):
         pygmo_nlopt_wrapper = pg.nlopt(self.solver_args.polish_method)
@@ -0,0 +1,15 @@
+"""
+Compartmental models declared once and compiled into fast RHS, Jacobian and ensemble kernels.
+
+Registered models are available by name with `get_model`, e.g. ``get_model("seirpdq")``.
+"""
+
+from pydemic.models.compartmental import CompartmentalModel, Flow
+from pydemic.models.registry import available_models, get_model, register_model
+from pydemic.models.seirpdq import SEIRPDQ, calculate_reproduction_number
+from pydemic.models.seirq_diag import SEIRQ_DIAG
+from pydemic.models.metapopulation import (
+    MetaSEIR,
+    MetaSEIRPDQ,
+    mobility_matrix_from_edges,
+)
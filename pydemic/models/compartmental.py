@@ -0,0 +1,536 @@
+"""
+Declarative compartmental models compiled into Numba kernels.
+
+A model is declared once by its compartments, parameters, optional auxiliary (derived) quantities
+and flows between compartments. From this declaration, Python source code is generated for the
+following kernels, which are then compiled with Numba:
+
+* ``rhs(t, y, parameters)``: the time derivatives of a single trajectory;
+
+* ``jacobian(t, y, parameters)``: the analytic Jacobian of ``rhs`` with respect to ``y``;
+
+* ``ensemble_rhs(t, y, parameters)``: the time derivatives of a stacked ensemble, with
+  ``parameters`` shaped ``(number_of_realizations, number_of_parameters)``, compatible with
+  `pydemic.ensemble.solve_ensemble`;
+
+* ``parameter_jacobian(t, y, parameters)``: the analytic Jacobian of ``rhs`` with respect to the
+  parameters, used by the forward sensitivity equations (see `pydemic.sensitivity`);
+
+* ``ensemble_jacobian(t, y, parameters)``: the diagonal blocks of the Jacobian of
+  ``ensemble_rhs``, shaped ``(number_of_realizations, number_of_compartments,
+  number_of_compartments)``.
+
+The analytic Jacobians are given to the stiff solvers, which otherwise approximate them by finite
+differences at the cost of one RHS evaluation per state.
+"""
+
+import keyword
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import attr
+import numpy as np
+from numba import jit
+from scipy.integrate import solve_ivp
+
+from pydemic.ensemble import build_parameter_matrix, solve_ensemble, EnsembleSolution
+from pydemic.integrators import IntegrationMethod, IntegrationResult, integrate
+from pydemic.models.expressions import differentiate, free_symbols, parse_expression, to_source
+from pydemic.sensitivity import (
+    AdjointResult,
+    SensitivityResult,
+    solve_adjoint,
+    solve_sensitivities,
+)
+
+_RESERVED_NAMES = ("t", "y", "parameters", "np", "dydt", "J", "k", "offset")
+
+_KERNEL_NAMES = ("rhs", "jacobian", "parameter_jacobian", "ensemble_rhs", "ensemble_jacobian")
+
+_SCIPY_METHODS_WITH_JACOBIAN = ("LSODA", "BDF", "Radau")
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Flow:
+    """
+    A flow of individuals between two compartments.
+
+    Members
+    ----------------
+
+    :ivar str source:
+        The compartment losing individuals, or None for an inflow (e.g. births).
+
+    :ivar str target:
+        The compartment receiving individuals, or None for an outflow (e.g. natural deaths).
+
+    :ivar str rate:
+        The flow rate (individuals per unit of time) as a Python expression of the compartments,
+        parameters, auxiliary quantities and time ``t``.
+
+    :ivar tuple counters:
+        Compartments that only accumulate this flow, such as cumulative confirmed cases.
+    """
+
+    source: str
+    target: str
+    rate: str
+    counters: tuple = ()
+
+
+@attr.s(auto_attribs=True)
+class CompartmentalModel:
+    """
+    A compartmental model declared by its flows and compiled into fast kernels on first use.
+
+    Members
+    ----------------
+
+    :ivar str name:
+        The model name, used as key in the model registry.
+
+    :ivar tuple compartments:
+        The compartment names, in state order.
+
+    :ivar tuple parameters:
+        The parameter names, in the order of the parameter arrays.
+
+    :ivar tuple flows:
+        The model flows.
+
+    :ivar dict auxiliaries:
+        Derived quantities (name to expression), computed in the given order before the flows.
+
+    :ivar dict default_parameters:
+        Default values for the parameters.
+
+    :ivar str description:
+        A short description of the model and its source.
+    """
+
+    name: str
+    compartments: tuple
+    parameters: tuple
+    flows: tuple
+    auxiliaries: dict = attr.Factory(dict)
+    default_parameters: dict = attr.Factory(dict)
+    description: str = ""
+    _kernels: dict = None
+
+    def __attrs_post_init__(self):
+        self.compartments = tuple(self.compartments)
+        self.parameters = tuple(self.parameters)
+        self.flows = tuple(self.flows)
+        self._validate()
+        self._kernels = dict()
+
+    @property
+    def number_of_compartments(self):
+        return len(self.compartments)
+
+    @property
+    def number_of_parameters(self):
+        return len(self.parameters)
+
+    @property
+    def rhs(self):
+        return self._get_kernel("rhs")
+
+    @property
+    def jacobian(self):
+        return self._get_kernel("jacobian")
+
+    @property
+    def parameter_jacobian(self):
+        return self._get_kernel("parameter_jacobian")
+
+    @property
+    def ensemble_rhs(self):
+        return self._get_kernel("ensemble_rhs")
+
+    @property
+    def ensemble_jacobian(self):
+        return self._get_kernel("ensemble_jacobian")
+
+    def jacobian_sparsity(self) -> np.ndarray:
+        """
+        The structural nonzeros of the Jacobian, from the symbolic derivatives of the flows.
+
+        :return:
+            A `(number_of_compartments, number_of_compartments)` boolean matrix.
+        :rtype: numpy.ndarray
+        """
+        pattern = np.zeros((self.number_of_compartments, self.number_of_compartments), dtype=bool)
+        for i, j, _ in self._jacobian_entries(self.compartments):
+            pattern[i, j] = True
+        return pattern
+
+    def parameter_vector(self, **parameter_values) -> np.ndarray:
+        """
+        Build a parameter array, filling missing parameters with the defaults.
+        """
+        return self.parameter_matrix(1, **parameter_values)[0]
+
+    def parameter_matrix(self, number_of_realizations: int, **parameter_values) -> np.ndarray:
+        """
+        Build a `(number_of_realizations, number_of_parameters)` parameter matrix. See
+        `pydemic.ensemble.build_parameter_matrix`.
+        """
+        return build_parameter_matrix(
+            number_of_realizations,
+            parameter_names=self.parameters,
+            default_parameters=self.default_parameters,
+            **parameter_values,
+        )
+
+    def solve(
+        self,
+        y0: np.ndarray,
+        t_span: Tuple[float, float],
+        parameters: np.ndarray,
+        t_eval: np.ndarray = None,
+        method: IntegrationMethod = IntegrationMethod.DOPRI5,
+        **kwargs,
+    ) -> IntegrationResult:
+        """
+        Integrate a single trajectory with the compiled integrators. See
+        `pydemic.integrators.integrate` for the other arguments.
+
+        If `method` is a string, `scipy.integrate.solve_ivp` is used instead and its solution is
+        returned. In both cases, the analytic Jacobian is used by the implicit methods.
+        """
+        parameters = np.asarray(parameters, dtype=np.float64)
+        if isinstance(method, str):
+            rhs, jacobian = self.rhs, self.jacobian
+            if method in _SCIPY_METHODS_WITH_JACOBIAN:
+                kwargs.setdefault("jac", lambda t, y: jacobian(t, y, parameters))
+            return solve_ivp(
+                fun=lambda t, y: rhs(t, y, parameters),
+                t_span=t_span,
+                y0=np.asarray(y0, dtype=np.float64),
+                t_eval=t_eval,
+                method=method,
+                **kwargs,
+            )
+        return integrate(
+            self.rhs,
+            t_span,
+            y0,
+            parameters,
+            t_eval=t_eval,
+            method=method,
+            jacobian=self.jacobian,
+            **kwargs,
+        )
+
+    def solve_sensitivities(
+        self,
+        y0: np.ndarray,
+        t_span: Tuple[float, float],
+        parameters: np.ndarray,
+        sensitivity_parameters: Sequence[str] = None,
+        initial_sensitivities: np.ndarray = None,
+        t_eval: np.ndarray = None,
+        method: IntegrationMethod = IntegrationMethod.DOPRI5,
+        **kwargs,
+    ) -> SensitivityResult:
+        """
+        Integrate a single trajectory together with its sensitivities with respect to the
+        parameters named in `sensitivity_parameters` (all of them if None). See
+        `pydemic.sensitivity.solve_sensitivities` for the other arguments.
+        """
+        return solve_sensitivities(
+            self.rhs,
+            self.jacobian,
+            self.parameter_jacobian,
+            t_span,
+            y0,
+            parameters,
+            parameter_indices=self._parameter_indices(sensitivity_parameters),
+            initial_sensitivities=initial_sensitivities,
+            t_eval=t_eval,
+            method=method,
+            **kwargs,
+        )
+
+    def solve_adjoint(
+        self,
+        y0: np.ndarray,
+        t_eval: np.ndarray,
+        parameters: np.ndarray,
+        cost_gradient: Callable,
+        sensitivity_parameters: Sequence[str] = None,
+        initial_sensitivities: np.ndarray = None,
+        method: IntegrationMethod = IntegrationMethod.DOPRI5,
+        **kwargs,
+    ) -> AdjointResult:
+        """
+        Integrate a single trajectory and compute the gradient of a cost of its values at `t_eval`
+        with respect to the parameters named in `sensitivity_parameters` (all of them if None),
+        with the adjoint method. See `pydemic.sensitivity.solve_adjoint` for the other arguments.
+        """
+        return solve_adjoint(
+            self.rhs,
+            self.jacobian,
+            self.parameter_jacobian,
+            t_eval,
+            y0,
+            parameters,
+            cost_gradient,
+            parameter_indices=self._parameter_indices(sensitivity_parameters),
+            initial_sensitivities=initial_sensitivities,
+            method=method,
+            **kwargs,
+        )
+
+    def solve_ensemble(
+        self,
+        parameters: np.ndarray,
+        initial_conditions: np.ndarray,
+        t_span: Tuple[float, float],
+        t_eval: np.ndarray = None,
+        **kwargs,
+    ) -> EnsembleSolution:
+        """
+        Integrate an ensemble of realizations at once, with the analytic Jacobian. See
+        `pydemic.ensemble.solve_ensemble`.
+        """
+        kwargs.setdefault("ensemble_jacobian", self.ensemble_jacobian)
+        return solve_ensemble(
+            self.ensemble_rhs,
+            parameters,
+            initial_conditions,
+            t_span,
+            t_eval=t_eval,
+            compartments=self.compartments,
+            **kwargs,
+        )
+
+    def generate_source(self, kernel_name: str) -> str:
+        """
+        Generate the Python source code of a kernel, before compilation.
+
+        :param str kernel_name:
+            One of `"rhs"`, `"jacobian"`, `"parameter_jacobian"`, `"ensemble_rhs"` or
+            `"ensemble_jacobian"`.
+
+        :return:
+            The source code of a function named as the kernel.
+        :rtype: str
+        """
+        if kernel_name == "rhs":
+            return self._generate_rhs_source()
+        if kernel_name == "jacobian":
+            return self._generate_jacobian_source()
+        if kernel_name == "parameter_jacobian":
+            return self._generate_parameter_jacobian_source()
+        if kernel_name == "ensemble_rhs":
+            return self._generate_ensemble_rhs_source()
+        if kernel_name == "ensemble_jacobian":
+            return self._generate_ensemble_jacobian_source()
+        raise ValueError(f"Unknown kernel: {kernel_name}. Options are: {_KERNEL_NAMES}.")
+
+    def _parameter_indices(self, parameter_names):
+        if parameter_names is None:
+            parameter_names = self.parameters
+        unknown_parameters = set(parameter_names) - set(self.parameters)
+        if unknown_parameters:
+            raise ValueError(f"Unknown parameters: {sorted(unknown_parameters)}.")
+        return [self.parameters.index(name) for name in parameter_names]
+
+    def _get_kernel(self, kernel_name):
+        if kernel_name not in self._kernels:
+            self._kernels[kernel_name] = _compile_kernel(
+                self.generate_source(kernel_name), kernel_name
+            )
+        return self._kernels[kernel_name]
+
+    def _validate(self):
+        names = self.compartments + self.parameters + tuple(self.auxiliaries)
+        for name in names:
+            if not name.isidentifier() or keyword.iskeyword(name):
+                raise ValueError(f"Invalid name: {name}.")
+            if name in _RESERVED_NAMES or name.startswith("_"):
+                raise ValueError(f"Name {name} is reserved.")
+        if len(set(names)) != len(names):
+            raise ValueError("Compartment, parameter and auxiliary names must be unique.")
+
+        unknown_defaults = set(self.default_parameters) - set(self.parameters)
+        if unknown_defaults:
+            raise ValueError(f"Defaults given for unknown parameters: {sorted(unknown_defaults)}.")
+
+        known_symbols = {"t"} | set(self.compartments) | set(self.parameters)
+        for auxiliary_name, expression in self.auxiliaries.items():
+            self._check_symbols(parse_expression(expression), known_symbols, expression)
+            known_symbols.add(auxiliary_name)
+
+        for flow in self.flows:
+            if flow.source is None and flow.target is None and not flow.counters:
+                raise ValueError(f"Flow {flow} has no source, target or counters.")
+            for compartment in (flow.source, flow.target) + tuple(flow.counters):
+                if compartment is not None and compartment not in self.compartments:
+                    raise ValueError(f"Unknown compartment {compartment} in flow {flow}.")
+            self._check_symbols(parse_expression(flow.rate), known_symbols, flow.rate)
+
+    @staticmethod
+    def _check_symbols(node, known_symbols, expression):
+        unknown_symbols = free_symbols(node) - known_symbols
+        if unknown_symbols:
+            raise ValueError(f"Unknown symbols {sorted(unknown_symbols)} in: {expression}")
+
+    def _parsed_auxiliaries(self) -> List[Tuple[str, object]]:
+        return [(name, parse_expression(expr)) for name, expr in self.auxiliaries.items()]
+
+    def _flow_terms(self) -> Dict[str, List[Tuple[str, int]]]:
+        """
+        Map each compartment to its `(sign, flow_index)` terms.
+        """
+        terms = {compartment: [] for compartment in self.compartments}
+        for flow_index, flow in enumerate(self.flows):
+            if flow.source is not None:
+                terms[flow.source].append(("-", flow_index))
+            if flow.target is not None:
+                terms[flow.target].append(("+", flow_index))
+            for counter in flow.counters:
+                terms[counter].append(("+", flow_index))
+        return terms
+
+    def _generate_common_lines(self, state_index, parameter_index):
+        lines = []
+        for i, compartment in enumerate(self.compartments):
+            lines.append(f"{compartment} = y[{state_index(i)}]")
+        for j, parameter in enumerate(self.parameters):
+            lines.append(f"{parameter} = parameters[{parameter_index(j)}]")
+        for auxiliary_name, node in self._parsed_auxiliaries():
+            lines.append(f"{auxiliary_name} = {to_source(node)}")
+        return lines
+
+    def _generate_derivative_lines(self, state_index, output_index):
+        lines = []
+        for flow_index, flow in enumerate(self.flows):
+            lines.append(f"_flow_{flow_index} = {to_source(parse_expression(flow.rate))}")
+        for i, (compartment, terms) in enumerate(self._flow_terms().items()):
+            lines.append(f"dydt[{output_index(i)}] = {_signed_sum(terms, '_flow_{}')}")
+        return lines
+
+    def _generate_rhs_source(self):
+        body = self._generate_common_lines(str, str)
+        body.append(f"dydt = np.empty({self.number_of_compartments})")
+        body += self._generate_derivative_lines(str, str)
+        body.append("return dydt")
+        return _function_source("rhs", body)
+
+    def _generate_ensemble_rhs_source(self):
+        n = self.number_of_compartments
+        loop_body = [f"offset = k * {n}"]
+        loop_body += self._generate_common_lines(lambda i: f"offset + {i}", lambda j: f"k, {j}")
+        loop_body += self._generate_derivative_lines(
+            lambda i: f"offset + {i}", lambda i: f"offset + {i}"
+        )
+        body = ["dydt = np.empty_like(y)", "for k in range(parameters.shape[0]):"]
+        body += [f"    {line}" for line in loop_body]
+        body.append("return dydt")
+        return _function_source("ensemble_rhs", body)
+
+    def _jacobian_entries(self, variables):
+        """
+        Generate the computations of the Jacobian with respect to `variables` (compartments or
+        parameters), yielding `(row, column, lines)` for each nonzero entry. The lines compute the
+        derivatives needed by the entry, which is the last line expression.
+        """
+        parsed_auxiliaries = self._parsed_auxiliaries()
+        parsed_rates = [parse_expression(flow.rate) for flow in self.flows]
+        flow_terms = self._flow_terms()
+        for j, variable in enumerate(variables):
+            # Chain rule through the auxiliary quantities
+            lines = []
+            auxiliary_derivatives = dict()
+            for auxiliary_name, node in parsed_auxiliaries:
+                derivative = differentiate(node, variable, auxiliary_derivatives)
+                if derivative is not None:
+                    derivative_name = f"_d_{auxiliary_name}_d_{variable}"
+                    lines.append(f"{derivative_name} = {to_source(derivative)}")
+                    auxiliary_derivatives[auxiliary_name] = _name_node(derivative_name)
+
+            nonzero_rate_derivatives = set()
+            for flow_index, rate in enumerate(parsed_rates):
+                derivative = differentiate(rate, variable, auxiliary_derivatives)
+                if derivative is not None:
+                    lines.append(f"_d_flow_{flow_index}_d_{variable} = {to_source(derivative)}")
+                    nonzero_rate_derivatives.add(flow_index)
+
+            for i, compartment in enumerate(self.compartments):
+                terms = [
+                    (sign, flow_index)
+                    for sign, flow_index in flow_terms[compartment]
+                    if flow_index in nonzero_rate_derivatives
+                ]
+                if terms:
+                    lines.append(_signed_sum(terms, f"_d_flow_{{}}_d_{variable}"))
+                    yield i, j, lines
+                    lines = []
+
+    def _generate_jacobian_lines(self, entry_index, variables=None):
+        if variables is None:
+            variables = self.compartments
+        lines = []
+        for i, j, entry_lines in self._jacobian_entries(variables):
+            lines += entry_lines[:-1]
+            lines.append(f"J[{entry_index(i, j)}] = {entry_lines[-1]}")
+        return lines
+
+    def _generate_jacobian_source(self):
+        n = self.number_of_compartments
+        body = self._generate_common_lines(str, str)
+        body.append(f"J = np.zeros(({n}, {n}))")
+        body += self._generate_jacobian_lines(lambda i, j: f"{i}, {j}")
+        body.append("return J")
+        return _function_source("jacobian", body)
+
+    def _generate_parameter_jacobian_source(self):
+        body = self._generate_common_lines(str, str)
+        body.append(f"J = np.zeros(({self.number_of_compartments}, {self.number_of_parameters}))")
+        body += self._generate_jacobian_lines(lambda i, j: f"{i}, {j}", self.parameters)
+        body.append("return J")
+        return _function_source("parameter_jacobian", body)
+
+    def _generate_ensemble_jacobian_source(self):
+        n = self.number_of_compartments
+        loop_body = [f"offset = k * {n}"]
+        loop_body += self._generate_common_lines(lambda i: f"offset + {i}", lambda j: f"k, {j}")
+        loop_body += self._generate_jacobian_lines(lambda i, j: f"k, {i}, {j}")
+        body = [
+            f"J = np.zeros((parameters.shape[0], {n}, {n}))",
+            "for k in range(parameters.shape[0]):",
+        ]
+        body += [f"    {line}" for line in loop_body]
+        body.append("return J")
+        return _function_source("ensemble_jacobian", body)
+
+
+def _signed_sum(terms, name_template):
+    if not terms:
+        return "0.0"
+    source = ""
+    for sign, index in terms:
+        name = name_template.format(index)
+        if not source:
+            source = f"-{name}" if sign == "-" else name
+        else:
+            source += f" {sign} {name}"
+    return source
+
+
+def _function_source(function_name, body_lines):
+    lines = [f"def {function_name}(t, y, parameters):"]
+    lines += [f"    {line}" for line in body_lines]
+    return "\n".join(lines) + "\n"
+
+
+def _compile_kernel(source, kernel_name):
+    namespace = {"np": np}
+    exec(compile(source, f"<pydemic generated {kernel_name}>", "exec"), namespace)
+    return jit(nopython=True)(namespace[kernel_name])
+
+
+def _name_node(name):
+    return parse_expression(name)
@@ -0,0 +1,303 @@
+"""
+Symbolic manipulation of the rate expressions used to declare compartmental models.
+
+Rate expressions are plain Python expressions (e.g. ``"beta / N * S * I"``), parsed with ``ast``.
+This module differentiates them analytically and translates them back to Python source code that
+Numba can compile. Supported constructs are numbers, names, ``+ - * / **``, unary minus, the
+functions in `SUPPORTED_FUNCTIONS` (optionally prefixed by ``np.``) and conditional expressions
+(``a if t < t0 else b``).
+"""
+
+import ast
+from typing import Dict, Optional, Set
+
+SUPPORTED_FUNCTIONS = ("exp", "log", "sqrt", "sin", "cos")
+
+_NUMBER_NODES = tuple(getattr(ast, name) for name in ("Constant", "Num") if hasattr(ast, name))
+
+_BINARY_OPERATORS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**"}
+
+_COMPARISON_OPERATORS = {
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+}
+
+
+def parse_expression(expression: str) -> ast.AST:
+    """
+    Parse a rate expression, validating that only supported constructs are used.
+
+    :param str expression:
+        The expression source.
+
+    :return:
+        The expression tree.
+    :rtype: ast.AST
+    """
+    try:
+        node = ast.parse(expression.strip(), mode="eval").body
+    except SyntaxError as error:
+        raise ValueError(f"Invalid expression: {expression}") from error
+    _validate(node, expression)
+    return node
+
+
+def free_symbols(node: ast.AST) -> Set[str]:
+    """
+    The names used as values in an expression, i.e. except function names.
+    """
+    function_nodes = set()
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            function_nodes.add(id(child.func))
+        elif isinstance(child, ast.Attribute):
+            function_nodes.add(id(child.value))
+    return {
+        child.id
+        for child in ast.walk(node)
+        if isinstance(child, ast.Name) and id(child) not in function_nodes
+    }
+
+
+def to_source(node: Optional[ast.AST]) -> str:
+    """
+    Translate an expression tree to Python source code. Zero derivatives (None) become ``0.0``.
+    """
+    if node is None:
+        return "0.0"
+    if _is_number(node):
+        return repr(float(_number_value(node)))
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.BinOp):
+        operator = _BINARY_OPERATORS[type(node.op)]
+        return f"({to_source(node.left)} {operator} {to_source(node.right)})"
+    if isinstance(node, ast.UnaryOp):
+        operator = "-" if isinstance(node.op, ast.USub) else "+"
+        return f"({operator}{to_source(node.operand)})"
+    if isinstance(node, ast.Call):
+        arguments = ", ".join(to_source(argument) for argument in node.args)
+        return f"np.{_function_name(node)}({arguments})"
+    if isinstance(node, ast.IfExp):
+        return f"({to_source(node.body)} if {to_source(node.test)} else {to_source(node.orelse)})"
+    if isinstance(node, ast.Compare):
+        terms = [to_source(node.left)]
+        for operator, comparator in zip(node.ops, node.comparators):
+            terms.append(_COMPARISON_OPERATORS[type(operator)])
+            terms.append(to_source(comparator))
+        return f"({' '.join(terms)})"
+    if isinstance(node, ast.BoolOp):
+        operator = " and " if isinstance(node.op, ast.And) else " or "
+        return f"({operator.join(to_source(value) for value in node.values)})"
+    raise ValueError(f"Unsupported expression node: {type(node).__name__}")
+
+
+def differentiate(
+    node: ast.AST, variable: str, symbol_derivatives: Dict[str, Optional[ast.AST]] = None
+) -> Optional[ast.AST]:
+    """
+    Differentiate an expression with respect to a variable.
+
+    :param ast.AST node:
+        The expression tree.
+
+    :param str variable:
+        The name of the variable.
+
+    :param dict symbol_derivatives:
+        Derivatives of intermediate symbols (e.g. auxiliary expressions) with respect to
+        `variable`, used to apply the chain rule. A missing or None entry means zero derivative.
+
+    :return:
+        The derivative expression tree, or None if it is identically zero.
+    :rtype: ast.AST|None
+    """
+    if symbol_derivatives is None:
+        symbol_derivatives = {}
+
+    if _is_number(node):
+        return None
+    if isinstance(node, ast.Name):
+        if node.id == variable:
+            return _number(1.0)
+        return symbol_derivatives.get(node.id)
+    if isinstance(node, ast.UnaryOp):
+        derivative = differentiate(node.operand, variable, symbol_derivatives)
+        return _negative(derivative) if isinstance(node.op, ast.USub) else derivative
+    if isinstance(node, ast.BinOp):
+        left, right = node.left, node.right
+        left_derivative = differentiate(left, variable, symbol_derivatives)
+        right_derivative = differentiate(right, variable, symbol_derivatives)
+        if isinstance(node.op, ast.Add):
+            return _add(left_derivative, right_derivative)
+        if isinstance(node.op, ast.Sub):
+            return _subtract(left_derivative, right_derivative)
+        if isinstance(node.op, ast.Mult):
+            return _add(_multiply(left_derivative, right), _multiply(left, right_derivative))
+        if isinstance(node.op, ast.Div):
+            return _subtract(
+                _divide(left_derivative, right),
+                _divide(_multiply(left, right_derivative), _multiply(right, right)),
+            )
+        if isinstance(node.op, ast.Pow):
+            if right_derivative is None:
+                # d(u ** n) = n * u ** (n - 1) * du
+                exponent_minus_one = _binary(right, ast.Sub(), _number(1.0))
+                power = _binary(left, ast.Pow(), exponent_minus_one)
+                return _multiply(_multiply(right, power), left_derivative)
+            # d(u ** v) = u ** v * (dv * log(u) + v * du / u)
+            log_left = _call("log", left)
+            return _multiply(
+                node,
+                _add(
+                    _multiply(right_derivative, log_left),
+                    _divide(_multiply(right, left_derivative), left),
+                ),
+            )
+    if isinstance(node, ast.Call):
+        argument = node.args[0]
+        argument_derivative = differentiate(argument, variable, symbol_derivatives)
+        if argument_derivative is None:
+            return None
+        function_name = _function_name(node)
+        if function_name == "exp":
+            return _multiply(_call("exp", argument), argument_derivative)
+        if function_name == "log":
+            return _divide(argument_derivative, argument)
+        if function_name == "sqrt":
+            return _divide(argument_derivative, _multiply(_number(2.0), _call("sqrt", argument)))
+        if function_name == "sin":
+            return _multiply(_call("cos", argument), argument_derivative)
+        if function_name == "cos":
+            return _negative(_multiply(_call("sin", argument), argument_derivative))
+    if isinstance(node, ast.IfExp):
+        body_derivative = differentiate(node.body, variable, symbol_derivatives)
+        orelse_derivative = differentiate(node.orelse, variable, symbol_derivatives)
+        if body_derivative is None and orelse_derivative is None:
+            return None
+        return ast.IfExp(
+            test=node.test,
+            body=_zero_if_none(body_derivative),
+            orelse=_zero_if_none(orelse_derivative),
+        )
+    raise ValueError(f"Cannot differentiate expression node: {type(node).__name__}")
+
+
+def _validate(node, expression):
+    for child in ast.walk(node):
+        if isinstance(child, ast.Call):
+            if len(child.args) != 1 or child.keywords:
+                raise ValueError(f"Functions must take a single argument in: {expression}")
+            if _function_name(child) not in SUPPORTED_FUNCTIONS:
+                raise ValueError(f"Unsupported function in: {expression}")
+        elif isinstance(child, ast.BinOp):
+            if type(child.op) not in _BINARY_OPERATORS:
+                raise ValueError(f"Unsupported operator in: {expression}")
+        elif isinstance(child, ast.UnaryOp):
+            if not isinstance(child.op, (ast.USub, ast.UAdd)):
+                raise ValueError(f"Unsupported operator in: {expression}")
+        elif isinstance(child, ast.Compare):
+            if any(type(operator) not in _COMPARISON_OPERATORS for operator in child.ops):
+                raise ValueError(f"Unsupported comparison in: {expression}")
+        elif _is_number(child):
+            if not isinstance(_number_value(child), (int, float)):
+                raise ValueError(f"Only real numbers are allowed in: {expression}")
+        elif not isinstance(
+            child,
+            (
+                ast.Name,
+                ast.Attribute,
+                ast.IfExp,
+                ast.BoolOp,
+                ast.expr_context,
+                ast.operator,
+                ast.unaryop,
+                ast.cmpop,
+                ast.boolop,
+            ),
+        ):
+            raise ValueError(f"Unsupported construct {type(child).__name__} in: {expression}")
+        if isinstance(child, ast.Attribute):
+            if not (isinstance(child.value, ast.Name) and child.value.id == "np"):
+                raise ValueError(f"Only numpy functions are allowed in: {expression}")
+
+
+def _function_name(call_node):
+    function = call_node.func
+    if isinstance(function, ast.Attribute):
+        return function.attr
+    if isinstance(function, ast.Name):
+        return function.id
+    raise ValueError("Unsupported function call.")
+
+
+def _is_number(node):
+    return isinstance(node, _NUMBER_NODES) and not isinstance(_number_value(node), (str, bytes))
+
+
+def _number_value(node):
+    return node.value if hasattr(node, "value") else node.n
+
+
+def _number(value):
+    return ast.Constant(value=value) if hasattr(ast, "Constant") else ast.Num(n=value)
+
+
+def _is_one(node):
+    return node is not None and _is_number(node) and _number_value(node) == 1
+
+
+def _zero_if_none(node):
+    return _number(0.0) if node is None else node
+
+
+def _binary(left, operator, right):
+    return ast.BinOp(left=left, op=operator, right=right)
+
+
+def _call(function_name, argument):
+    return ast.Call(func=ast.Name(id=function_name, ctx=ast.Load()), args=[argument], keywords=[])
+
+
+def _negative(node):
+    if node is None:
+        return None
+    return ast.UnaryOp(op=ast.USub(), operand=node)
+
+
+def _add(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return _binary(left, ast.Add(), right)
+
+
+def _subtract(left, right):
+    if right is None:
+        return left
+    if left is None:
+        return _negative(right)
+    return _binary(left, ast.Sub(), right)
+
+
+def _multiply(left, right):
+    if left is None or right is None:
+        return None
+    if _is_one(left):
+        return right
+    if _is_one(right):
+        return left
+    return _binary(left, ast.Mult(), right)
+
+
+def _divide(left, right):
+    if left is None:
+        return None
+    if _is_one(right):
+        return left
+    return _binary(left, ast.Div(), right)
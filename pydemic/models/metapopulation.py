@@ -0,0 +1,502 @@
+"""
+Metapopulation compartmental models, where each patch (e.g. a municipality) has its own
+compartments and patches are coupled by cross-infection and mobility.
+
+The state is ordered compartment-major, i.e. ``[S_1, ..., S_n, E_1, ..., E_n, ...]``, as in the
+metapopulation scripts. The RHS is written as
+
+    dY/dt = L Y + (M * (Y C)) + incidence terms + births,
+
+where ``Y`` is the ``(number_of_compartments, number_of_patches)`` state matrix, ``L`` the
+(small) matrix of local linear transitions, shared by all patches, ``C`` the mobility matrix and
+``M`` the relative migration rate of each compartment. Hence, each RHS evaluation costs a few
+matrix products and no Python loops over patches. Work arrays are allocated once per model.
+
+The coupling (``beta``) and mobility (``C``) matrices can be dense arrays or `scipy.sparse`
+matrices (stored as CSR). With sparse matrices, the cost of an RHS evaluation and the memory scale
+with the number of mobility edges, and the Jacobian sparsity pattern (`jacobian_sparsity`) is
+given to the stiff solvers, which is required to simulate tens of thousands of patches. The
+analytic Jacobian (`jacobian`) is also available as a sparse matrix, and it is used by default
+with BDF and Radau.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Sequence, Tuple
+
+import attr
+import numpy as np
+import scipy.sparse as sp
+from scipy.integrate import solve_ivp
+
+_SCIPY_METHODS_WITH_SPARSITY = ("BDF", "Radau")
+
+
+def _as_patch_operator(matrix):
+    if matrix is None:
+        return None
+    if sp.issparse(matrix):
+        return sp.csr_matrix(matrix, dtype=np.float64)
+    return np.asarray(matrix, dtype=np.float64)
+
+
+def mobility_matrix_from_edges(
+    number_of_patches: int,
+    origins: Sequence[int],
+    destinations: Sequence[int],
+    rates: Sequence[float],
+) -> sp.csr_matrix:
+    """
+    Build a sparse mobility matrix from a list of edges (e.g. a commuting network).
+
+    Each edge `k` moves individuals from `origins[k]` to `destinations[k]` with rate `rates[k]`.
+    The diagonal holds the total outflow of each patch, with negative sign, so each row sums up
+    to zero. Repeated edges are summed.
+
+    :param int number_of_patches:
+        The number of patches.
+
+    :param origins:
+        The origin patch of each edge.
+
+    :param destinations:
+        The destination patch of each edge.
+
+    :param rates:
+        The mobility rate of each edge.
+
+    :return:
+        The mobility matrix.
+    :rtype: scipy.sparse.csr_matrix
+    """
+    origins = np.asarray(origins, dtype=np.int64)
+    destinations = np.asarray(destinations, dtype=np.int64)
+    rates = np.asarray(rates, dtype=np.float64)
+    if not origins.shape == destinations.shape == rates.shape:
+        raise ValueError("Origins, destinations and rates must have the same length.")
+    is_self_loop = origins == destinations
+    origins, destinations, rates = (
+        origins[~is_self_loop],
+        destinations[~is_self_loop],
+        rates[~is_self_loop],
+    )
+    outflows = np.bincount(origins, weights=rates, minlength=number_of_patches)
+    patches = np.arange(number_of_patches)
+    C = sp.coo_matrix(
+        (
+            np.concatenate((rates, -outflows)),
+            (np.concatenate((origins, patches)), np.concatenate((destinations, patches))),
+        ),
+        shape=(number_of_patches, number_of_patches),
+    )
+    return C.tocsr()
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class _MetapopulationModel(ABC):
+    """
+    Shared machinery of the metapopulation models. Subclasses define `compartments`, the local
+    transition matrix, the incidence and its derivatives, and optionally the births.
+    """
+
+    name = ""
+    compartments = ()
+    _incidence_dependencies = ()
+    _transmitting_compartment = None
+
+    def __attrs_post_init__(self):
+        number_of_patches = np.shape(self.beta)[0]
+        if np.shape(self.beta) != (number_of_patches, number_of_patches):
+            raise ValueError("The cross-coupling matrix beta must be square.")
+        if self.C is not None and np.shape(self.C) != (number_of_patches, number_of_patches):
+            raise ValueError(
+                "The mobility matrix C must be (number_of_patches, number_of_patches)."
+            )
+        if self.M is not None and np.shape(self.M) != (self.number_of_compartments,):
+            raise ValueError("M must have one migration rate for each compartment.")
+
+        # Models are immutable, so work arrays and constant operators are built only once
+        workspace = dict(
+            local_transitions=self._local_transition_matrix(),
+            migration_rates=self._migration_rates()[:, np.newaxis],
+            transposed_mobility=self.C.T.tocsr() if sp.issparse(self.C) else None,
+            linear_jacobian=None,
+            force_of_infection=np.empty(number_of_patches),
+            incidence=np.empty(number_of_patches),
+            mobility_terms=np.empty((self.number_of_compartments, number_of_patches)),
+        )
+        object.__setattr__(self, "_workspace", workspace)
+
+    @property
+    def number_of_compartments(self):
+        return len(self.compartments)
+
+    @property
+    def number_of_patches(self):
+        return np.shape(self.beta)[0]
+
+    @property
+    def number_of_states(self):
+        return self.number_of_compartments * self.number_of_patches
+
+    @property
+    def is_sparse(self):
+        return sp.issparse(self.beta) or sp.issparse(self.C)
+
+    def rhs(self, t: float, y: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Evaluate the RHS.
+
+        :param float t:
+            The current time.
+
+        :param numpy.ndarray y:
+            The state, compartment-major.
+
+        :param numpy.ndarray out:
+            Optional array to store the result in place. Note that `scipy.integrate.solve_ivp`
+            keeps references to returned arrays, so do not reuse the same `out` there.
+
+        :return:
+            The time derivatives, compartment-major.
+        :rtype: numpy.ndarray
+        """
+        if out is None:
+            out = np.empty(self.number_of_states)
+        Y = self.as_matrix(y)
+        dY = out.reshape(self.number_of_compartments, self.number_of_patches)
+        workspace = self._workspace
+
+        np.dot(workspace["local_transitions"], Y, out=dY)
+        if self.C is not None:
+            mobility_terms = workspace["mobility_terms"]
+            if sp.issparse(self.C):
+                mobility_terms[:] = (workspace["transposed_mobility"] @ Y.T).T
+            else:
+                np.dot(Y, self.C, out=mobility_terms)
+            mobility_terms *= workspace["migration_rates"]
+            dY += mobility_terms
+
+        incidence = self._compute_incidence(Y)
+        dY[0] -= incidence
+        dY[1] += incidence
+        self._add_births(Y, dY)
+        return out
+
+    def as_matrix(self, y: np.ndarray) -> np.ndarray:
+        """
+        View a compartment-major state as a `(number_of_compartments, number_of_patches)` matrix.
+        """
+        return np.reshape(y, (self.number_of_compartments, self.number_of_patches))
+
+    def solve(
+        self,
+        y0: np.ndarray,
+        t_span: Tuple[float, float],
+        t_eval: np.ndarray = None,
+        method: str = "LSODA",
+        **kwargs,
+    ):
+        """
+        Integrate the model with `scipy.integrate.solve_ivp`.
+
+        The analytic sparse Jacobian is given to the methods that support it (BDF and Radau),
+        which are recommended for large numbers of patches, unless `jac` or `jac_sparsity` is
+        given.
+
+        :param numpy.ndarray y0:
+            The initial conditions, compartment-major or as a
+            `(number_of_compartments, number_of_patches)` matrix.
+
+        :return:
+            The `scipy.integrate.solve_ivp` solution.
+        """
+        y0 = np.ravel(np.asarray(y0, dtype=np.float64))
+        if y0.size != self.number_of_states:
+            raise ValueError("Initial conditions must have one value for each state.")
+        if method in _SCIPY_METHODS_WITH_SPARSITY and not {"jac", "jac_sparsity"} & set(kwargs):
+            kwargs["jac"] = self.jacobian
+        return solve_ivp(fun=self.rhs, t_span=t_span, y0=y0, t_eval=t_eval, method=method, **kwargs)
+
+    def jacobian(self, t: float, y: np.ndarray) -> sp.csr_matrix:
+        """
+        Evaluate the analytic Jacobian of the RHS.
+
+        :param float t:
+            The current time.
+
+        :param numpy.ndarray y:
+            The state, compartment-major.
+
+        :return:
+            The `(number_of_states, number_of_states)` Jacobian, compartment-major.
+        :rtype: scipy.sparse.csr_matrix
+        """
+        if self._workspace["linear_jacobian"] is None:
+            self._workspace["linear_jacobian"] = self._linear_jacobian()
+        blocks = [[None] * self.number_of_compartments for _ in range(self.number_of_compartments)]
+        for compartment_index, derivative in self._incidence_derivatives(self.as_matrix(y)):
+            blocks[0][compartment_index] = -derivative
+            blocks[1][compartment_index] = derivative
+        # bmat needs at least one block in each row and column to infer the shapes
+        zero_block = sp.csr_matrix((self.number_of_patches, self.number_of_patches))
+        for i in range(self.number_of_compartments):
+            if blocks[i][i] is None:
+                blocks[i][i] = zero_block
+        incidence_jacobian = sp.bmat(blocks, format="csr")
+        return self._workspace["linear_jacobian"] + incidence_jacobian
+
+    def jacobian_sparsity(self) -> sp.csr_matrix:
+        """
+        The sparsity pattern of the RHS Jacobian, compartment-major.
+
+        :return:
+            A `(number_of_states, number_of_states)` matrix with ones at the structural nonzeros.
+        :rtype: scipy.sparse.csr_matrix
+        """
+        identity = sp.identity(self.number_of_patches, format="csr")
+        local_pattern = (self._workspace["local_transitions"] != 0).astype(np.float64)
+        pattern = sp.kron(local_pattern, identity, format="csr")
+        if self.C is not None:
+            migrating_compartments = sp.diags((self._migration_rates() != 0).astype(np.float64))
+            mobility_pattern = sp.csr_matrix(self.C.T != 0, dtype=np.float64)
+            pattern = pattern + sp.kron(migrating_compartments, mobility_pattern, format="csr")
+
+        # The incidence moves individuals from S (row block 0) to E (row block 1)
+        transmission_pattern = sp.csr_matrix(self.beta != 0, dtype=np.float64) + identity
+        incidence_selector = np.zeros((self.number_of_compartments, self.number_of_compartments))
+        for compartment_index in self._incidence_dependencies:
+            incidence_selector[[0, 1], compartment_index] = 1.0
+        pattern = pattern + sp.kron(incidence_selector, identity, format="csr")
+        transmitting_selector = np.zeros_like(incidence_selector)
+        transmitting_selector[[0, 1], self._transmitting_compartment] = 1.0
+        pattern = pattern + sp.kron(transmitting_selector, transmission_pattern, format="csr")
+
+        pattern.data[:] = 1.0
+        pattern.eliminate_zeros()
+        return pattern
+
+    def _linear_jacobian(self):
+        """
+        The Jacobian of the local transitions and the mobility, which does not depend on the state.
+        """
+        identity = sp.identity(self.number_of_patches, format="csr")
+        linear_jacobian = sp.kron(self._workspace["local_transitions"], identity, format="csr")
+        if self.C is not None:
+            mobility_jacobian = sp.kron(
+                sp.diags(self._migration_rates()), sp.csr_matrix(self.C.T), format="csr"
+            )
+            linear_jacobian = linear_jacobian + mobility_jacobian
+        return linear_jacobian
+
+    def _coupling_derivative(self, factor):
+        """
+        The derivative of `factor * (beta @ I)` with respect to I.
+        """
+        return sp.diags(factor) @ sp.csr_matrix(self.beta)
+
+    def _migration_rates(self):
+        if self.M is None:
+            return np.ones(self.number_of_compartments)
+        return np.asarray(self.M, dtype=np.float64)
+
+    def _transmission(self, I):
+        force_of_infection = self._workspace["force_of_infection"]
+        if sp.issparse(self.beta):
+            force_of_infection[:] = self.beta @ I
+        else:
+            np.dot(self.beta, I, out=force_of_infection)
+        return force_of_infection
+
+    @abstractmethod
+    def _local_transition_matrix(self):
+        """
+        The `(number_of_compartments, number_of_compartments)` matrix of the local linear
+        transitions, shared by all patches.
+        """
+
+    @abstractmethod
+    def _compute_incidence(self, Y):
+        """
+        The incidence (flow from S to E) of each patch, given the state matrix `Y`.
+        """
+
+    @abstractmethod
+    def _incidence_derivatives(self, Y):
+        """
+        Yield `(compartment_index, derivative)` for each compartment the incidence depends on.
+        """
+
+    def _add_births(self, Y, dY):
+        pass
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class MetaSEIR(_MetapopulationModel):
+    """
+    Metapopulation-based SEIR model with births and deaths (normalized populations).
+
+    Source: A. L. Lloyd and V. A. A. Jansen, "Spatiotemporal dynamics of epidemics: synchrony in
+    metapopulation models," vol. 188, pp. 1–16, 2004, doi: 10.1016/j.mbs.2003.09.003.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray|scipy.sparse.spmatrix beta:
+        Cross-coupling matrix.
+
+    :ivar numpy.ndarray|scipy.sparse.spmatrix C:
+        Mobility matrix, where `C[i, j]` is the flow from patch i to patch j and the diagonal holds
+        the outflows (see `mobility_matrix_from_edges`). None means no mobility.
+
+    :ivar float mu:
+        Birth and death rate.
+
+    :ivar float sigma:
+        Incubation rate.
+
+    :ivar float gamma:
+        Removal rate.
+
+    :ivar numpy.ndarray M:
+        Relative migration rate of each compartment. None means 1 for all.
+    """
+
+    name = "meta_seir"
+    compartments = ("S", "E", "I", "R")
+    _incidence_dependencies = (0,)
+    _transmitting_compartment = 2
+
+    beta: np.ndarray = attr.ib(converter=_as_patch_operator)
+    C: np.ndarray = attr.ib(converter=_as_patch_operator)
+    mu: float
+    sigma: float
+    gamma: float
+    M: np.ndarray = None
+    _workspace: dict = attr.ib(default=None, init=False, repr=False)
+
+    def _local_transition_matrix(self):
+        mu, sigma, gamma = self.mu, self.sigma, self.gamma
+        return np.array(
+            [
+                [-mu, 0.0, 0.0, 0.0],
+                [0.0, -(mu + sigma), 0.0, 0.0],
+                [0.0, sigma, -(mu + gamma), 0.0],
+                [0.0, 0.0, gamma, -mu],
+            ]
+        )
+
+    def _compute_incidence(self, Y):
+        S, E, I, R = Y
+        incidence = self._workspace["incidence"]
+        np.multiply(S, self._transmission(I), out=incidence)
+        return incidence
+
+    def _incidence_derivatives(self, Y):
+        S, E, I, R = Y
+        yield 0, sp.diags(self._transmission(I).copy())
+        yield 2, self._coupling_derivative(S)
+
+    def _add_births(self, Y, dY):
+        dY[0] += self.mu
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class MetaSEIRPDQ(_MetapopulationModel):
+    """
+    Metapopulation-based SEIRPD-Q model, with cross-infection between patches and optional
+    mobility.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray|scipy.sparse.spmatrix beta:
+        Cross-coupling transmission matrix.
+
+    :ivar float mu:
+        Transmission rate from asymptomatic individuals.
+
+    :ivar numpy.ndarray N:
+        Population of each patch.
+
+    :ivar numpy.ndarray|scipy.sparse.spmatrix C:
+        Mobility matrix, as in `MetaSEIR`. None means no mobility.
+
+    :ivar numpy.ndarray M:
+        Relative migration rate of each compartment. Defaults to 1 for S, E, A, I and R and 0 for
+        the positively diagnosed, dead and cumulative counters.
+
+    The remaining members are the SEIRPD-Q rates, as in `pydemic.models.SEIRPDQ`.
+    """
+
+    name = "meta_seirpdq"
+    compartments = ("S", "E", "A", "I", "P", "R", "D", "C", "H")
+    _incidence_dependencies = (0, 2)
+    _transmitting_compartment = 3
+
+    beta: np.ndarray = attr.ib(converter=_as_patch_operator)
+    mu: float
+    gamma_I: float
+    gamma_A: float
+    gamma_P: float
+    d_I: float
+    d_P: float
+    omega: float
+    epsilon_I: float
+    rho: float
+    eta: float
+    sigma: float
+    N: np.ndarray
+    C: np.ndarray = attr.ib(default=None, converter=_as_patch_operator)
+    M: np.ndarray = None
+    _workspace: dict = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if np.shape(self.N) != (np.shape(self.beta)[0],):
+            raise ValueError("N must have the population of each patch.")
+        super().__attrs_post_init__()
+        self._workspace["inverse_population"] = 1.0 / np.asarray(self.N, dtype=np.float64)
+
+    def _migration_rates(self):
+        if self.M is None:
+            return np.array([1.0, 1.0, 1.0, 1.0, 0.0, 1.0, 0.0, 0.0, 0.0])
+        return np.asarray(self.M, dtype=np.float64)
+
+    def _local_transition_matrix(self):
+        L = np.zeros((9, 9))
+        S, E, A, I, P, R, D, C, H = range(9)
+        L[S, S] = -self.omega
+        L[S, R] = self.eta
+        L[E, E] = -(self.sigma + self.omega)
+        L[A, E] = self.sigma * (1 - self.rho)
+        L[A, A] = -(self.gamma_A + self.omega)
+        L[I, E] = self.sigma * self.rho
+        L[I, I] = -(self.gamma_I + self.d_I + self.omega + self.epsilon_I)
+        L[P, I] = self.epsilon_I
+        L[P, P] = -(self.gamma_P + self.d_P)
+        L[R, [S, E]] = self.omega
+        L[R, A] = self.gamma_A + self.omega
+        L[R, I] = self.gamma_I + self.omega
+        L[R, P] = self.gamma_P
+        L[R, R] = -self.eta
+        L[D, I] = self.d_I
+        L[D, P] = self.d_P
+        L[C, I] = self.epsilon_I
+        L[H, P] = self.gamma_P
+        return L
+
+    def _compute_incidence(self, Y):
+        S, E, A, I = Y[:4]
+        incidence = self._workspace["incidence"]
+        np.multiply(A, self.mu, out=incidence)
+        incidence += self._transmission(I)
+        incidence *= S
+        incidence *= self._workspace["inverse_population"]
+        return incidence
+
+    def _incidence_derivatives(self, Y):
+        S, E, A, I = Y[:4]
+        inverse_population = self._workspace["inverse_population"]
+        force_of_infection = self._transmission(I) + self.mu * A
+        yield 0, sp.diags(force_of_infection * inverse_population)
+        yield 2, sp.diags(self.mu * S * inverse_population)
+        yield 3, self._coupling_derivative(S * inverse_population)
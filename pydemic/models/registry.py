@@ -0,0 +1,53 @@
+"""
+A registry of the available compartmental models, so every pipeline shares the same declarations.
+"""
+
+from typing import List
+
+_MODEL_REGISTRY = dict()
+
+
+def register_model(model, overwrite: bool = False):
+    """
+    Register a model under its name.
+
+    :param model:
+        The model to register, e.g. a `CompartmentalModel`.
+
+    :param bool overwrite:
+        Replace a model already registered with the same name.
+
+    :return:
+        The registered model, so this can be used inline.
+    """
+    if model.name in _MODEL_REGISTRY and not overwrite:
+        raise ValueError(f"A model named {model.name} is already registered.")
+    _MODEL_REGISTRY[model.name] = model
+    return model
+
+
+def get_model(model_name: str):
+    """
+    Get a registered model by its name.
+
+    :param str model_name:
+        The model name.
+
+    :return:
+        The registered model.
+    """
+    try:
+        return _MODEL_REGISTRY[model_name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown model: {model_name}. Available models are: {available_models()}."
+        )
+
+
+def available_models() -> List[str]:
+    """
+    The names of the registered models.
+
+    :rtype: list
+    """
+    return sorted(_MODEL_REGISTRY)
@@ -0,0 +1,99 @@
+"""
+The SEIRPD-Q model, with cumulative confirmed (C) and recovered from positively diagnosed (H)
+counters.
+
+The transmission rates decay as ``beta = beta0 * exp(-beta1 * t)`` and ``mu = mu0 * exp(-mu1 * t)``.
+The quarantine rate ``omega`` is constant until ``t_transition`` and then vanishes exponentially
+with half-life ``half_life`` (both infinite by default, i.e. constant ``omega``).
+"""
+
+import numpy as np
+
+from pydemic.models.compartmental import CompartmentalModel, Flow
+from pydemic.models.registry import register_model
+
+SEIRPDQ = register_model(
+    CompartmentalModel(
+        name="seirpdq",
+        compartments=("S", "E", "A", "I", "P", "R", "D", "C", "H"),
+        parameters=(
+            "beta0",
+            "beta1",
+            "mu0",
+            "mu1",
+            "gamma_I",
+            "gamma_A",
+            "gamma_P",
+            "d_I",
+            "d_P",
+            "omega",
+            "epsilon_I",
+            "rho",
+            "eta",
+            "sigma",
+            "N",
+            "t_transition",
+            "half_life",
+        ),
+        auxiliaries={
+            "beta": "beta0 * exp(-beta1 * t)",
+            "mu": "mu0 * exp(-mu1 * t)",
+            "omega_t": (
+                "omega if t < t_transition "
+                "else omega * exp(-log(2.0) / half_life * (t - t_transition))"
+            ),
+        },
+        flows=(
+            Flow("S", "E", "beta / N * S * I"),
+            Flow("S", "E", "mu / N * S * A"),
+            Flow("S", "R", "omega_t * S"),
+            Flow("E", "A", "sigma * (1 - rho) * E"),
+            Flow("E", "I", "sigma * rho * E"),
+            Flow("E", "R", "omega_t * E"),
+            Flow("A", "R", "gamma_A * A"),
+            Flow("A", "R", "omega_t * A"),
+            Flow("I", "R", "gamma_I * I"),
+            Flow("I", "D", "d_I * I"),
+            Flow("I", "R", "omega_t * I"),
+            Flow("I", "P", "epsilon_I * I", counters=("C",)),
+            Flow("P", "R", "gamma_P * P", counters=("H",)),
+            Flow("P", "D", "d_P * P"),
+            Flow("R", "S", "eta * R"),
+        ),
+        default_parameters={
+            "beta0": 1e-7,
+            "beta1": 0.0,
+            "mu0": 1e-7,
+            "mu1": 0.0,
+            "gamma_I": 1 / 14,
+            "gamma_A": 1 / 14,
+            "gamma_P": 1 / 14,
+            "d_I": 2e-4,
+            "d_P": 9e-3,
+            "omega": 1 / 10,
+            "epsilon_I": 1 / 3,
+            "rho": 0.85,
+            "eta": 0.0,
+            "sigma": 1 / 5,
+            "N": 1.0,
+            "t_transition": np.inf,
+            "half_life": np.inf,
+        },
+        description="SEIRPD-Q model with quarantine and positively diagnosed individuals.",
+    )
+)
+
+
+def calculate_reproduction_number(
+    S, beta, mu, gamma_A, gamma_I, d_I, epsilon_I, rho, omega, sigma=1 / 7
+):
+    """
+    The SEIRPD-Q reproduction number, as a function of the susceptible population `S`.
+
+    All arguments can be arrays, which are broadcast (e.g. `S` with shape
+    `(number_of_realizations, number_of_times)` and parameters with shape
+    `(number_of_realizations, 1)`).
+    """
+    left_term = sigma * (1 - rho) * mu / ((sigma + omega) * (gamma_A + omega))
+    right_term = beta * sigma * rho / ((sigma + omega) * (gamma_I + d_I + omega + epsilon_I))
+    return (left_term + right_term) * S
@@ -0,0 +1,59 @@
+"""
+The SEIRQ-Diag model of Jia et al., with asymptomatic (A), diagnosed (D), quarantined (Q) and dead
+(F) compartments.
+"""
+
+from pydemic.models.compartmental import CompartmentalModel, Flow
+from pydemic.models.registry import register_model
+
+SEIRQ_DIAG = register_model(
+    CompartmentalModel(
+        name="seirq_diag",
+        compartments=("S", "E", "I", "R", "D", "A", "Q", "F"),
+        parameters=(
+            "beta",
+            "gamma_I",
+            "theta",
+            "p",
+            "lamb",
+            "sigma",
+            "rho",
+            "epsilon_A",
+            "epsilon_I",
+            "gamma_A",
+            "gamma_D",
+            "d_I",
+            "d_D",
+        ),
+        flows=(
+            Flow("S", "E", "beta * S * (I + theta * A)"),
+            Flow("S", "Q", "p * S"),
+            Flow("Q", "S", "lamb * Q"),
+            Flow("E", "I", "sigma * rho * E"),
+            Flow("E", "A", "sigma * (1 - rho) * E"),
+            Flow("I", "R", "gamma_I * I"),
+            Flow("I", "F", "d_I * I"),
+            Flow("I", "D", "epsilon_I * I"),
+            Flow("A", "R", "gamma_A * A"),
+            Flow("A", "D", "epsilon_A * A"),
+            Flow("D", "R", "gamma_D * D"),
+            Flow("D", "F", "d_D * D"),
+        ),
+        default_parameters={
+            "beta": 1e-7,
+            "gamma_I": 0.1,
+            "theta": 0.16,
+            "p": 1 / 6.2,
+            "lamb": 1 / 90,
+            "sigma": 1 / 7,
+            "rho": 0.88,
+            "epsilon_A": 1 / 10,
+            "epsilon_I": 1 / 3,
+            "gamma_A": 0.15,
+            "gamma_D": 0.14,
+            "d_I": 0.0105,
+            "d_D": 0.003,
+        },
+        description="SEIRQ-Diag model of Jia et al.",
+    )
+)
@@ -0,0 +1,400 @@
+"""
+A module with a persistent pool of worker processes for parallel objective evaluations.
+
+Starting processes (and compiling the model kernels in each of them) is expensive compared to a
+single objective evaluation, so the pool is started on first use and reused until it is closed.
+Populations are split in one chunk per worker, so each worker receives a single task per batch.
+Large task data (e.g. an objective function holding the observed data) can be broadcast once: it is
+written to disk and each worker loads it on first use, so only a small reference is sent per task.
+
+Nested parallelism (e.g. regions or islands, each evaluating population batches over worker
+processes, each calling multithreaded BLAS) easily oversubscribes the cores. `ExecutionConfig`
+allocates the cores between the outer level, the inner level and the threads of each process, and
+`thread_limits` applies the same thread limit to every backend.
+"""
+
+import multiprocessing
+import multiprocessing.util
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import attr
+import numba
+import numpy as np
+
+try:
+    import threadpoolctl
+except ImportError:  # pragma: no cover
+    threadpoolctl = None
+
+try:
+    # numba >= 0.49
+    from numba.np.ufunc import parallel as _numba_parallel
+except ImportError:  # pragma: no cover
+    _numba_parallel = None
+
+# Forked processes inherit this value, spawned processes import the module again
+_IMPORT_PROCESS_ID = os.getpid()
+
+_MISSING = object()
+
+# The environment variables read by the BLAS and OpenMP runtimes of newly started processes
+THREAD_LIMIT_VARIABLES = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+# The broadcast values already loaded by this process, by file path
+_broadcast_values = {}
+
+
+def _load_broadcast_value(path):
+    if path not in _broadcast_values:
+        for released_path in [key for key in _broadcast_values if not os.path.exists(key)]:
+            del _broadcast_values[released_path]
+        with open(path, "rb") as broadcast_file:
+            _broadcast_values[path] = pickle.load(broadcast_file)
+    return _broadcast_values[path]
+
+
+def set_thread_limits(threads: int):
+    """
+    Limit the threads of the BLAS/OpenMP runtimes and of numba in this process, and of the BLAS
+    runtimes of the processes it starts.
+
+    The environment variables only affect runtimes loaded afterwards, so the runtimes already
+    loaded are limited with `threadpoolctl`, when it is installed. The numba threads are limited
+    if they were already launched by a parallel kernel (and numba >= 0.49).
+
+    :param int threads:
+        The maximum number of threads.
+    """
+    if threads <= 0:
+        raise ValueError("Number of threads must be greater than 0.")
+    for variable in THREAD_LIMIT_VARIABLES:
+        os.environ[variable] = str(threads)
+    if threadpoolctl is not None:
+        threadpoolctl.threadpool_limits(threads)
+    if _numba_threads_launched():
+        numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+
+
+def _numba_threads_launched():
+    # The numba threads are only limited once launched by a parallel kernel of this process:
+    # launching them here, or using the threads of a forked parent, is not fork-safe. numba < 0.49
+    # has no thread control.
+    return (
+        _numba_parallel is not None
+        and _numba_parallel._is_initialized
+        and os.getpid() == _IMPORT_PROCESS_ID
+    )
+
+
+def _get_numba_threads():
+    return numba.get_num_threads() if _numba_threads_launched() else None
+
+
+@contextmanager
+def thread_limits(threads: int):
+    """
+    A context manager applying `set_thread_limits`, restoring the previous limits at exit.
+    """
+    previous_variables = {variable: os.environ.get(variable) for variable in THREAD_LIMIT_VARIABLES}
+    previous_numba_threads = _get_numba_threads()
+    previous_limits = None if threadpoolctl is None else threadpoolctl.threadpool_info()
+    try:
+        set_thread_limits(threads)
+        yield
+    finally:
+        for variable, value in previous_variables.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+        if previous_limits is not None:
+            threadpoolctl.threadpool_limits(previous_limits)
+        if previous_numba_threads is not None and _numba_threads_launched():
+            numba.set_num_threads(previous_numba_threads)
+
+
+@attr.s(auto_attribs=True)
+class BroadcastValue:
+    """
+    A reference to a value broadcast by `WorkerPool.broadcast`. Pickling it only sends the
+    reference, and the value is loaded at most once per process.
+
+    Members
+    ----------------
+
+    :ivar str path:
+        The file holding the pickled value.
+    """
+
+    path: str
+    _value: Any = attr.ib(default=_MISSING, repr=False, eq=False)
+
+    def __reduce__(self):
+        return BroadcastValue, (self.path,)
+
+    def get(self):
+        if self._value is _MISSING:
+            self._value = _load_broadcast_value(self.path)
+        return self._value
+
+
+@attr.s(auto_attribs=True)
+class WorkerPool:
+    """
+    A persistent pool of worker processes. It can be used as a context manager, which closes the
+    pool at exit.
+
+    Members
+    ----------------
+
+    :ivar int number_of_workers:
+        The number of worker processes. Supply -1 to use all available CPU cores.
+
+    :ivar str start_method:
+        The `multiprocessing` start method (`"fork"`, `"spawn"` or `"forkserver"`). If None, the
+        platform default is used.
+
+    :ivar int threads_per_worker:
+        The thread limit of each worker process (see `set_thread_limits`). If None, the workers
+        keep the limits they inherit.
+    """
+
+    number_of_workers: int = -1
+    start_method: str = None
+    threads_per_worker: int = None
+    _executor: ProcessPoolExecutor = attr.ib(default=None, init=False, repr=False)
+    _broadcast_directory: str = attr.ib(default=None, init=False, repr=False)
+    _shutdown: multiprocessing.util.Finalize = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        if self.number_of_workers == -1:
+            self.number_of_workers = os.cpu_count()
+        elif self.number_of_workers <= 0:
+            raise ValueError("Number of workers must be greater than 0, or -1 for all cores.")
+        if self.threads_per_worker is not None and self.threads_per_worker <= 0:
+            raise ValueError("Number of threads per worker must be greater than 0.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __deepcopy__(self, memo):
+        # Copies (e.g. made by pygmo) share the same processes
+        return self
+
+    @property
+    def is_running(self):
+        return self._executor is not None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            context = None
+            if self.start_method is not None:
+                context = multiprocessing.get_context(self.start_method)
+            initializer, initargs = None, ()
+            if self.threads_per_worker is not None:
+                initializer, initargs = set_thread_limits, (self.threads_per_worker,)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.number_of_workers,
+                mp_context=context,
+                initializer=initializer,
+                initargs=initargs,
+            )
+            # Pools left open are shut down at exit, before multiprocessing joins the children
+            # of the exiting process (e.g. a calibration process), which would wait forever
+            self._shutdown = multiprocessing.util.Finalize(
+                self, self._executor.shutdown, kwargs=dict(wait=True), exitpriority=10
+            )
+        return self._executor
+
+    def map(self, function: Callable, iterable) -> list:
+        """
+        Evaluate `function` over `iterable`, as the builtin `map`, sending one chunk of items per
+        worker. It can be passed as the `workers` of SciPy's differential evolution.
+        """
+        items = list(iterable)
+        chunksize = max(1, -(-len(items) // self.number_of_workers))
+        return list(self.executor.map(function, items, chunksize=chunksize))
+
+    def map_chunks(self, function: Callable, items: np.ndarray, *args) -> np.ndarray:
+        """
+        Evaluate `function(chunk, *args)` over one chunk of rows of `items` per worker.
+
+        :param function:
+            A picklable function receiving a chunk of rows and returning one value per row.
+
+        :param numpy.ndarray items:
+            The items to evaluate, one per row.
+
+        :return:
+            The concatenated results, in the order of `items`.
+        :rtype: numpy.ndarray
+        """
+        items = np.asarray(items)
+        number_of_chunks = min(self.number_of_workers, len(items))
+        if number_of_chunks == 0:
+            return np.empty(0)
+        chunks = np.array_split(items, number_of_chunks)
+        futures = [self.executor.submit(function, chunk, *args) for chunk in chunks]
+        return np.concatenate([np.atleast_1d(future.result()) for future in futures])
+
+    def broadcast(self, value) -> BroadcastValue:
+        """
+        Make a picklable value available to the workers, which load it once on first use.
+
+        :param value:
+            The value to broadcast.
+
+        :return:
+            A reference to the value, cheap to pickle with each task.
+        :rtype: BroadcastValue
+        """
+        if self._broadcast_directory is None:
+            self._broadcast_directory = tempfile.mkdtemp(prefix="pydemic-broadcast-")
+        file_descriptor, path = tempfile.mkstemp(suffix=".pkl", dir=self._broadcast_directory)
+        with os.fdopen(file_descriptor, "wb") as broadcast_file:
+            pickle.dump(value, broadcast_file, protocol=pickle.HIGHEST_PROTOCOL)
+        return BroadcastValue(path, value)
+
+    def release(self, broadcast_value: BroadcastValue):
+        """
+        Discard a broadcast value. Workers drop their copy when they load the next one.
+        """
+        if os.path.exists(broadcast_value.path):
+            os.remove(broadcast_value.path)
+
+    def close(self):
+        """
+        Shut the worker processes down and discard the broadcast values. The pool starts again if
+        it is used afterwards.
+        """
+        if self._executor is not None:
+            self._shutdown()
+            self._executor, self._shutdown = None, None
+        if self._broadcast_directory is not None:
+            shutil.rmtree(self._broadcast_directory, ignore_errors=True)
+            self._broadcast_directory = None
+
+
+@attr.s(auto_attribs=True)
+class ExecutionConfig:
+    """
+    The allocation of the cores between two levels of parallelism and the threads of each process,
+    such that `outer_workers * inner_workers * threads_per_worker <= total_cores`.
+
+    The outer level runs independent tasks (regions of a `CalibrationRunner`, islands of a pygmo
+    archipelago, chains of `pymc3.sample_smc`), and each of them evaluates population batches over
+    `inner_workers` processes. The levels left as None share the remaining cores: the outer level
+    first, then the inner level, then the threads.
+
+    Members
+    ----------------
+
+    :ivar int total_cores:
+        The number of cores to use. Supply -1 to use all available CPU cores.
+
+    :ivar int outer_workers:
+        The number of outer tasks running at the same time.
+
+    :ivar int inner_workers:
+        The number of worker processes of each outer task.
+
+    :ivar int threads_per_worker:
+        The BLAS/OpenMP/numba thread limit of each process.
+    """
+
+    total_cores: int = -1
+    outer_workers: int = None
+    inner_workers: int = None
+    threads_per_worker: int = None
+
+    def __attrs_post_init__(self):
+        if self.total_cores == -1:
+            self.total_cores = os.cpu_count()
+        elif self.total_cores <= 0:
+            raise ValueError("Number of cores must be greater than 0, or -1 for all cores.")
+        for name in ("outer_workers", "inner_workers", "threads_per_worker"):
+            value = getattr(self, name)
+            if value is not None and value <= 0:
+                raise ValueError(f"{name} must be greater than 0.")
+
+        inner_workers = 1 if self.inner_workers is None else self.inner_workers
+        threads_per_worker = 1 if self.threads_per_worker is None else self.threads_per_worker
+        if self.outer_workers is None:
+            self.outer_workers = max(1, self.total_cores // (inner_workers * threads_per_worker))
+        if self.inner_workers is None:
+            self.inner_workers = max(
+                1, self.total_cores // (self.outer_workers * threads_per_worker)
+            )
+        if self.threads_per_worker is None:
+            self.threads_per_worker = max(
+                1, self.total_cores // (self.outer_workers * self.inner_workers)
+            )
+        if self.cores_used > self.total_cores:
+            raise ValueError(
+                f"The allocation uses {self.cores_used} cores, more than the {self.total_cores} "
+                f"available."
+            )
+
+    @property
+    def cores_used(self) -> int:
+        return self.outer_workers * self.inner_workers * self.threads_per_worker
+
+    def thread_limits(self):
+        """
+        A context manager applying the thread limit of each process to this process and to the
+        processes it starts.
+        """
+        return thread_limits(self.threads_per_worker)
+
+    def smc_sampler_kwargs(self) -> dict:
+        """
+        The core options of `pymc3.sample_smc`, whose chains run in the outer level.
+        """
+        return dict(parallel=self.outer_workers > 1, cores=self.outer_workers)
+
+    def worker_pool(self, start_method: str = None) -> WorkerPool:
+        """
+        A worker pool for the inner level, with the thread limit of each process.
+        """
+        return WorkerPool(
+            number_of_workers=self.inner_workers,
+            start_method=start_method,
+            threads_per_worker=self.threads_per_worker,
+        )
+
+    def configure_solver(self, solver_settings):
+        """
+        Copy minimization settings with the allocated workers: pygmo islands run in the outer level,
+        and the other workers (SciPy workers, batch evaluation workers) in the inner level.
+
+        :param solver_settings:
+            The settings of an `OptimizationProblem`.
+
+        :return:
+            The settings with the allocated workers.
+        """
+        fields = attr.fields_dict(type(solver_settings))
+        changes = {}
+        if "number_of_islands" in fields and getattr(solver_settings, "parallel_execution", False):
+            changes["number_of_islands"] = self.outer_workers
+        if "workers" in fields:
+            changes["workers"] = self.inner_workers
+        if "batch_evaluation_workers" in fields:
+            changes["batch_evaluation_workers"] = self.inner_workers
+        return attr.evolve(solver_settings, **changes)
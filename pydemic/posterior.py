@@ -0,0 +1,294 @@
+"""
+A module to save and load posterior samples of calibrated parameters, such as the
+`calibration_realizations.csv` files exported by the calibration scripts.
+
+The format is chosen by the file extension:
+
+* ``.npz``: one array per parameter, plus a JSON header with the model name, the parameter order
+  and user metadata. Only the requested parameters are read when loading.
+* ``.parquet`` and ``.feather``: columnar files written with pyarrow (an optional dependency),
+  with the same header in the schema metadata. Only the requested columns are read.
+* ``.csv``: the samples only, written with enough digits to be read back exactly.
+
+The chain and the stage (e.g. of sequential Monte Carlo) of each sample are optional, and are
+stored as the reserved columns `_chain` and `_stage`.
+"""
+
+import json
+import os
+from typing import Sequence
+
+import attr
+import numpy as np
+import pandas as pd
+
+_FORMAT_VERSION = 1
+_HEADER_KEY = "_header"
+_SAMPLE_INFO_COLUMNS = ("_chain", "_stage")
+_ARROW_METADATA_KEY = b"pydemic"
+_FORMATS = ("npz", "parquet", "feather", "csv")
+
+
+@attr.s(auto_attribs=True)
+class PosteriorSamples:
+    """
+    Posterior samples of the parameters of a model.
+
+    Members
+    ----------------
+
+    :ivar pandas.DataFrame samples:
+        One row per sample and one column per parameter.
+
+    :ivar str model_name:
+        The name of the calibrated model.
+
+    :ivar numpy.ndarray chain:
+        The chain of each sample, if known.
+
+    :ivar numpy.ndarray stage:
+        The stage of each sample (e.g. of sequential Monte Carlo), if known.
+
+    :ivar dict metadata:
+        User metadata, such as the priors or bounds of the parameters. It must be serializable
+        to JSON.
+    """
+
+    samples: pd.DataFrame
+    model_name: str = None
+    chain: np.ndarray = None
+    stage: np.ndarray = None
+    metadata: dict = attr.Factory(dict)
+
+    @property
+    def parameter_names(self) -> list:
+        return list(self.samples.columns)
+
+    def to_matrix(self, parameter_names: Sequence[str] = None) -> np.ndarray:
+        """
+        Get the samples as a matrix, e.g. to integrate an ensemble with one realization per
+        sample.
+
+        :param parameter_names:
+            The parameters, in column order. Defaults to all parameters.
+
+        :return:
+            An array with shape `(number_of_samples, len(parameter_names))`.
+        :rtype: numpy.ndarray
+        """
+        if parameter_names is None:
+            parameter_names = self.parameter_names
+        _check_parameter_names(self.parameter_names, parameter_names)
+        return self.samples[list(parameter_names)].to_numpy(dtype=np.float64)
+
+    def save(self, path: str) -> None:
+        """
+        Save the samples, in the format given by the file extension.
+
+        :param str path:
+            The file path, ending with `.npz`, `.parquet`, `.feather` or `.csv`.
+        """
+        file_format = _get_format(path)
+        if any(name.startswith("_") for name in self.parameter_names):
+            raise ValueError("Parameter names can't start with an underscore.")
+        if file_format == "npz":
+            self._save_npz(path)
+        elif file_format == "csv":
+            self._frame().to_csv(path, index=False, float_format="%.17g")
+        else:
+            self._save_arrow(path, file_format)
+
+    def _header(self):
+        return dict(
+            format_version=_FORMAT_VERSION,
+            model_name=self.model_name,
+            parameter_names=self.parameter_names,
+            metadata=self.metadata,
+        )
+
+    def _sample_info(self):
+        return {
+            column: np.asarray(values, dtype=np.int64)
+            for column, values in zip(_SAMPLE_INFO_COLUMNS, (self.chain, self.stage))
+            if values is not None
+        }
+
+    def _frame(self):
+        frame = self.samples.astype(np.float64).reset_index(drop=True)
+        for column, values in self._sample_info().items():
+            frame[column] = values
+        return frame
+
+    def _save_npz(self, path):
+        arrays = {
+            f"parameter_{index}": self.samples[name].to_numpy(dtype=np.float64)
+            for index, name in enumerate(self.parameter_names)
+        }
+        arrays.update(self._sample_info())
+        arrays[_HEADER_KEY] = np.array(json.dumps(self._header()))
+        with open(path, "wb") as npz_file:
+            np.savez(npz_file, **arrays)
+
+    def _save_arrow(self, path, file_format):
+        pyarrow = _import_pyarrow()
+        table = pyarrow.Table.from_pandas(self._frame(), preserve_index=False)
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[_ARROW_METADATA_KEY] = json.dumps(self._header()).encode()
+        table = table.replace_schema_metadata(schema_metadata)
+        if file_format == "parquet":
+            import pyarrow.parquet
+
+            pyarrow.parquet.write_table(table, path)
+        else:
+            import pyarrow.feather
+
+            pyarrow.feather.write_feather(table, path)
+
+
+def load_posterior_samples(path: str, parameter_names: Sequence[str] = None) -> PosteriorSamples:
+    """
+    Load posterior samples, in the format given by the file extension. CSV files exported with
+    `pandas.DataFrame.to_csv` (e.g. by the calibration scripts) are also read, ignoring their
+    index column.
+
+    :param str path:
+        The file path, ending with `.npz`, `.parquet`, `.feather` or `.csv`.
+
+    :param parameter_names:
+        The parameters to read. Defaults to all parameters.
+
+    :return:
+        The samples, with parameters as `float64` columns.
+    :rtype: PosteriorSamples
+    """
+    file_format = _get_format(path)
+    if file_format == "npz":
+        return _load_npz(path, parameter_names)
+    if file_format == "csv":
+        return _load_csv(path, parameter_names)
+    return _load_arrow(path, file_format, parameter_names)
+
+
+def _load_npz(path, parameter_names):
+    with np.load(path) as npz_file:
+        header = _check_header(json.loads(npz_file[_HEADER_KEY].item()))
+        stored_names = header["parameter_names"]
+        if parameter_names is None:
+            parameter_names = stored_names
+        _check_parameter_names(stored_names, parameter_names)
+        samples = pd.DataFrame(
+            {name: npz_file[f"parameter_{stored_names.index(name)}"] for name in parameter_names},
+            columns=list(parameter_names),
+        )
+        sample_info = [
+            npz_file[column] if column in npz_file.files else None
+            for column in _SAMPLE_INFO_COLUMNS
+        ]
+    return _posterior_samples(samples, header, sample_info)
+
+
+def _load_csv(path, parameter_names):
+    stored_columns = list(pd.read_csv(path, nrows=0).columns)
+    # Files exported with `DataFrame.to_csv` start with an unnamed index column
+    stored_names = [
+        name
+        for name in stored_columns
+        if name not in _SAMPLE_INFO_COLUMNS and not name.startswith("Unnamed: ")
+    ]
+    if parameter_names is None:
+        parameter_names = stored_names
+    _check_parameter_names(stored_names, parameter_names)
+    sample_info_columns = [column for column in _SAMPLE_INFO_COLUMNS if column in stored_columns]
+    dtypes = {name: np.float64 for name in parameter_names}
+    dtypes.update({column: np.int64 for column in sample_info_columns})
+    frame = pd.read_csv(
+        path,
+        usecols=list(parameter_names) + sample_info_columns,
+        dtype=dtypes,
+        float_precision="round_trip",
+    )
+    return _posterior_samples_from_frame(frame, parameter_names, header=None)
+
+
+def _load_arrow(path, file_format, parameter_names):
+    pyarrow = _import_pyarrow()
+    if file_format == "parquet":
+        import pyarrow.parquet
+
+        schema = pyarrow.parquet.read_schema(path)
+    else:
+        import pyarrow.feather
+        import pyarrow.ipc
+
+        # Feather files are Arrow IPC files, whose schema is read without reading the columns
+        with pyarrow.memory_map(path) as feather_file:
+            schema = pyarrow.ipc.open_file(feather_file).schema
+    header = _check_header(json.loads(schema.metadata[_ARROW_METADATA_KEY]))
+    stored_names = header["parameter_names"]
+    if parameter_names is None:
+        parameter_names = stored_names
+    _check_parameter_names(stored_names, parameter_names)
+    columns = list(parameter_names) + [
+        column for column in _SAMPLE_INFO_COLUMNS if column in schema.names
+    ]
+    if file_format == "parquet":
+        table = pyarrow.parquet.read_table(path, columns=columns)
+    else:
+        table = pyarrow.feather.read_table(path, columns=columns)
+    return _posterior_samples_from_frame(table.to_pandas(), parameter_names, header)
+
+
+def _posterior_samples_from_frame(frame, parameter_names, header):
+    samples = frame[list(parameter_names)].astype(np.float64)
+    sample_info = [
+        frame[column].to_numpy() if column in frame.columns else None
+        for column in _SAMPLE_INFO_COLUMNS
+    ]
+    return _posterior_samples(samples, header, sample_info)
+
+
+def _posterior_samples(samples, header, sample_info):
+    chain, stage = sample_info
+    return PosteriorSamples(
+        samples=samples,
+        model_name=None if header is None else header["model_name"],
+        chain=chain,
+        stage=stage,
+        metadata={} if header is None else header["metadata"],
+    )
+
+
+def _check_header(header):
+    if header["format_version"] != _FORMAT_VERSION:
+        raise ValueError(f"Unsupported posterior samples version: {header['format_version']}.")
+    return header
+
+
+def _check_parameter_names(stored_names, parameter_names):
+    unknown_names = [name for name in parameter_names if name not in stored_names]
+    if unknown_names:
+        raise ValueError(
+            f"Unknown parameters: {unknown_names}. Available parameters are: {stored_names}."
+        )
+
+
+def _get_format(path):
+    file_format = os.path.splitext(path)[1].lstrip(".").lower()
+    if file_format not in _FORMATS:
+        raise ValueError(
+            f"Unknown posterior samples format: {path}. The file extension must be one of "
+            f"{_FORMATS}."
+        )
+    return file_format
+
+
+def _import_pyarrow():
+    # pyarrow is only needed (and only imported) for Parquet and Feather files
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Parquet and Feather posterior samples require pyarrow. Install it, or use the .npz "
+            "format."
+        )
+    return pyarrow
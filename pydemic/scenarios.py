@@ -0,0 +1,312 @@
+"""
+A module to integrate an ensemble of realizations (e.g. posterior samples) under several
+intervention scenarios, such as a grid of ``t_transition`` and ``half_life`` values of the
+SEIRPD-Q model.
+
+The scenarios only change the dynamics after their divergence time (the ``t_transition`` of each
+scenario), so the segment before it is shared: the realizations are integrated once up to the
+latest divergence time, and each group of scenarios with the same divergence time continues from
+the shared states, with all its scenarios and realizations stacked in a single ensemble. The
+groups are independent, and can be integrated by the processes of a `WorkerPool`.
+"""
+
+import itertools
+from typing import Tuple, Union
+
+import attr
+import numpy as np
+import pandas as pd
+
+from pydemic.ensemble import EnsembleSolution
+from pydemic.models import CompartmentalModel
+from pydemic.parallel import WorkerPool
+
+
+@attr.s(auto_attribs=True)
+class ScenarioSolution:
+    """
+    Stores the trajectories of an ensemble under each scenario.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points where the trajectories were evaluated.
+
+    :ivar numpy.ndarray y:
+        The trajectories, with shape `(number_of_scenarios, number_of_realizations,
+        number_of_compartments, len(t))`.
+
+    :ivar tuple compartments:
+        The compartment names, in state order.
+
+    :ivar pandas.DataFrame scenarios:
+        The parameter values of each scenario, one row per scenario.
+
+    :ivar bool success:
+        True if every segment was successfully integrated.
+
+    :ivar int nfev:
+        Total number of RHS evaluations.
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    compartments: tuple
+    scenarios: pd.DataFrame
+    success: bool = True
+    nfev: int = 0
+
+    @property
+    def number_of_scenarios(self):
+        return self.y.shape[0]
+
+    def get_scenario(self, index: int) -> EnsembleSolution:
+        """
+        Get the ensemble of a scenario, e.g. to summarize it with
+        `pydemic.summary.summarize_ensemble`.
+
+        :param int index:
+            The scenario index (row of `scenarios`).
+
+        :rtype: EnsembleSolution
+        """
+        return EnsembleSolution(
+            t=self.t, y=self.y[index], compartments=self.compartments, success=self.success
+        )
+
+    def get_compartment(self, compartment_name: str) -> np.ndarray:
+        """
+        Get the trajectories of a compartment, with shape `(number_of_scenarios,
+        number_of_realizations, len(t))`.
+        """
+        if compartment_name not in self.compartments:
+            raise ValueError(f"Unknown compartment: {compartment_name}.")
+        return self.y[:, :, self.compartments.index(compartment_name)]
+
+
+def scenario_grid(**parameter_values) -> pd.DataFrame:
+    """
+    Build the scenarios of all the combinations of parameter values.
+
+    :param parameter_values:
+        A sequence of values for each parameter.
+
+    :return:
+        One row per scenario and one column per parameter.
+    :rtype: pandas.DataFrame
+    """
+    names = list(parameter_values)
+    return pd.DataFrame(
+        list(itertools.product(*(parameter_values[name] for name in names))),
+        columns=names,
+        dtype=np.float64,
+    )
+
+
+def solve_scenarios(
+    model: CompartmentalModel,
+    parameters: np.ndarray,
+    initial_conditions: np.ndarray,
+    t_span: Tuple[float, float],
+    t_eval: np.ndarray,
+    scenarios: Union[dict, pd.DataFrame],
+    divergence_parameter: str = "t_transition",
+    worker_pool: WorkerPool = None,
+    **kwargs,
+) -> ScenarioSolution:
+    """
+    Integrate all realizations under all scenarios, sharing the integration before the
+    divergence time of each scenario.
+
+    The scenario parameters other than `divergence_parameter` must not change the dynamics
+    before the divergence time (as the `half_life` of the SEIRPD-Q model, which only acts after
+    `t_transition`). Without a `divergence_parameter` column in `scenarios`, every scenario is
+    integrated from the start, all in a single ensemble.
+
+    :param CompartmentalModel model:
+        The model.
+
+    :param numpy.ndarray parameters:
+        The `(number_of_realizations, number_of_parameters)` parameter matrix, e.g. built from
+        posterior samples with `model.parameter_matrix`. The scenario parameters are replaced by
+        the values of each scenario.
+
+    :param numpy.ndarray initial_conditions:
+        The `(number_of_realizations, number_of_compartments)` initial conditions. A 1D array is
+        used for all the realizations.
+
+    :param tuple t_span:
+        The integration interval.
+
+    :param numpy.ndarray t_eval:
+        Times where the trajectories are stored, in increasing order.
+
+    :param scenarios:
+        The parameter values of each scenario, one row per scenario, or a dict of parameter
+        values whose combinations are the scenarios (see `scenario_grid`).
+
+    :param str divergence_parameter:
+        The scenario parameter holding the time from which the scenarios differ.
+
+    :param WorkerPool worker_pool:
+        An optional pool integrating the groups of scenarios with different divergence times in
+        parallel.
+
+    :param kwargs:
+        Other arguments of `pydemic.ensemble.solve_ensemble`, such as `method`, `rtol` and
+        `realizations_per_batch`.
+
+    :return:
+        The trajectories of each scenario.
+    :rtype: ScenarioSolution
+    """
+    parameters = np.atleast_2d(np.asarray(parameters, dtype=np.float64))
+    number_of_realizations = parameters.shape[0]
+    initial_conditions = np.asarray(initial_conditions, dtype=np.float64)
+    if initial_conditions.ndim == 1:
+        initial_conditions = np.tile(initial_conditions, (number_of_realizations, 1))
+    if initial_conditions.shape[0] != number_of_realizations:
+        raise ValueError(
+            "Initial conditions and parameters must have the same number of realizations."
+        )
+    t_start, t_end = t_span
+    t_eval = np.asarray(t_eval, dtype=np.float64)
+    if np.any(np.diff(t_eval) <= 0.0) or t_eval[0] < t_start or t_eval[-1] > t_end:
+        raise ValueError("t_eval must be increasing and within t_span.")
+
+    if isinstance(scenarios, dict):
+        scenarios = scenario_grid(**scenarios)
+    scenarios = scenarios.reset_index(drop=True)
+    if len(scenarios) == 0:
+        raise ValueError("There must be at least one scenario.")
+    unknown_parameters = set(scenarios.columns) - set(model.parameters)
+    if unknown_parameters:
+        raise ValueError(f"Unknown parameters: {sorted(unknown_parameters)}.")
+    scenario_columns = [model.parameters.index(name) for name in scenarios.columns]
+    scenario_values = scenarios.to_numpy(dtype=np.float64)
+
+    if divergence_parameter in scenarios.columns:
+        divergence_times = np.clip(scenarios[divergence_parameter].to_numpy(), t_start, t_end)
+    else:
+        divergence_times = np.full(len(scenarios), float(t_start))
+
+    # The shared segment is integrated with the scenario diverging last
+    shared_end = divergence_times.max()
+    shared_solution = None
+    if shared_end > t_start:
+        shared_parameters = parameters.copy()
+        shared_parameters[:, scenario_columns] = scenario_values[np.argmax(divergence_times)]
+        shared_t_eval = np.union1d(
+            t_eval[t_eval <= shared_end], divergence_times[divergence_times > t_start]
+        )
+        shared_solution = model.solve_ensemble(
+            shared_parameters, initial_conditions, (t_start, shared_end), shared_t_eval, **kwargs
+        )
+
+    groups = []
+    for divergence_time in np.unique(divergence_times):
+        scenario_indices = np.flatnonzero(divergence_times == divergence_time)
+        number_of_shared_times = (
+            np.searchsorted(t_eval, divergence_time) if divergence_time < t_end else t_eval.size
+        )
+        if divergence_time == t_start:
+            divergence_states = initial_conditions
+        else:
+            shared_index = np.searchsorted(shared_solution.t, divergence_time)
+            divergence_states = shared_solution.y[:, :, shared_index]
+        # Realizations whose shared segment failed are not continued
+        continued_realizations = np.isfinite(divergence_states).all(axis=1)
+        groups.append(
+            (
+                divergence_time,
+                scenario_indices,
+                number_of_shared_times,
+                divergence_states[continued_realizations],
+                continued_realizations,
+            )
+        )
+
+    segment_arguments = [
+        (
+            model,
+            _scenario_parameters(
+                parameters[continued_realizations],
+                scenario_columns,
+                scenario_values[scenario_indices],
+            ),
+            np.tile(divergence_states, (scenario_indices.size, 1)),
+            (divergence_time, t_end),
+            t_eval[number_of_shared_times:],
+            kwargs,
+        )
+        for (
+            divergence_time,
+            scenario_indices,
+            number_of_shared_times,
+            divergence_states,
+            continued_realizations,
+        ) in groups
+        if _has_segment(number_of_shared_times, t_eval, continued_realizations)
+    ]
+    if worker_pool is None:
+        segment_solutions = [_solve_segment(*arguments) for arguments in segment_arguments]
+    else:
+        futures = [
+            worker_pool.executor.submit(_solve_segment, *arguments)
+            for arguments in segment_arguments
+        ]
+        segment_solutions = [future.result() for future in futures]
+
+    number_of_compartments = initial_conditions.shape[1]
+    trajectories = np.full(
+        (len(scenarios), number_of_realizations, number_of_compartments, t_eval.size), np.nan
+    )
+    success = shared_solution is None or shared_solution.success
+    nfev = 0 if shared_solution is None else shared_solution.nfev
+    segment_solutions = iter(segment_solutions)
+    for _, scenario_indices, number_of_shared_times, _, continued_realizations in groups:
+        success = success and continued_realizations.all()
+        if number_of_shared_times > 0:
+            shared_indices = np.searchsorted(shared_solution.t, t_eval[:number_of_shared_times])
+            trajectories[scenario_indices, :, :, :number_of_shared_times] = shared_solution.y[
+                np.newaxis, :, :, shared_indices
+            ]
+        if not _has_segment(number_of_shared_times, t_eval, continued_realizations):
+            continue
+        segment_solution = next(segment_solutions)
+        success = success and segment_solution.success
+        nfev += segment_solution.nfev
+        segment_trajectories = segment_solution.y.reshape(
+            (scenario_indices.size, -1) + segment_solution.y.shape[1:]
+        )
+        for index, scenario_index in enumerate(scenario_indices):
+            trajectories[scenario_index, continued_realizations, :, number_of_shared_times:] = (
+                segment_trajectories[index]
+            )
+
+    return ScenarioSolution(
+        t=t_eval,
+        y=trajectories,
+        compartments=model.compartments,
+        scenarios=scenarios,
+        success=bool(success),
+        nfev=nfev,
+    )
+
+
+def _scenario_parameters(parameters, scenario_columns, scenario_values):
+    """
+    Stack the parameters of the realizations under each scenario, scenario by scenario.
+    """
+    stacked_parameters = np.tile(parameters, (len(scenario_values), 1))
+    stacked_parameters[:, scenario_columns] = np.repeat(scenario_values, len(parameters), axis=0)
+    return stacked_parameters
+
+
+def _has_segment(number_of_shared_times, t_eval, continued_realizations):
+    return number_of_shared_times < t_eval.size and continued_realizations.any()
+
+
+def _solve_segment(model, parameters, initial_conditions, t_span, t_eval, kwargs):
+    return model.solve_ensemble(parameters, initial_conditions, t_span, t_eval, **kwargs)
@@ -0,0 +1,750 @@
+"""
+A module to compute sensitivities of compartmental model trajectories and gradients of
+calibration objectives.
+
+The sensitivities ``S = dy/dθ`` of the solution with respect to the parameters follow the
+variational equations
+
+    dS/dt = J(t, y, θ) S + F(t, y, θ),    S(t0) = dy0/dθ,
+
+where ``J`` is the Jacobian of the RHS with respect to the state and ``F`` is the Jacobian with
+respect to the parameters. Integrating them together with the model (an augmented state with
+``n * (1 + k)`` entries for ``k`` parameters) gives exact derivatives of the trajectories in a
+single solve, instead of the ``2 * k`` extra solves of central finite differences.
+
+When only the gradient of a scalar cost ``G = sum_i g_i(y(t_i))`` is needed, the adjoint method
+costs roughly the same for any number of parameters. The adjoint ``λ`` is integrated backward in
+time,
+
+    dλ/dt = -J^T λ,    λ(t_i^-) = λ(t_i^+) + dg_i/dy,
+
+and the gradient is ``dG/dθ = λ(t0)^T dy0/dθ + ∫ λ^T F dt``. The forward trajectory needed by
+the backward integration is interpolated from checkpoints (cubic Hermite).
+
+`LeastSquaresObjective` uses either method to evaluate least-squares objectives together with
+their gradients, for gradient-based calibration.
+"""
+
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Sequence, Tuple
+
+import attr
+import numpy as np
+from numba import jit
+
+from pydemic.integrators import IntegrationMethod, _hermite_interpolation, integrate
+
+
+class GradientMode(Enum):
+    """
+    Available methods to compute gradients of calibration objectives:
+
+    1. FORWARD: forward sensitivity equations, with `n * k` extra states for `k` parameters, best
+    for a few parameters;
+
+    2. ADJOINT: backward adjoint equations, with `n + k` extra states, best for many parameters
+    (e.g. time-varying transmission rates).
+    """
+
+    FORWARD = 1
+    ADJOINT = 2
+
+
+@attr.s(auto_attribs=True)
+class SensitivityResult:
+    """
+    Stores a trajectory and its sensitivities with respect to the parameters.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points where the solution was evaluated.
+
+    :ivar numpy.ndarray y:
+        The solution, with shape `(number_of_compartments, len(t))`.
+
+    :ivar numpy.ndarray sensitivities:
+        The sensitivities `dy/dθ`, with shape `(number_of_compartments, number_of_columns, len(t))`,
+        one column for each parameter in `parameter_indices` followed by one for each extra
+        column of the initial sensitivities.
+
+    :ivar tuple parameter_indices:
+        The index of each sensitivity parameter in the parameter array.
+
+    :ivar bool success:
+        True if the integration succeeded.
+
+    :ivar str message:
+        The solver message.
+
+    :ivar int nfev:
+        Number of evaluations of the augmented RHS.
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    sensitivities: np.ndarray
+    parameter_indices: tuple
+    success: bool = True
+    message: str = ""
+    nfev: int = 0
+
+
+@lru_cache(maxsize=None)
+def make_sensitivity_rhs(
+    rhs: Callable,
+    jacobian: Callable,
+    parameter_jacobian: Callable,
+    number_of_compartments: int,
+    parameter_indices: Tuple[int, ...],
+    number_of_initial_condition_sensitivities: int = 0,
+) -> Callable:
+    """
+    Build (and cache) a compiled RHS of the model augmented with its sensitivity equations.
+
+    The augmented state is `[y, S.ravel()]`, with `S` shaped `(number_of_compartments,
+    len(parameter_indices) + number_of_initial_condition_sensitivities)`.
+
+    :param rhs:
+        A Numba compiled function `rhs(t, y, parameters)`.
+
+    :param jacobian:
+        A Numba compiled function `jacobian(t, y, parameters)` returning `dF/dy`.
+
+    :param parameter_jacobian:
+        A Numba compiled function `parameter_jacobian(t, y, parameters)` returning `dF/dθ`, with
+        one column for each parameter.
+
+    :param int number_of_compartments:
+        The number of compartments.
+
+    :param tuple parameter_indices:
+        The parameters (columns of `parameter_jacobian`) to compute sensitivities for.
+
+    :param int number_of_initial_condition_sensitivities:
+        Number of extra sensitivity columns with respect to quantities that only affect the
+        initial conditions.
+
+    :return:
+        A Numba compiled function `sensitivity_rhs(t, z, parameters)`.
+    """
+    n = number_of_compartments
+    indices = np.array(parameter_indices, dtype=np.int64)
+    k = indices.size + number_of_initial_condition_sensitivities
+
+    @jit(nopython=True)
+    def sensitivity_rhs(t, z, parameters):
+        y = z[:n]
+        S = z[n:].reshape((n, k))
+        dzdt = np.empty_like(z)
+        dzdt[:n] = rhs(t, y, parameters)
+        dSdt = np.dot(jacobian(t, y, parameters), S)
+        F = parameter_jacobian(t, y, parameters)
+        for j in range(indices.size):
+            dSdt[:, j] += F[:, indices[j]]
+        dzdt[n:] = dSdt.ravel()
+        return dzdt
+
+    return sensitivity_rhs
+
+
+def solve_sensitivities(
+    rhs: Callable,
+    jacobian: Callable,
+    parameter_jacobian: Callable,
+    t_span: Tuple[float, float],
+    y0: np.ndarray,
+    parameters: np.ndarray,
+    parameter_indices: Sequence[int] = None,
+    initial_sensitivities: np.ndarray = None,
+    t_eval: np.ndarray = None,
+    method: IntegrationMethod = IntegrationMethod.DOPRI5,
+    **kwargs,
+) -> SensitivityResult:
+    """
+    Integrate a trajectory together with its forward sensitivities, with the compiled integrators.
+
+    :param rhs:
+        A Numba compiled function `rhs(t, y, parameters)`.
+
+    :param jacobian:
+        A Numba compiled function `jacobian(t, y, parameters)` returning `dF/dy`.
+
+    :param parameter_jacobian:
+        A Numba compiled function `parameter_jacobian(t, y, parameters)` returning `dF/dθ`.
+
+    :param tuple t_span:
+        The integration interval.
+
+    :param numpy.ndarray y0:
+        The initial conditions.
+
+    :param numpy.ndarray parameters:
+        The parameter array.
+
+    :param parameter_indices:
+        The parameters to compute sensitivities for. If None, all of them.
+
+    :param numpy.ndarray initial_sensitivities:
+        The derivatives of the initial conditions with respect to the parameters, with one row
+        for each compartment and one column for each parameter in `parameter_indices`. Extra
+        columns are sensitivities with respect to quantities that only affect the initial
+        conditions (e.g. the calibrated initial number of exposed individuals). If None, zeros
+        (fixed initial conditions).
+
+    :param numpy.ndarray t_eval:
+        Times to store the solution. If None, only the interval end points.
+
+    :param IntegrationMethod method:
+        The integrator. See `pydemic.integrators.integrate` for the remaining arguments.
+
+    :return:
+        The trajectory and its sensitivities.
+    :rtype: SensitivityResult
+    """
+    parameters = np.asarray(parameters, dtype=np.float64)
+    y0 = np.asarray(y0, dtype=np.float64)
+    number_of_compartments = y0.size
+    parameter_indices, initial_sensitivities = _validate_sensitivity_arguments(
+        parameters, number_of_compartments, parameter_indices, initial_sensitivities
+    )
+    number_of_sensitivities = initial_sensitivities.shape[1]
+
+    sensitivity_rhs = make_sensitivity_rhs(
+        rhs,
+        jacobian,
+        parameter_jacobian,
+        number_of_compartments,
+        parameter_indices,
+        number_of_sensitivities - len(parameter_indices),
+    )
+    z0 = np.concatenate((y0, initial_sensitivities.ravel()))
+    solution = integrate(
+        sensitivity_rhs, t_span, z0, parameters, t_eval=t_eval, method=method, **kwargs
+    )
+
+    return SensitivityResult(
+        t=solution.t,
+        y=solution.y[:number_of_compartments],
+        sensitivities=solution.y[number_of_compartments:].reshape(
+            number_of_compartments, number_of_sensitivities, -1
+        ),
+        parameter_indices=parameter_indices,
+        success=solution.success,
+        message=solution.message,
+        nfev=solution.nfev,
+    )
+
+
+@attr.s(auto_attribs=True)
+class AdjointResult:
+    """
+    Stores a trajectory and the gradient of a cost computed with the adjoint method.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points where the solution was evaluated.
+
+    :ivar numpy.ndarray y:
+        The solution, with shape `(number_of_compartments, len(t))`.
+
+    :ivar numpy.ndarray gradient:
+        The cost gradient, with one entry for each parameter in `parameter_indices` followed by one
+        for each extra column of the initial sensitivities. None if the integration failed.
+
+    :ivar tuple parameter_indices:
+        The index of each gradient parameter in the parameter array.
+
+    :ivar bool success:
+        True if the forward and backward integrations succeeded.
+
+    :ivar str message:
+        The solver message.
+
+    :ivar int nfev:
+        Number of RHS evaluations, forward and backward.
+    """
+
+    t: np.ndarray
+    y: np.ndarray
+    gradient: np.ndarray
+    parameter_indices: tuple
+    success: bool = True
+    message: str = ""
+    nfev: int = 0
+
+
+@jit(nopython=True)
+def _evaluate_rhs_on_grid(rhs, grid_t, grid_y, parameters):
+    grid_f = np.empty_like(grid_y)
+    for i in range(grid_t.shape[0]):
+        grid_f[i] = rhs(grid_t[i], grid_y[i], parameters)
+    return grid_f
+
+
+@jit(nopython=True)
+def _interpolate_trajectory(t, grid_t, grid_y, grid_f):
+    i = np.searchsorted(grid_t, t)
+    if i == 0:
+        return grid_y[0].copy()
+    if i >= grid_t.shape[0]:
+        return grid_y[-1].copy()
+    h = grid_t[i] - grid_t[i - 1]
+    return _hermite_interpolation(
+        t, grid_t[i - 1], h, grid_y[i - 1], grid_f[i - 1], grid_y[i], grid_f[i]
+    )
+
+
+@lru_cache(maxsize=None)
+def make_adjoint_rhs(
+    jacobian: Callable,
+    parameter_jacobian: Callable,
+    number_of_compartments: int,
+    parameter_indices: Tuple[int, ...],
+) -> Callable:
+    """
+    Build (and cache) a compiled RHS of the adjoint equations, in reversed time `s = t_end - t`.
+
+    The adjoint state is `[λ, μ]`, where `μ` accumulates `∫ λ^T F dt` for the parameters in
+    `parameter_indices`. The data argument is the tuple
+    `(parameters, t_end, grid_t, grid_y, grid_f)`, where the grid arrays are forward trajectory
+    checkpoints (one row per time) and the RHS at them.
+
+    :return:
+        A Numba compiled function `adjoint_rhs(s, z, data)`.
+    """
+    n = number_of_compartments
+    indices = np.array(parameter_indices, dtype=np.int64)
+    k = indices.size
+
+    @jit(nopython=True)
+    def adjoint_rhs(s, z, data):
+        parameters, t_end, grid_t, grid_y, grid_f = data
+        t = t_end - s
+        y = _interpolate_trajectory(t, grid_t, grid_y, grid_f)
+        adjoint = z[:n]
+        dzds = np.empty_like(z)
+        dzds[:n] = np.dot(jacobian(t, y, parameters).T, adjoint)
+        F = parameter_jacobian(t, y, parameters)
+        for j in range(k):
+            accumulated = 0.0
+            for i in range(n):
+                accumulated += F[i, indices[j]] * adjoint[i]
+            dzds[n + j] = accumulated
+        return dzds
+
+    return adjoint_rhs
+
+
+def solve_adjoint(
+    rhs: Callable,
+    jacobian: Callable,
+    parameter_jacobian: Callable,
+    t_eval: np.ndarray,
+    y0: np.ndarray,
+    parameters: np.ndarray,
+    cost_gradient: Callable,
+    parameter_indices: Sequence[int] = None,
+    initial_sensitivities: np.ndarray = None,
+    checkpoints_per_interval: int = 8,
+    method: IntegrationMethod = IntegrationMethod.DOPRI5,
+    **kwargs,
+) -> AdjointResult:
+    """
+    Integrate a trajectory and compute the gradient of a cost of its values at `t_eval` with the
+    adjoint method.
+
+    :param rhs:
+        A Numba compiled function `rhs(t, y, parameters)`.
+
+    :param jacobian:
+        A Numba compiled function `jacobian(t, y, parameters)` returning `dF/dy`.
+
+    :param parameter_jacobian:
+        A Numba compiled function `parameter_jacobian(t, y, parameters)` returning `dF/dθ`.
+
+    :param numpy.ndarray t_eval:
+        The times where the cost is evaluated. The integration starts at `t_eval[0]`.
+
+    :param numpy.ndarray y0:
+        The initial conditions.
+
+    :param numpy.ndarray parameters:
+        The parameter array.
+
+    :param cost_gradient:
+        A function receiving the `(number_of_compartments, len(t_eval))` trajectory and returning
+        the derivatives of the cost with respect to it, with the same shape.
+
+    :param parameter_indices:
+        The parameters to compute the gradient for. If None, all of them.
+
+    :param numpy.ndarray initial_sensitivities:
+        The derivatives of the initial conditions, as in `solve_sensitivities`.
+
+    :param int checkpoints_per_interval:
+        Number of forward trajectory checkpoints between consecutive `t_eval` points, used to
+        interpolate the trajectory in the backward integration.
+
+    :param IntegrationMethod method:
+        The integrator, for both directions. See `pydemic.integrators.integrate` for the remaining
+        arguments.
+
+    :return:
+        The trajectory and the cost gradient.
+    :rtype: AdjointResult
+    """
+    parameters = np.asarray(parameters, dtype=np.float64)
+    y0 = np.asarray(y0, dtype=np.float64)
+    t_eval = np.asarray(t_eval, dtype=np.float64)
+    number_of_compartments = y0.size
+    parameter_indices, initial_sensitivities = _validate_sensitivity_arguments(
+        parameters, number_of_compartments, parameter_indices, initial_sensitivities
+    )
+    if t_eval.size < 2:
+        raise ValueError("t_eval must have at least two time points.")
+    if checkpoints_per_interval <= 0:
+        raise ValueError("Number of checkpoints per interval must be greater than 0.")
+
+    # Forward pass, storing checkpoints
+    fractions = np.arange(checkpoints_per_interval) / checkpoints_per_interval
+    grid_t = np.append(
+        (t_eval[:-1, np.newaxis] + np.diff(t_eval)[:, np.newaxis] * fractions), t_eval[-1]
+    )
+    forward_solution = integrate(
+        rhs, (t_eval[0], t_eval[-1]), y0, parameters, t_eval=grid_t, method=method, **kwargs
+    )
+    y = forward_solution.y[:, ::checkpoints_per_interval]
+    nfev = forward_solution.nfev
+    if not forward_solution.success:
+        return AdjointResult(
+            t=t_eval,
+            y=y,
+            gradient=None,
+            parameter_indices=parameter_indices,
+            success=False,
+            message=forward_solution.message,
+            nfev=nfev,
+        )
+    grid_y = np.ascontiguousarray(forward_solution.y.T)
+    grid_f = _evaluate_rhs_on_grid(rhs, grid_t, grid_y, parameters)
+    nfev += grid_t.size
+
+    # Backward pass, with jumps of the adjoint at the cost evaluation times
+    jumps = np.asarray(cost_gradient(y), dtype=np.float64)
+    if jumps.shape != y.shape:
+        raise ValueError("The cost gradient must have the same shape as the trajectory.")
+    adjoint_rhs = make_adjoint_rhs(
+        jacobian, parameter_jacobian, number_of_compartments, parameter_indices
+    )
+    number_of_parameters = len(parameter_indices)
+    z = np.zeros(number_of_compartments + number_of_parameters)
+    for i in range(t_eval.size - 1, 0, -1):
+        z[:number_of_compartments] += jumps[:, i]
+        data = (parameters, t_eval[i], grid_t, grid_y, grid_f)
+        backward_solution = integrate(
+            adjoint_rhs, (0.0, t_eval[i] - t_eval[i - 1]), z, data, method=method, **kwargs
+        )
+        nfev += backward_solution.nfev
+        if not backward_solution.success:
+            return AdjointResult(
+                t=t_eval,
+                y=y,
+                gradient=None,
+                parameter_indices=parameter_indices,
+                success=False,
+                message=backward_solution.message,
+                nfev=nfev,
+            )
+        z = backward_solution.y[:, -1]
+    adjoint = z[:number_of_compartments] + jumps[:, 0]
+
+    gradient = np.dot(initial_sensitivities.T, adjoint)
+    gradient[:number_of_parameters] += z[number_of_compartments:]
+    return AdjointResult(
+        t=t_eval,
+        y=y,
+        gradient=gradient,
+        parameter_indices=parameter_indices,
+        success=True,
+        message=forward_solution.message,
+        nfev=nfev,
+    )
+
+
+def _validate_sensitivity_arguments(
+    parameters, number_of_compartments, parameter_indices, initial_sensitivities
+):
+    if parameter_indices is None:
+        parameter_indices = range(parameters.size)
+    parameter_indices = tuple(int(index) for index in parameter_indices)
+    if any(not 0 <= index < parameters.size for index in parameter_indices):
+        raise ValueError("Parameter indices out of bounds.")
+    if initial_sensitivities is None:
+        initial_sensitivities = np.zeros((number_of_compartments, len(parameter_indices)))
+    initial_sensitivities = np.atleast_2d(np.asarray(initial_sensitivities, dtype=np.float64))
+    if initial_sensitivities.shape[0] != number_of_compartments or initial_sensitivities.shape[
+        1
+    ] < len(parameter_indices):
+        raise ValueError(
+            "Initial sensitivities must have one row for each compartment and at least one "
+            "column for each parameter."
+        )
+    return parameter_indices, initial_sensitivities
+
+
+@attr.s(auto_attribs=True)
+class LeastSquaresObjective:
+    """
+    A weighted least-squares calibration objective with exact gradients:
+
+        f(x) = 1 / len(t_eval) * sum_k weights[k] * sum_t (y_k(t; x) - observations[k, t]) ** 2
+
+    The decision vector `x` holds the calibrated parameters followed by the calibrated initial
+    conditions. As in the calibration scripts, the initial value of `conserved_compartment` (e.g.
+    the susceptibles) absorbs changes in the calibrated initial conditions, so the total
+    population is kept.
+
+    The last evaluation is cached, so evaluating the objective and its gradient at the same point
+    costs a single solve. If the integration fails, `failure_value` is returned and the gradient
+    is zero.
+
+    Members
+    ----------------
+
+    :ivar model:
+        A compartmental model from `pydemic.models`.
+
+    :ivar numpy.ndarray y0:
+        The initial conditions. The calibrated ones are overwritten by `x`.
+
+    :ivar numpy.ndarray t_eval:
+        The observation times. The integration starts at `t_eval[0]`.
+
+    :ivar numpy.ndarray observations:
+        The `(len(observed_compartments), len(t_eval))` observed data.
+
+    :ivar tuple observed_compartments:
+        The names of the observed compartments.
+
+    :ivar tuple calibrated_parameters:
+        The names of the parameters in the decision vector `x`, in order.
+
+    :ivar dict fixed_parameters:
+        Values for the parameters not calibrated. Model defaults are used for the missing ones.
+
+    :ivar tuple calibrated_initial_conditions:
+        The names of the compartments whose initial values follow the parameters in `x`.
+
+    :ivar str conserved_compartment:
+        The compartment whose initial value compensates the calibrated initial conditions. If
+        None, the total population is not kept.
+
+    :ivar numpy.ndarray weights:
+        The weight of each observed compartment. Defaults to ones.
+
+    :ivar GradientMode gradient_mode:
+        The method to compute the gradient.
+
+    :ivar IntegrationMethod method:
+        The integrator.
+
+    :ivar float rtol:
+        Relative tolerance.
+
+    :ivar float atol:
+        Absolute tolerance.
+
+    :ivar float failure_value:
+        The objective value when the integration fails.
+    """
+
+    model: object
+    y0: np.ndarray
+    t_eval: np.ndarray
+    observations: np.ndarray
+    observed_compartments: tuple
+    calibrated_parameters: tuple
+    fixed_parameters: dict = attr.Factory(dict)
+    calibrated_initial_conditions: tuple = ()
+    conserved_compartment: str = None
+    weights: np.ndarray = None
+    gradient_mode: GradientMode = GradientMode.FORWARD
+    method: IntegrationMethod = IntegrationMethod.DOPRI5
+    rtol: float = 1e-8
+    atol: float = 1e-8
+    failure_value: float = 1e15
+    _last_evaluation: tuple = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self.y0 = np.asarray(self.y0, dtype=np.float64)
+        self.t_eval = np.asarray(self.t_eval, dtype=np.float64)
+        self.observed_compartments = tuple(self.observed_compartments)
+        self.calibrated_parameters = tuple(self.calibrated_parameters)
+        self.calibrated_initial_conditions = tuple(self.calibrated_initial_conditions)
+        self.observations = np.atleast_2d(np.asarray(self.observations, dtype=np.float64))
+        if self.observations.shape != (len(self.observed_compartments), self.t_eval.size):
+            raise ValueError(
+                "Observations must have shape (len(observed_compartments), len(t_eval))."
+            )
+        compartments = self.observed_compartments + self.calibrated_initial_conditions
+        if self.conserved_compartment is not None:
+            compartments += (self.conserved_compartment,)
+        unknown_compartments = set(compartments) - set(self.model.compartments)
+        if unknown_compartments:
+            raise ValueError(f"Unknown compartments: {sorted(unknown_compartments)}.")
+        if self.conserved_compartment in self.calibrated_initial_conditions:
+            raise ValueError("The conserved compartment can not be calibrated.")
+        unknown_parameters = set(self.calibrated_parameters) - set(self.model.parameters)
+        if unknown_parameters:
+            raise ValueError(f"Unknown parameters: {sorted(unknown_parameters)}.")
+        if self.weights is None:
+            self.weights = np.ones(len(self.observed_compartments))
+        self.weights = np.asarray(self.weights, dtype=np.float64)
+        if self.weights.shape != (len(self.observed_compartments),):
+            raise ValueError("Weights must have one value for each observed compartment.")
+
+    @property
+    def number_of_decision_variables(self):
+        return len(self.calibrated_parameters) + len(self.calibrated_initial_conditions)
+
+    def __call__(self, x: np.ndarray) -> float:
+        return self.value_and_gradient(x)[0]
+
+    def gradient(self, x: np.ndarray) -> np.ndarray:
+        return self.value_and_gradient(x)[1]
+
+    def value_and_gradient(self, x: np.ndarray) -> Tuple[float, np.ndarray]:
+        """
+        Evaluate the objective and its gradient. Compatible with `scipy.optimize.minimize` with
+        `jac=True`.
+        """
+        x = np.array(x, dtype=np.float64)
+        if self._last_evaluation is not None and np.array_equal(self._last_evaluation[0], x):
+            return self._last_evaluation[1], self._last_evaluation[2].copy()
+        if len(x) != self.number_of_decision_variables:
+            raise ValueError("The decision vector must have one value per calibrated quantity.")
+
+        number_of_parameters = len(self.calibrated_parameters)
+        parameter_values = dict(self.fixed_parameters)
+        parameter_values.update(zip(self.calibrated_parameters, x[:number_of_parameters]))
+        parameters = self.model.parameter_vector(**parameter_values)
+        y0, initial_sensitivities = self._initial_conditions(x[number_of_parameters:])
+        observed_indices = [self.model.compartments.index(c) for c in self.observed_compartments]
+        solver_options = dict(
+            sensitivity_parameters=self.calibrated_parameters,
+            initial_sensitivities=initial_sensitivities,
+            method=self.method,
+            rtol=self.rtol,
+            atol=self.atol,
+        )
+
+        if self.gradient_mode == GradientMode.FORWARD:
+            solution = self.model.solve_sensitivities(
+                y0,
+                (self.t_eval[0], self.t_eval[-1]),
+                parameters,
+                t_eval=self.t_eval,
+                **solver_options,
+            )
+            success = solution.success and np.all(np.isfinite(solution.y))
+            if success:
+                weighted_residuals = self._weighted_residuals(solution.y[observed_indices])
+                gradient = 2.0 * np.einsum(
+                    "kt,kjt->j", weighted_residuals, solution.sensitivities[observed_indices]
+                )
+        elif self.gradient_mode == GradientMode.ADJOINT:
+
+            def cost_gradient(y):
+                jumps = np.zeros_like(y)
+                jumps[observed_indices] = 2.0 * self._weighted_residuals(y[observed_indices])
+                return jumps
+
+            solution = self.model.solve_adjoint(
+                y0, self.t_eval, parameters, cost_gradient, **solver_options
+            )
+            success = solution.success and np.all(np.isfinite(solution.gradient))
+            if success:
+                weighted_residuals = self._weighted_residuals(solution.y[observed_indices])
+                gradient = solution.gradient
+        else:
+            raise NotImplementedError("Unavailable gradient mode.")
+
+        if success:
+            residuals = solution.y[observed_indices] - self.observations
+            value = float(np.sum(weighted_residuals * residuals))
+        else:
+            value, gradient = self.failure_value, np.zeros(self.number_of_decision_variables)
+
+        self._last_evaluation = (x, value, gradient)
+        return value, gradient.copy()
+
+    def evaluate_population(self, population: np.ndarray, method: str = "LSODA") -> np.ndarray:
+        """
+        Evaluate the objective for a whole population in a single ensemble solve (see
+        `pydemic.ensemble.solve_ensemble`), e.g. a generation of differential evolution. If the
+        ensemble integration fails, the candidates are integrated again one by one.
+
+        :param numpy.ndarray population:
+            The `(number_of_candidates, number_of_decision_variables)` decision vectors.
+
+        :param str method:
+            The `scipy.integrate.solve_ivp` method.
+
+        :return:
+            The objective value of each candidate, `failure_value` for the failed ones.
+        :rtype: numpy.ndarray
+        """
+        population = np.atleast_2d(np.asarray(population, dtype=np.float64))
+        if population.shape[1] != self.number_of_decision_variables:
+            raise ValueError("The decision vectors must have one value per calibrated quantity.")
+        number_of_candidates = population.shape[0]
+        number_of_parameters = len(self.calibrated_parameters)
+        parameter_values = dict(self.fixed_parameters)
+        parameter_values.update(zip(self.calibrated_parameters, population.T))
+        parameters = self.model.parameter_matrix(number_of_candidates, **parameter_values)
+        initial_conditions = np.array(
+            [self._initial_conditions(x[number_of_parameters:])[0] for x in population]
+        )
+
+        solver_options = dict(t_eval=self.t_eval, method=method, rtol=self.rtol, atol=self.atol)
+        t_span = (self.t_eval[0], self.t_eval[-1])
+        solution = self.model.solve_ensemble(
+            parameters, initial_conditions, t_span, **solver_options
+        )
+        if not solution.success:
+            # A failed candidate stops the integration of the whole stacked ensemble: solve each
+            # candidate on its own, so that only the failed ones get `failure_value`
+            solution = self.model.solve_ensemble(
+                parameters, initial_conditions, t_span, realizations_per_batch=1, **solver_options
+            )
+        observed_indices = [self.model.compartments.index(c) for c in self.observed_compartments]
+        residuals = solution.y[:, observed_indices, :] - self.observations
+        values = np.einsum("k,ikt->i", self.weights, residuals**2) / self.t_eval.size
+        values[~np.isfinite(values)] = self.failure_value
+        return values
+
+    def _weighted_residuals(self, observed_y):
+        residuals = observed_y - self.observations
+        return self.weights[:, np.newaxis] * residuals / self.t_eval.size
+
+    def _initial_conditions(self, calibrated_initial_values):
+        number_of_parameters = len(self.calibrated_parameters)
+        y0 = self.y0.copy()
+        initial_sensitivities = np.zeros((y0.size, self.number_of_decision_variables))
+        for column, (compartment, value) in enumerate(
+            zip(self.calibrated_initial_conditions, calibrated_initial_values),
+            start=number_of_parameters,
+        ):
+            index = self.model.compartments.index(compartment)
+            initial_sensitivities[index, column] = 1.0
+            if self.conserved_compartment is not None:
+                conserved_index = self.model.compartments.index(self.conserved_compartment)
+                y0[conserved_index] -= value - y0[index]
+                initial_sensitivities[conserved_index, column] = -1.0
+            y0[index] = value
+        return y0, initial_sensitivities
@@ -0,0 +1,342 @@
+"""
+A module to store ensembles of trajectories on disk, so that plots and reports can be generated
+again without integrating the model once more.
+
+A store is a directory with:
+
+* ``metadata.json``: the compartment names, the number of written realizations and any metadata
+  given by the user (e.g. the model name and the parameters of each realization);
+* ``t.npy``: the time points;
+* ``trajectories.npy``: a NumPy array with shape ``(number_of_realizations,
+  number_of_compartments, len(t))``, memory-mapped when the store is opened.
+
+Realizations are contiguous, so appending them is a sequential write, and reading a compartment
+or a time window only reads the pages holding it.
+"""
+
+import json
+import os
+from typing import Sequence, Union
+
+import attr
+import numpy as np
+
+from pydemic.ensemble import EnsembleSolution
+from pydemic.summary import EnsembleSummary, summarize_ensemble
+
+_METADATA_FILE_NAME = "metadata.json"
+_TIMES_FILE_NAME = "t.npy"
+_TRAJECTORIES_FILE_NAME = "trajectories.npy"
+_FORMAT_VERSION = 1
+
+
+@attr.s(auto_attribs=True)
+class EnsembleStore:
+    """
+    An ensemble of trajectories stored in a directory. Use `EnsembleStore.create` to create a
+    store and `EnsembleStore.open` to read (or append to) an existing one.
+
+    Members
+    ----------------
+
+    :ivar str path:
+        The store directory.
+
+    :ivar numpy.ndarray t:
+        The time points.
+
+    :ivar tuple compartments:
+        The compartment names.
+
+    :ivar numpy.memmap trajectories:
+        All trajectories, including the realizations not written yet.
+
+    :ivar int number_of_written_realizations:
+        The number of realizations written so far. Only these are read.
+
+    :ivar dict metadata:
+        User metadata, stored as JSON.
+    """
+
+    path: str
+    t: np.ndarray
+    compartments: tuple
+    trajectories: np.memmap = attr.ib(repr=False)
+    number_of_written_realizations: int = 0
+    metadata: dict = attr.Factory(dict)
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        t: np.ndarray,
+        compartments: Sequence[str],
+        number_of_realizations: int,
+        metadata: dict = None,
+        dtype=np.float64,
+    ) -> "EnsembleStore":
+        """
+        Create an empty store. Its size is allocated on disk, but no trajectory is written.
+
+        :param str path:
+            The store directory. It is created if needed, and must not hold a store already.
+
+        :param numpy.ndarray t:
+            The time points.
+
+        :param compartments:
+            The compartment names.
+
+        :param int number_of_realizations:
+            The maximum number of realizations.
+
+        :param dict metadata:
+            User metadata. It must be serializable to JSON.
+
+        :param dtype:
+            The trajectory data type, e.g. `numpy.float32` to halve the size of the store.
+
+        :rtype: EnsembleStore
+        """
+        if number_of_realizations <= 0:
+            raise ValueError("Number of realizations must be greater than 0.")
+        if os.path.exists(os.path.join(path, _METADATA_FILE_NAME)):
+            raise ValueError(f"There is already an ensemble store in {path}.")
+        os.makedirs(path, exist_ok=True)
+
+        t = np.asarray(t, dtype=np.float64)
+        np.save(os.path.join(path, _TIMES_FILE_NAME), t)
+        compartments = tuple(compartments)
+        trajectories = np.lib.format.open_memmap(
+            os.path.join(path, _TRAJECTORIES_FILE_NAME),
+            mode="w+",
+            dtype=dtype,
+            shape=(number_of_realizations, len(compartments), len(t)),
+        )
+        store = cls(
+            path=path,
+            t=t,
+            compartments=compartments,
+            trajectories=trajectories,
+            metadata={} if metadata is None else dict(metadata),
+        )
+        store.flush()
+        return store
+
+    @classmethod
+    def open(cls, path: str, mode: str = "r") -> "EnsembleStore":
+        """
+        Open an existing store.
+
+        :param str path:
+            The store directory.
+
+        :param str mode:
+            `"r"` to read the store, or `"r+"` to append to it.
+
+        :rtype: EnsembleStore
+        """
+        if mode not in ("r", "r+"):
+            raise ValueError(f'Invalid mode: {mode}. Use "r" or "r+".')
+        with open(os.path.join(path, _METADATA_FILE_NAME)) as metadata_file:
+            header = json.load(metadata_file)
+        if header["format_version"] != _FORMAT_VERSION:
+            raise ValueError(f"Unsupported ensemble store version: {header['format_version']}.")
+
+        return cls(
+            path=path,
+            t=np.load(os.path.join(path, _TIMES_FILE_NAME)),
+            compartments=tuple(header["compartments"]),
+            trajectories=np.load(os.path.join(path, _TRAJECTORIES_FILE_NAME), mmap_mode=mode),
+            number_of_written_realizations=header["number_of_written_realizations"],
+            metadata=header["metadata"],
+        )
+
+    @property
+    def number_of_realizations(self) -> int:
+        """
+        The maximum number of realizations.
+        """
+        return self.trajectories.shape[0]
+
+    def append(self, trajectories: Union[np.ndarray, EnsembleSolution]) -> None:
+        """
+        Write realizations after the ones already written. They are only recorded as written
+        (and read back by other processes) after `flush` or `close`.
+
+        :param trajectories:
+            One realization, with shape `(number_of_compartments, len(t))`, a batch of
+            realizations with shape `(number_of_realizations, number_of_compartments, len(t))`,
+            or an `EnsembleSolution`.
+        """
+        if isinstance(trajectories, EnsembleSolution):
+            trajectories = trajectories.y
+        trajectories = np.asarray(trajectories)
+        if trajectories.ndim == 2:
+            trajectories = trajectories[np.newaxis]
+        if trajectories.shape[1:] != self.trajectories.shape[1:]:
+            raise ValueError(
+                f"Trajectories must have shape {self.trajectories.shape[1:]}, but have "
+                f"{trajectories.shape[1:]}."
+            )
+        start = self.number_of_written_realizations
+        end = start + trajectories.shape[0]
+        if end > self.number_of_realizations:
+            raise ValueError(
+                f"The store is full: it holds at most {self.number_of_realizations} realizations."
+            )
+        self.trajectories[start:end] = trajectories
+        self.number_of_written_realizations = end
+
+    def read(
+        self,
+        compartments: Union[str, Sequence[str]] = None,
+        t_start: float = None,
+        t_end: float = None,
+        realizations: slice = slice(None),
+    ) -> np.ndarray:
+        """
+        Read the written trajectories of some compartments in a time window, without loading the
+        rest of the store into memory.
+
+        :param compartments:
+            A compartment name, which drops the compartment axis, or a sequence of names.
+            Defaults to all compartments.
+
+        :param float t_start:
+            The first time point to read. Defaults to the first one.
+
+        :param float t_end:
+            The last time point to read. Defaults to the last one.
+
+        :param slice realizations:
+            The realizations to read, among the written ones.
+
+        :return:
+            A read-only view of the trajectories (a copy when the compartments are not
+            consecutive), with shape `(number_of_realizations, number_of_compartments,
+            number_of_times)`, or `(number_of_realizations, number_of_times)` for a single
+            compartment name.
+        :rtype: numpy.ndarray
+        """
+        time_slice = self._time_slice(t_start, t_end)
+        written_trajectories = self.trajectories[: self.number_of_written_realizations]
+        written_trajectories = written_trajectories[realizations]
+        if isinstance(compartments, str):
+            compartment_selection = self._compartment_index(compartments)
+        else:
+            compartment_selection = self._compartment_selection(compartments)
+        trajectories = written_trajectories[:, compartment_selection, time_slice].view(np.ndarray)
+        trajectories.flags.writeable = False
+        return trajectories
+
+    def summarize(
+        self,
+        compartments: Sequence[str] = None,
+        t_start: float = None,
+        t_end: float = None,
+        **kwargs,
+    ) -> EnsembleSummary:
+        """
+        Summarize the written trajectories of some compartments in a time window, reading them
+        chunk by chunk.
+
+        :param compartments:
+            The compartment names. Defaults to all compartments.
+
+        :param float t_start:
+            The first time point. Defaults to the first one.
+
+        :param float t_end:
+            The last time point. Defaults to the last one.
+
+        :param kwargs:
+            Other arguments of `summarize_ensemble`, such as `quantiles` or `hdi_probabilities`.
+
+        :rtype: EnsembleSummary
+        """
+        compartment_selection = self._compartment_selection(compartments)
+        time_slice = self._time_slice(t_start, t_end)
+        written_trajectories = self.trajectories[: self.number_of_written_realizations]
+        if isinstance(compartment_selection, slice):
+            return summarize_ensemble(
+                written_trajectories[:, compartment_selection, time_slice],
+                t=self.t[time_slice],
+                compartments=self.compartments[compartment_selection],
+                **kwargs,
+            )
+
+        # Summarize a view of each compartment, instead of a copy of all the selected ones
+        summaries = [
+            summarize_ensemble(
+                written_trajectories[:, index, time_slice],
+                t=self.t[time_slice],
+                compartments=(self.compartments[index],),
+                **kwargs,
+            )
+            for index in compartment_selection
+        ]
+        hdi = [summary.hdi for summary in summaries]
+        return attr.evolve(
+            summaries[0],
+            compartments=tuple(self.compartments[index] for index in compartment_selection),
+            quantile_values=np.concatenate([summary.quantile_values for summary in summaries], 1),
+            mean=np.concatenate([summary.mean for summary in summaries], 0),
+            hdi=None if hdi[0] is None else np.concatenate(hdi, 2),
+        )
+
+    def flush(self) -> None:
+        """
+        Write the trajectories to disk and record them as written.
+        """
+        self.trajectories.flush()
+        header = dict(
+            format_version=_FORMAT_VERSION,
+            compartments=list(self.compartments),
+            number_of_written_realizations=self.number_of_written_realizations,
+            metadata=self.metadata,
+        )
+        metadata_path = os.path.join(self.path, _METADATA_FILE_NAME)
+        temporary_path = f"{metadata_path}.tmp"
+        with open(temporary_path, "w") as metadata_file:
+            json.dump(header, metadata_file, indent=4)
+        os.replace(temporary_path, metadata_path)
+
+    def close(self) -> None:
+        """
+        Flush a writable store.
+        """
+        if self.trajectories.mode != "r":
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _time_slice(self, t_start, t_end):
+        start = 0 if t_start is None else np.searchsorted(self.t, t_start, side="left")
+        end = len(self.t) if t_end is None else np.searchsorted(self.t, t_end, side="right")
+        if start >= end:
+            raise ValueError(f"There are no time points between {t_start} and {t_end}.")
+        return slice(start, end)
+
+    def _compartment_selection(self, compartment_names):
+        """
+        Select compartments with a slice when they are consecutive (so that the selection is a
+        view of the store), or with a list of indices otherwise.
+        """
+        if compartment_names is None:
+            return slice(None)
+        indices = [self._compartment_index(name) for name in compartment_names]
+        if len(indices) == 0:
+            raise ValueError("At least one compartment must be selected.")
+        if indices == list(range(indices[0], indices[-1] + 1)):
+            return slice(indices[0], indices[-1] + 1)
+        return indices
+
+    def _compartment_index(self, compartment_name):
+        if compartment_name not in self.compartments:
+            raise ValueError(f"Unknown compartment: {compartment_name}.")
+        return self.compartments.index(compartment_name)
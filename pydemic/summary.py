@@ -0,0 +1,573 @@
+"""
+A module to summarize ensembles of trajectories by their quantiles, means and highest density
+intervals (HDI).
+
+All statistics of all compartments are computed in one pass over the ensemble, one chunk of time
+points at a time: each chunk is copied once and then partially sorted (`numpy.partition`) at all
+the order statistics needed by the quantiles, or fully sorted when highest density intervals are
+requested. This replaces one `numpy.percentile` call (and one sort of the same data) per
+compartment and quantile. Chunks can be summarized by several threads, since NumPy releases the
+GIL while sorting.
+
+Ensembles that do not fit in memory can be summarized while they are generated by a
+`StreamingEnsembleSummary`, which keeps a mergeable t-digest (a bounded set of weighted centroids)
+per compartment and time point instead of the realizations themselves.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence
+
+import attr
+import numpy as np
+import pandas as pd
+
+from pydemic.ensemble import EnsembleSolution
+
+DEFAULT_QUANTILES = (0.025, 0.5, 0.975)
+
+# The default number of values copied at once (64 MB of doubles)
+_DEFAULT_CHUNK_VALUES = 2**23
+
+# The minimum t-digest compression of a streaming summary
+_MINIMUM_COMPRESSION = 10
+
+
+@attr.s(auto_attribs=True)
+class EnsembleSummary:
+    """
+    The statistics of an ensemble of trajectories, at each time point.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points.
+
+    :ivar tuple compartments:
+        The compartment names.
+
+    :ivar tuple quantiles:
+        The quantiles, between 0 and 1.
+
+    :ivar numpy.ndarray quantile_values:
+        The quantiles of each compartment, with shape `(len(quantiles), len(compartments),
+        len(t))`.
+
+    :ivar numpy.ndarray mean:
+        The mean of each compartment, with shape `(len(compartments), len(t))`.
+
+    :ivar tuple hdi_probabilities:
+        The probabilities of the highest density intervals.
+
+    :ivar numpy.ndarray hdi:
+        The lower and upper bounds of the highest density intervals, with shape
+        `(len(hdi_probabilities), 2, len(compartments), len(t))`.
+
+    :ivar int number_of_realizations:
+        The number of summarized realizations.
+    """
+
+    t: np.ndarray
+    compartments: tuple
+    quantiles: tuple
+    quantile_values: np.ndarray
+    mean: np.ndarray
+    hdi_probabilities: tuple = ()
+    hdi: np.ndarray = None
+    number_of_realizations: int = None
+
+    def get_quantile(self, compartment_name: str, quantile: float) -> np.ndarray:
+        """
+        Get a quantile of a compartment at each time point.
+
+        :param str compartment_name:
+            The compartment name.
+
+        :param float quantile:
+            One of the summarized quantiles.
+
+        :return:
+            The quantile values.
+        :rtype: numpy.ndarray
+        """
+        if quantile not in self.quantiles:
+            raise ValueError(f"Quantile {quantile} was not summarized.")
+        return self.quantile_values[
+            self.quantiles.index(quantile), self._compartment_index(compartment_name)
+        ]
+
+    def get_mean(self, compartment_name: str) -> np.ndarray:
+        """
+        Get the mean of a compartment at each time point.
+        """
+        return self.mean[self._compartment_index(compartment_name)]
+
+    def get_hdi(self, compartment_name: str, probability: float):
+        """
+        Get a highest density interval of a compartment at each time point.
+
+        :param str compartment_name:
+            The compartment name.
+
+        :param float probability:
+            One of the summarized HDI probabilities.
+
+        :return:
+            The lower and upper bounds.
+        :rtype: tuple
+        """
+        if probability not in self.hdi_probabilities:
+            raise ValueError(f"HDI with probability {probability} was not summarized.")
+        lower, upper = self.hdi[
+            self.hdi_probabilities.index(probability), :, self._compartment_index(compartment_name)
+        ]
+        return lower, upper
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Collect the statistics in a table.
+
+        :return:
+            One row per compartment and time point, with the columns `compartment`, `t`, `mean`,
+            `quantile_<q>` for each quantile and `hdi_<p>_lower` and `hdi_<p>_upper` for each HDI
+            probability.
+        :rtype: pandas.DataFrame
+        """
+        number_of_compartments, number_of_times = len(self.compartments), len(self.t)
+        columns = {
+            "compartment": np.repeat(self.compartments, number_of_times),
+            "t": np.tile(self.t, number_of_compartments),
+            "mean": self.mean.ravel(),
+        }
+        for quantile, values in zip(self.quantiles, self.quantile_values):
+            columns[f"quantile_{quantile:g}"] = values.ravel()
+        for probability, (lower, upper) in zip(self.hdi_probabilities, self._hdi_bounds()):
+            columns[f"hdi_{probability:g}_lower"] = lower.ravel()
+            columns[f"hdi_{probability:g}_upper"] = upper.ravel()
+        return pd.DataFrame(columns)
+
+    def _hdi_bounds(self):
+        return [] if self.hdi is None else self.hdi
+
+    def _compartment_index(self, compartment_name):
+        if compartment_name not in self.compartments:
+            raise ValueError(f"Unknown compartment: {compartment_name}.")
+        return self.compartments.index(compartment_name)
+
+
+def summarize_ensemble(
+    trajectories,
+    t: np.ndarray = None,
+    compartments: Sequence[str] = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    hdi_probabilities: Sequence[float] = (),
+    chunk_size: int = None,
+    number_of_threads: int = 1,
+) -> EnsembleSummary:
+    """
+    Compute the quantiles, means and highest density intervals of all compartments of an ensemble
+    at each time point.
+
+    The quantiles are linearly interpolated between order statistics, as `numpy.percentile` does.
+    The highest density interval with probability `p` is the narrowest interval holding
+    `floor(p * number_of_realizations) + 1` realizations. The statistics of time points where any
+    realization is NaN (e.g. a failed integration) are NaN.
+
+    :param trajectories:
+        An `EnsembleSolution`, or an array with shape `(number_of_realizations,
+        number_of_compartments, number_of_times)` (or `(number_of_realizations, number_of_times)`
+        for a single compartment), e.g. an `np.memmap`.
+
+    :param numpy.ndarray t:
+        The time points. Defaults to the ones of the `EnsembleSolution`, or to `0, 1, ...`.
+
+    :param compartments:
+        The compartment names. Defaults to the ones of the `EnsembleSolution`, or to
+        `X0, X1, ...`.
+
+    :param quantiles:
+        The quantiles, between 0 and 1.
+
+    :param hdi_probabilities:
+        The probabilities of the highest density intervals, between 0 and 1.
+
+    :param int chunk_size:
+        The number of time points of a compartment summarized at once. Defaults to chunks of
+        about 64 MB.
+
+    :param int number_of_threads:
+        The number of threads summarizing the chunks.
+
+    :return:
+        The statistics.
+    :rtype: EnsembleSummary
+    """
+    if isinstance(trajectories, EnsembleSolution):
+        if t is None:
+            t = trajectories.t
+        if compartments is None:
+            compartments = trajectories.compartments
+        trajectories = trajectories.y
+    if trajectories.ndim == 2:
+        trajectories = trajectories[:, np.newaxis, :]
+    if trajectories.ndim != 3:
+        raise ValueError("Trajectories must have 2 or 3 dimensions.")
+    number_of_realizations, number_of_compartments, number_of_times = trajectories.shape
+    if number_of_realizations == 0:
+        raise ValueError("There must be at least one realization.")
+
+    t = np.arange(number_of_times, dtype=np.float64) if t is None else np.asarray(t)
+    if t.size != number_of_times:
+        raise ValueError("Number of time points and trajectory length mismatch.")
+    if compartments is None:
+        compartments = tuple(f"X{i}" for i in range(number_of_compartments))
+    compartments = tuple(compartments)
+    if len(compartments) != number_of_compartments:
+        raise ValueError("Number of compartment names and trajectories mismatch.")
+
+    quantiles = tuple(float(quantile) for quantile in quantiles)
+    if any(not 0.0 <= quantile <= 1.0 for quantile in quantiles):
+        raise ValueError("Quantiles must be between 0 and 1.")
+    hdi_probabilities = tuple(float(probability) for probability in hdi_probabilities)
+    if any(not 0.0 < probability < 1.0 for probability in hdi_probabilities):
+        raise ValueError("HDI probabilities must be between 0 and 1.")
+    if number_of_threads <= 0:
+        raise ValueError("Number of threads must be greater than 0.")
+
+    if chunk_size is None:
+        chunk_size = max(1, _DEFAULT_CHUNK_VALUES // number_of_realizations)
+    elif chunk_size <= 0:
+        raise ValueError("Chunk size must be greater than 0.")
+
+    shape = (number_of_compartments, number_of_times)
+    quantile_values = np.empty((len(quantiles),) + shape)
+    mean = np.empty(shape)
+    hdi = np.empty((len(hdi_probabilities), 2) + shape)
+
+    # Chunks never span compartments, so that strided views (e.g. a time window of a
+    # memory-mapped ensemble) are read chunk by chunk instead of copied at once.
+    def summarize_chunk(chunk):
+        compartment_index, time_slice = chunk
+        _summarize_columns(
+            trajectories[:, compartment_index, time_slice],
+            quantiles,
+            hdi_probabilities,
+            quantile_values[:, compartment_index, time_slice],
+            mean[compartment_index, time_slice],
+            hdi[:, :, compartment_index, time_slice],
+        )
+
+    chunks = [
+        (compartment_index, slice(start, start + chunk_size))
+        for compartment_index in range(number_of_compartments)
+        for start in range(0, number_of_times, chunk_size)
+    ]
+    if number_of_threads == 1 or len(chunks) == 1:
+        for chunk in chunks:
+            summarize_chunk(chunk)
+    else:
+        with ThreadPoolExecutor(number_of_threads) as executor:
+            list(executor.map(summarize_chunk, chunks))
+
+    return EnsembleSummary(
+        t=t,
+        compartments=compartments,
+        quantiles=quantiles,
+        quantile_values=quantile_values,
+        mean=mean,
+        hdi_probabilities=hdi_probabilities,
+        hdi=hdi if hdi_probabilities else None,
+        number_of_realizations=number_of_realizations,
+    )
+
+
+def _summarize_columns(columns, quantiles, hdi_probabilities, quantile_values, mean, hdi):
+    """
+    Summarize each column of a `(number_of_realizations, number_of_columns)` block, writing the
+    results into the given output views.
+    """
+    block = np.array(columns, dtype=np.float64)
+    number_of_realizations = block.shape[0]
+    nan_columns = np.isnan(block).any(axis=0)
+    mean[:] = block.mean(axis=0)
+
+    positions = np.array(quantiles) * (number_of_realizations - 1)
+    lower_ranks = np.floor(positions).astype(int)
+    upper_ranks = np.minimum(lower_ranks + 1, number_of_realizations - 1)
+    if hdi_probabilities:
+        block.sort(axis=0)
+    elif quantiles:
+        block.partition(np.unique(np.concatenate([lower_ranks, upper_ranks])), axis=0)
+
+    for index, (position, lower_rank, upper_rank) in enumerate(
+        zip(positions, lower_ranks, upper_ranks)
+    ):
+        lower_values, upper_values = block[lower_rank], block[upper_rank]
+        quantile_values[index] = lower_values + (position - lower_rank) * (
+            upper_values - lower_values
+        )
+
+    column_indices = np.arange(block.shape[1])
+    for index, probability in enumerate(hdi_probabilities):
+        interval_length = int(np.floor(probability * number_of_realizations))
+        widths = block[interval_length:] - block[: number_of_realizations - interval_length]
+        interval_starts = np.argmin(widths, axis=0)
+        hdi[index, 0] = block[interval_starts, column_indices]
+        hdi[index, 1] = block[interval_starts + interval_length, column_indices]
+
+    quantile_values[:, nan_columns] = np.nan
+    hdi[:, :, nan_columns] = np.nan
+
+
+@attr.s(auto_attribs=True)
+class StreamingEnsembleSummary:
+    """
+    A summary of an ensemble of trajectories that is updated one realization (or one batch of
+    realizations) at a time, in memory independent of the number of realizations.
+
+    Each compartment at each time point is summarized by a merging t-digest: the realizations are
+    buffered and then merged into at most `compression // 2` weighted centroids, whose sizes
+    follow the arcsine scale function so that the tails keep more resolution than the median. The
+    minimum, maximum and mean are kept exactly. Quantiles are exact as long as the number of
+    realizations does not exceed `buffer_size`, and approximate (with a rank error of at most about
+    `1.6 / compression` around the median, and less in the tails) after that. Summaries of
+    disjoint parts of an ensemble, e.g. computed by different processes, can be merged.
+
+    Members
+    ----------------
+
+    :ivar numpy.ndarray t:
+        The time points.
+
+    :ivar tuple compartments:
+        The compartment names.
+
+    :ivar tuple quantiles:
+        The quantiles, between 0 and 1.
+
+    :ivar int compression:
+        The t-digest compression. Larger values are more accurate and use more memory.
+
+    :ivar int buffer_size:
+        The number of realizations buffered before they are merged into the centroids.
+
+    :ivar int number_of_realizations:
+        The number of realizations added so far.
+    """
+
+    t: np.ndarray
+    compartments: tuple
+    quantiles: tuple = DEFAULT_QUANTILES
+    compression: int = 100
+    buffer_size: int = 100
+    number_of_realizations: int = attr.ib(default=0, init=False)
+    _buffer: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _buffer_count: int = attr.ib(default=0, init=False, repr=False)
+    _centroid_means: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _centroid_weights: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _minimum: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _maximum: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _sum: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _has_nan: np.ndarray = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self.t = np.asarray(self.t, dtype=np.float64)
+        self.compartments = tuple(self.compartments)
+        self.quantiles = tuple(float(quantile) for quantile in self.quantiles)
+        if any(not 0.0 <= quantile <= 1.0 for quantile in self.quantiles):
+            raise ValueError("Quantiles must be between 0 and 1.")
+        if self.compression < _MINIMUM_COMPRESSION:
+            raise ValueError(f"Compression must be at least {_MINIMUM_COMPRESSION}.")
+        if self.buffer_size <= 0:
+            raise ValueError("Buffer size must be greater than 0.")
+
+        number_of_series = self._number_of_series
+        self._buffer = np.empty((self.buffer_size, number_of_series))
+        self._centroid_means = np.zeros((number_of_series, self._number_of_centroids))
+        self._centroid_weights = np.zeros((number_of_series, self._number_of_centroids))
+        self._minimum = np.full(number_of_series, np.inf)
+        self._maximum = np.full(number_of_series, -np.inf)
+        self._sum = np.zeros(number_of_series)
+        self._has_nan = np.zeros(number_of_series, dtype=bool)
+
+    @property
+    def _number_of_series(self):
+        return len(self.compartments) * len(self.t)
+
+    @property
+    def _number_of_centroids(self):
+        return self.compression // 2
+
+    def add(self, trajectories: np.ndarray) -> None:
+        """
+        Add realizations to the summary.
+
+        :param numpy.ndarray trajectories:
+            One realization, with shape `(number_of_compartments, number_of_times)` (or
+            `(number_of_times,)` for a single compartment), or a batch of realizations with shape
+            `(number_of_realizations, number_of_compartments, number_of_times)`.
+        """
+        trajectories = np.asarray(trajectories, dtype=np.float64)
+        number_of_dimensions = 3 if len(self.compartments) > 1 else 2
+        if trajectories.ndim == number_of_dimensions - 1:
+            trajectories = trajectories[np.newaxis]
+        if trajectories.ndim not in (number_of_dimensions, 3):
+            raise ValueError("Trajectories must be a realization or a batch of realizations.")
+        rows = trajectories.reshape(trajectories.shape[0], -1)
+        if rows.shape[1] != self._number_of_series:
+            raise ValueError("Number of compartments and time points mismatch.")
+
+        nan_values = np.isnan(rows)
+        if nan_values.any():
+            self._has_nan |= nan_values.any(axis=0)
+            rows = np.where(nan_values, 0.0, rows)
+        np.minimum(self._minimum, rows.min(axis=0), out=self._minimum)
+        np.maximum(self._maximum, rows.max(axis=0), out=self._maximum)
+        self._sum += rows.sum(axis=0)
+        self.number_of_realizations += rows.shape[0]
+
+        for start in range(0, rows.shape[0], self.buffer_size):
+            block = rows[start : start + self.buffer_size]
+            if self._buffer_count + block.shape[0] > self.buffer_size:
+                self._flush()
+            self._buffer[self._buffer_count : self._buffer_count + block.shape[0]] = block
+            self._buffer_count += block.shape[0]
+
+    def merge(self, other: "StreamingEnsembleSummary") -> None:
+        """
+        Add the realizations summarized by another summary of the same compartments and time
+        points.
+
+        :param StreamingEnsembleSummary other:
+            The other summary. It is not modified.
+        """
+        if other.compartments != self.compartments or not np.array_equal(other.t, self.t):
+            raise ValueError("Summaries of different compartments or time points can't be merged.")
+        means, weights = other._centroids_and_buffer()
+        self._flush()
+        self._compress(means, weights)
+        np.minimum(self._minimum, other._minimum, out=self._minimum)
+        np.maximum(self._maximum, other._maximum, out=self._maximum)
+        self._sum += other._sum
+        self._has_nan |= other._has_nan
+        self.number_of_realizations += other.number_of_realizations
+
+    def summary(self) -> EnsembleSummary:
+        """
+        Compute the quantiles and means of the realizations added so far.
+
+        :return:
+            The statistics, without highest density intervals.
+        :rtype: EnsembleSummary
+        """
+        number_of_realizations = self.number_of_realizations
+        if number_of_realizations == 0:
+            raise ValueError("There must be at least one realization.")
+
+        means, weights = self._centroids_and_buffer()
+        order = np.argsort(np.where(weights > 0.0, means, np.inf), axis=1, kind="stable")
+        means = np.take_along_axis(means, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+
+        # Each centroid is placed at the mean rank of the realizations it holds, so that
+        # centroids of a single realization reproduce the interpolation of `numpy.percentile`.
+        last_rank = number_of_realizations - 1
+        ranks = np.cumsum(weights, axis=1) - (weights + 1.0) / 2.0
+        empty = weights == 0.0
+        ranks[empty] = last_rank
+        means = np.where(empty, self._maximum[:, np.newaxis], means)
+        number_of_series = self._number_of_series
+        ranks = np.hstack(
+            [np.zeros((number_of_series, 1)), ranks, np.full((number_of_series, 1), last_rank)]
+        )
+        values = np.hstack([self._minimum[:, np.newaxis], means, self._maximum[:, np.newaxis]])
+
+        series_indices = np.arange(number_of_series)
+        quantile_values = np.empty((len(self.quantiles), number_of_series))
+        for index, quantile in enumerate(self.quantiles):
+            # The extremes are kept exactly, but may be merged into centroids with larger means
+            if quantile == 0.0:
+                quantile_values[index] = self._minimum
+                continue
+            if quantile == 1.0:
+                quantile_values[index] = self._maximum
+                continue
+            rank = quantile * last_rank
+            lower = np.clip((ranks <= rank).sum(axis=1) - 1, 0, ranks.shape[1] - 2)
+            lower_ranks = ranks[series_indices, lower]
+            rank_widths = ranks[series_indices, lower + 1] - lower_ranks
+            fractions = np.divide(
+                rank - lower_ranks,
+                rank_widths,
+                out=np.zeros(number_of_series),
+                where=rank_widths > 0.0,
+            )
+            lower_values = values[series_indices, lower]
+            upper_values = values[series_indices, lower + 1]
+            quantile_values[index] = lower_values + np.clip(fractions, 0.0, 1.0) * (
+                upper_values - lower_values
+            )
+
+        mean = self._sum / number_of_realizations
+        quantile_values[:, self._has_nan] = np.nan
+        mean[self._has_nan] = np.nan
+
+        shape = (len(self.compartments), len(self.t))
+        return EnsembleSummary(
+            t=self.t,
+            compartments=self.compartments,
+            quantiles=self.quantiles,
+            quantile_values=quantile_values.reshape((len(self.quantiles),) + shape),
+            mean=mean.reshape(shape),
+            number_of_realizations=number_of_realizations,
+        )
+
+    def _centroids_and_buffer(self):
+        buffered_values = self._buffer[: self._buffer_count].T
+        means = np.hstack([self._centroid_means, buffered_values])
+        weights = np.hstack([self._centroid_weights, np.ones_like(buffered_values)])
+        return means, weights
+
+    def _flush(self):
+        if self._buffer_count > 0:
+            buffered_values = self._buffer[: self._buffer_count].T
+            self._compress(buffered_values, np.ones_like(buffered_values))
+            self._buffer_count = 0
+
+    def _compress(self, means, weights):
+        """
+        Merge weighted values, with shape `(number_of_series, number_of_values)`, into the
+        centroids. Consecutive values (in sorted order) are merged when their mid-ranks fall in the
+        same interval of the arcsine scale function.
+        """
+        means = np.hstack([self._centroid_means, means])
+        weights = np.hstack([self._centroid_weights, weights])
+        order = np.argsort(means, axis=1)
+        means = np.take_along_axis(means, order, axis=1)
+        weights = np.take_along_axis(weights, order, axis=1)
+
+        cumulative_weights = np.cumsum(weights, axis=1)
+        total_weights = cumulative_weights[:, -1:]
+        mid_quantiles = (cumulative_weights - weights / 2.0) / np.where(
+            total_weights > 0.0, total_weights, 1.0
+        )
+        scale = np.arcsin(np.clip(2.0 * mid_quantiles - 1.0, -1.0, 1.0)) / np.pi + 0.5
+        number_of_centroids = self._number_of_centroids
+        centroids = np.minimum((scale * number_of_centroids).astype(int), number_of_centroids - 1)
+
+        number_of_series = means.shape[0]
+        bins = (
+            centroids + number_of_centroids * np.arange(number_of_series)[:, np.newaxis]
+        ).ravel()
+        size = number_of_series * number_of_centroids
+        centroid_weights = np.bincount(bins, weights=weights.ravel(), minlength=size)
+        centroid_sums = np.bincount(bins, weights=(weights * means).ravel(), minlength=size)
+        centroid_means = np.divide(
+            centroid_sums,
+            centroid_weights,
+            out=np.zeros(size),
+            where=centroid_weights > 0.0,
+        )
+        shape = (number_of_series, number_of_centroids)
+        self._centroid_weights = centroid_weights.reshape(shape)
+        self._centroid_means = centroid_means.reshape(shape)
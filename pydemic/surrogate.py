@@ -0,0 +1,372 @@
+"""
+A module with surrogate models (emulators) of expensive objective functions, used by the
+surrogate-assisted minimization of `pydemic.minimization`.
+
+Each objective evaluation of a calibration is a full ODE solve. A surrogate is fitted to the
+points evaluated so far and cheaply proposes the next points to evaluate:
+
+* `GaussianProcessSurrogate` predicts a mean and an uncertainty, and the candidates maximizing
+  the expected improvement over the best value are proposed;
+* `RadialBasisFunctionSurrogate` only interpolates, and the candidates minimize a weighted score
+  of the predicted value and of the distance to the evaluated points (Regis and Shoemaker's
+  stochastic RBF method), cycling the weights between exploration and exploitation.
+
+The inputs are scaled to the unit cube by the bounds, and the outputs are standardized. Values
+above the median are replaced by the median when fitting, so that failed or very poor
+evaluations (e.g. a `failure_value` of `pydemic.sensitivity.LeastSquaresObjective`) do not
+dominate the surrogate.
+"""
+
+from enum import Enum
+from typing import Callable
+
+import attr
+import numpy as np
+from scipy.linalg import cho_solve, cholesky, solve_triangular
+from scipy.optimize import minimize
+from scipy.spatial.distance import cdist
+from scipy.stats import norm
+
+
+class SurrogateModelType(Enum):
+    """
+    Available surrogate models.
+    """
+
+    GAUSSIAN_PROCESS = 1
+    RADIAL_BASIS_FUNCTION = 2
+
+
+# The weights of the predicted values in the RBF candidate scores, cycled over the iterations
+_RBF_SCORE_WEIGHTS = (0.3, 0.5, 0.8, 0.95)
+
+
+def _matern52(scaled_distances):
+    sqrt5_distances = np.sqrt(5.0) * scaled_distances
+    return (1.0 + sqrt5_distances + sqrt5_distances**2 / 3.0) * np.exp(-sqrt5_distances)
+
+
+def _capped_values(y):
+    y = np.asarray(y, dtype=np.float64)
+    finite_values = y[np.isfinite(y)]
+    median = np.median(finite_values) if finite_values.size > 0 else 0.0
+    return np.where(np.isfinite(y), np.minimum(y, median), median)
+
+
+@attr.s(auto_attribs=True)
+class _UnitCubeScaling:
+    lower_bounds: np.ndarray
+    widths: np.ndarray
+
+    @classmethod
+    def from_bounds(cls, bounds):
+        bounds = np.asarray(bounds, dtype=np.float64)
+        return cls(bounds[:, 0], bounds[:, 1] - bounds[:, 0])
+
+    def to_unit_cube(self, X):
+        return (np.atleast_2d(X) - self.lower_bounds) / self.widths
+
+    def from_unit_cube(self, U):
+        return self.lower_bounds + np.atleast_2d(U) * self.widths
+
+
+@attr.s(auto_attribs=True)
+class GaussianProcessSurrogate:
+    """
+    A Gaussian process with an anisotropic Matérn 5/2 kernel. The length scales, the signal
+    variance and the noise are fitted by maximum marginal likelihood.
+
+    Members
+    ----------------
+
+    :ivar list bounds:
+        The `(lower, upper)` bounds of each input.
+
+    :ivar bool optimize_hyperparameters:
+        If False, the hyperparameters are kept at their current values when fitting.
+    """
+
+    bounds: list
+    optimize_hyperparameters: bool = True
+    _log_hyperparameters: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _scaling: _UnitCubeScaling = attr.ib(default=None, init=False, repr=False)
+    _U: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _y_mean: float = attr.ib(default=0.0, init=False, repr=False)
+    _y_std: float = attr.ib(default=1.0, init=False, repr=False)
+    _cholesky_factor: np.ndarray = attr.ib(default=None, init=False, repr=False)
+    _alpha: np.ndarray = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self._scaling = _UnitCubeScaling.from_bounds(self.bounds)
+        number_of_inputs = len(self.bounds)
+        self._log_hyperparameters = np.concatenate(
+            [np.full(number_of_inputs, np.log(0.5)), [0.0, np.log(1e-6)]]
+        )
+
+    @property
+    def _hyperparameter_bounds(self):
+        number_of_inputs = len(self.bounds)
+        return number_of_inputs * [(np.log(1e-2), np.log(2e1))] + [
+            (np.log(1e-2), np.log(1e2)),
+            (np.log(1e-10), np.log(1e-1)),
+        ]
+
+    def _covariance(self, U, V, log_hyperparameters):
+        length_scales = np.exp(log_hyperparameters[:-2])
+        signal_variance = np.exp(log_hyperparameters[-2])
+        return signal_variance * _matern52(cdist(U / length_scales, V / length_scales))
+
+    def _factorize(self, log_hyperparameters, z):
+        K = self._covariance(self._U, self._U, log_hyperparameters)
+        K[np.diag_indices_from(K)] += np.exp(log_hyperparameters[-1]) + 1e-10
+        cholesky_factor = cholesky(K, lower=True)
+        return cholesky_factor, cho_solve((cholesky_factor, True), z)
+
+    def _negative_log_marginal_likelihood(self, log_hyperparameters, z):
+        try:
+            cholesky_factor, alpha = self._factorize(log_hyperparameters, z)
+        except np.linalg.LinAlgError:
+            return 1e25
+        return 0.5 * z @ alpha + np.sum(np.log(np.diag(cholesky_factor)))
+
+    def fit(self, X: np.ndarray, y: np.ndarray):
+        """
+        Fit the surrogate to the objective values `y` at the points (rows) `X`.
+        """
+        self._U = self._scaling.to_unit_cube(X)
+        y = _capped_values(y)
+        self._y_mean = np.mean(y)
+        self._y_std = np.std(y) if np.std(y) > 0 else 1.0
+        z = (y - self._y_mean) / self._y_std
+
+        if self.optimize_hyperparameters and len(z) > 1:
+            result = minimize(
+                self._negative_log_marginal_likelihood,
+                self._log_hyperparameters,
+                args=(z,),
+                method="L-BFGS-B",
+                bounds=self._hyperparameter_bounds,
+            )
+            if np.isfinite(result.fun):
+                self._log_hyperparameters = result.x
+        self._cholesky_factor, self._alpha = self._factorize(self._log_hyperparameters, z)
+        return self
+
+    def predict(self, X: np.ndarray):
+        """
+        Predict the objective at the points (rows) `X`.
+
+        :return:
+            The predicted means and standard deviations.
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        K_cross = self._covariance(
+            self._scaling.to_unit_cube(X), self._U, self._log_hyperparameters
+        )
+        mean = K_cross @ self._alpha
+        v = solve_triangular(self._cholesky_factor, K_cross.T, lower=True)
+        variance = np.exp(self._log_hyperparameters[-2]) - np.sum(v**2, axis=0)
+        std = np.sqrt(np.maximum(variance, 1e-12))
+        return self._y_mean + self._y_std * mean, self._y_std * std
+
+
+@attr.s(auto_attribs=True)
+class RadialBasisFunctionSurrogate:
+    """
+    A radial basis function interpolant (`scipy.interpolate.RBFInterpolator`) with a linear
+    polynomial tail.
+
+    Members
+    ----------------
+
+    :ivar list bounds:
+        The `(lower, upper)` bounds of each input.
+
+    :ivar str kernel:
+        The radial basis function, e.g. 'cubic' or 'thin_plate_spline'.
+    """
+
+    bounds: list
+    kernel: str = "cubic"
+    _scaling: _UnitCubeScaling = attr.ib(default=None, init=False, repr=False)
+    _interpolator: Callable = attr.ib(default=None, init=False, repr=False)
+
+    def __attrs_post_init__(self):
+        self._scaling = _UnitCubeScaling.from_bounds(self.bounds)
+
+    def fit(self, X: np.ndarray, y: np.ndarray):
+        """
+        Fit the surrogate to the objective values `y` at the points (rows) `X`.
+        """
+        # RBFInterpolator only exists from SciPy 1.7, so it is only imported by this surrogate
+        from scipy.interpolate import RBFInterpolator
+
+        self._interpolator = RBFInterpolator(
+            self._scaling.to_unit_cube(X), _capped_values(y), kernel=self.kernel, degree=1
+        )
+        return self
+
+    def predict(self, X: np.ndarray):
+        """
+        Predict the objective at the points (rows) `X`.
+
+        :return:
+            The predicted values, and None (interpolants have no uncertainty).
+        :rtype: tuple(numpy.ndarray, None)
+        """
+        return self._interpolator(self._scaling.to_unit_cube(X)), None
+
+
+def create_surrogate(surrogate_model: SurrogateModelType, bounds: list):
+    if surrogate_model == SurrogateModelType.GAUSSIAN_PROCESS:
+        return GaussianProcessSurrogate(bounds)
+    elif surrogate_model == SurrogateModelType.RADIAL_BASIS_FUNCTION:
+        return RadialBasisFunctionSurrogate(bounds)
+    raise NotImplementedError("Unavailable surrogate model.")
+
+
+def expected_improvement(mean, std, best_value, exploration=0.0):
+    """
+    The expected improvement (for minimization) of points with normal predictions.
+
+    :param numpy.ndarray mean:
+        The predicted means.
+
+    :param numpy.ndarray std:
+        The predicted standard deviations.
+
+    :param float best_value:
+        The best objective value evaluated so far.
+
+    :param float exploration:
+        The improvement margin, favoring exploration when larger.
+
+    :rtype: numpy.ndarray
+    """
+    improvement = best_value - np.asarray(mean, dtype=np.float64) - exploration
+    std = np.asarray(std, dtype=np.float64)
+    certain = std <= 1e-12
+    z = improvement / np.where(certain, 1.0, std)
+    uncertain_improvement = improvement * norm.cdf(z) + std * norm.pdf(z)
+    return np.where(certain, np.maximum(improvement, 0.0), uncertain_improvement)
+
+
+def _sample_candidates(bounds, best_x, number_of_candidates, random_state):
+    # Half uniform over the bounds, half perturbations of the best point (DYCORS-like)
+    scaling = _UnitCubeScaling.from_bounds(bounds)
+    number_of_inputs = len(bounds)
+    number_of_uniform = number_of_candidates // 2
+    uniform = random_state.uniform(size=(number_of_uniform, number_of_inputs))
+    best_u = scaling.to_unit_cube(best_x)[0]
+    perturbation_scales = random_state.choice(
+        [0.01, 0.05, 0.2], size=(number_of_candidates - number_of_uniform, 1)
+    )
+    local = best_u + perturbation_scales * random_state.normal(
+        size=(number_of_candidates - number_of_uniform, number_of_inputs)
+    )
+    return scaling.from_unit_cube(np.clip(np.vstack([uniform, local]), 0.0, 1.0))
+
+
+def _far_enough(candidates, X, scaling, tolerance=1e-6):
+    distances = cdist(scaling.to_unit_cube(candidates), scaling.to_unit_cube(X))
+    return distances.min(axis=1) > tolerance
+
+
+def propose_points(
+    surrogate,
+    X: np.ndarray,
+    y: np.ndarray,
+    bounds: list,
+    batch_size: int = 1,
+    number_of_candidates: int = 1000,
+    exploration: float = 0.01,
+    iteration: int = 0,
+    random_state: np.random.RandomState = None,
+) -> np.ndarray:
+    """
+    Propose the next points to evaluate, from a surrogate fitted to the evaluated points `X`
+    and values `y`. Batches are selected greedily: Gaussian processes are conditioned on their
+    own predictions at the selected points (the "kriging believer" heuristic), and RBF scores
+    account for the distances to the selected points.
+
+    :return:
+        The `(batch_size, number_of_inputs)` proposed points.
+    :rtype: numpy.ndarray
+    """
+    random_state = (
+        np.random.RandomState(random_state)
+        if not isinstance(random_state, np.random.RandomState)
+        else random_state
+    )
+    scaling = _UnitCubeScaling.from_bounds(bounds)
+    X = np.atleast_2d(X)
+    y = np.asarray(y, dtype=np.float64)
+    best_x = X[np.nanargmin(np.where(np.isfinite(y), y, np.inf))]
+    candidates = _sample_candidates(bounds, best_x, number_of_candidates, random_state)
+
+    if isinstance(surrogate, GaussianProcessSurrogate):
+        believer = GaussianProcessSurrogate(bounds, optimize_hyperparameters=False)
+        believer._log_hyperparameters = surrogate._log_hyperparameters
+        believed_X, believed_y = X, _capped_values(y)
+        believer.fit(believed_X, believed_y)
+        proposed_points = []
+        for _ in range(batch_size):
+            point = _maximize_expected_improvement(
+                believer, candidates, believed_X, believed_y, scaling, exploration
+            )
+            proposed_points.append(point)
+            believed_X = np.vstack([believed_X, point])
+            believed_y = np.append(believed_y, believer.predict(point)[0])
+            believer.fit(believed_X, believed_y)
+        return np.array(proposed_points)
+
+    predictions = surrogate.predict(candidates)[0]
+    scaled_predictions = _rescale(predictions)
+    selected_X = X
+    proposed_points = []
+    for point_index in range(batch_size):
+        weight = _RBF_SCORE_WEIGHTS[
+            (iteration * batch_size + point_index) % len(_RBF_SCORE_WEIGHTS)
+        ]
+        distances = cdist(scaling.to_unit_cube(candidates), scaling.to_unit_cube(selected_X)).min(
+            axis=1
+        )
+        scores = weight * scaled_predictions + (1.0 - weight) * (1.0 - _rescale(distances))
+        scores[distances <= 1e-6] = np.inf
+        point = candidates[np.argmin(scores)]
+        proposed_points.append(point)
+        selected_X = np.vstack([selected_X, point])
+    return np.array(proposed_points)
+
+
+def _rescale(values):
+    value_range = np.ptp(values)
+    if value_range == 0:
+        return np.zeros_like(values)
+    return (values - np.min(values)) / value_range
+
+
+def _maximize_expected_improvement(surrogate, candidates, X, y, scaling, exploration):
+    best_value = np.min(y)
+    mean, std = surrogate.predict(candidates)
+    exploration_margin = exploration * surrogate._y_std
+    improvements = expected_improvement(mean, std, best_value, exploration_margin)
+    improvements[~_far_enough(candidates, X, scaling)] = -np.inf
+    best_candidate = candidates[np.argmax(improvements)]
+
+    def negative_expected_improvement(u):
+        point = scaling.from_unit_cube(u)
+        mean, std = surrogate.predict(point)
+        return -expected_improvement(mean, std, best_value, exploration_margin)[0]
+
+    # Refine the best candidate on the (cheap) acquisition function
+    result = minimize(
+        negative_expected_improvement,
+        scaling.to_unit_cube(best_candidate)[0],
+        method="L-BFGS-B",
+        bounds=len(scaling.widths) * [(0.0, 1.0)],
+    )
+    refined_point = scaling.from_unit_cube(result.x)[0]
+    if -result.fun >= np.max(improvements) and _far_enough(refined_point[None], X, scaling)[0]:
+        return refined_point
+    return best_candidate
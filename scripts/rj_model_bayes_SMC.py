@@ -35,6 +35,16 @@
 import os
 import time
 
+# One BLAS/OpenMP thread per SMC chain process, set before NumPy loads its thread pools
+for thread_limit_variable in (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+):
+    os.environ.setdefault(thread_limit_variable, "1")
+
 import matplotlib.pyplot as plt
 import arviz as az
 from arviz.utils import Numba
@@ -49,6 +59,8 @@ from scipy.stats import gaussian_kde  # to calculate MPV from KDE
 from scipy.integrate import solve_ivp  # to solve ODE system
 from tqdm import tqdm, trange
 
+from pydemic.parallel import ExecutionConfig
+
 seed = 12345  # for the sake of reproducibility :)
 np.random.seed(seed)
 
@@ -942,9 +954,16 @@ with pm.Model() as model_mcmc:
         "likelihood_model", mu=fitting_model, sigma=standard_deviation, observed=observations_to_fit
     )
 
-    seirdpq_trace_calibration = pm.sample_smc(
-        draws=draws, n_steps=25, parallel=True, cores=int(os.cpu_count()), progressbar=True, random_seed=seed
-    )
+    # One single-threaded chain per core, so BLAS threads do not oversubscribe the cores
+    smc_execution_config = ExecutionConfig(threads_per_worker=1)
+    with smc_execution_config.thread_limits():
+        seirdpq_trace_calibration = pm.sample_smc(
+            draws=draws,
+            n_steps=25,
+            progressbar=True,
+            random_seed=seed,
+            **smc_execution_config.smc_sampler_kwargs(),
+        )
 
 duration = time.time() - start_time
 
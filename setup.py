@@ -17,7 +17,7 @@ DESCRIPTION = "A python package for epidemic spreading"
 URL = "https://github.com/covid-lncc/pydemic"
 EMAIL = "volpatto@lncc.br"
 AUTHOR = "Diego Volpatto"
-REQUIRES_PYTHON = ">=3.6.1"  # Put your required Python version
+REQUIRES_PYTHON = ">=3.8"  # Put your required Python version
 VERSION = "0.1.0.dev1 "  # Put the package version as a string (ex.: '1.0.0')
 
 # What packages are required for this module to be executed?
@@ -101,9 +101,7 @@ setup(
     author_email=EMAIL,
     python_requires=REQUIRES_PYTHON,
     url=URL,
-    # packages=find_packages(exclude=("tests",)),
-    # If your package is a single module, use this instead of 'packages':
-    py_modules=["pydemic"],
+    packages=find_packages(exclude=("tests",)),
     # entry_points={
     #     'console_scripts': ['mycli=mymodule:cli'],
     # },
@@ -0,0 +1,92 @@
+import time
+
+import pytest
+import numpy as np
+
+from pydemic.calibration import CalibrationRunner, CalibrationStatus
+from pydemic.minimization import MultistartLocalSettings, OptimizationMethod
+from pydemic.minimization import OptimizationProblem, ScipyDifferentialEvolutionSettings
+
+
+def f_shifted_sphere(x, shift):
+    return np.sum((np.asarray(x) - shift) ** 2)
+
+
+def f_slow_sphere(x, shift):
+    time.sleep(10.0)
+    return f_shifted_sphere(x, shift)
+
+
+def build_region_problem(region):
+    if region == "unknown":
+        raise ValueError("No data for the region.")
+    shift = {"RJ": 0.5, "SP": -0.25, "slow": 0.0}[region]
+    return OptimizationProblem(
+        objective_function=f_slow_sphere if region == "slow" else f_shifted_sphere,
+        bounds=2 * [[-1, 1]],
+        optimization_method=OptimizationMethod.MULTISTART_LOCAL,
+        solver_args=MultistartLocalSettings(number_of_starts=2, seed=1),
+        args=[shift],
+    )
+
+
+def test_calibration_runner():
+    runner = CalibrationRunner(
+        build_region_problem, number_of_workers=2, timeout=5.0, parameter_names=["a", "b"]
+    )
+
+    start_time = time.perf_counter()
+    table = runner.run(["RJ", "unknown", "slow", "SP"])
+
+    assert time.perf_counter() - start_time < 10.0
+    assert list(table.region) == ["RJ", "unknown", "slow", "SP"]
+    assert list(table.status) == ["success", "failed", "timeout", "success"]
+    assert pytest.approx([0.5, 0.5], abs=1e-5) == table.loc[0, ["a", "b"]].to_numpy(float)
+    assert pytest.approx([-0.25, -0.25], abs=1e-5) == table.loc[3, ["a", "b"]].to_numpy(float)
+    assert pytest.approx([0.0, 0.0], abs=1e-8) == table.fun[[0, 3]].to_numpy()
+    assert "No data for the region." in table.message[1]
+    assert np.all(np.isnan(table.loc[[1, 2], ["a", "b"]].to_numpy(float)))
+    assert table.wall_time[2] >= 5.0
+
+
+def build_parallel_region_problem(region):
+    if region == "scipy":
+        optimization_method = OptimizationMethod.SCIPY_DE
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=2, popsize=5, seed=1, workers=2
+        )
+    else:
+        optimization_method = OptimizationMethod.MULTISTART_LOCAL
+        solver_settings = MultistartLocalSettings(number_of_starts=4, seed=1, workers=2)
+    return OptimizationProblem(
+        objective_function=f_shifted_sphere,
+        bounds=2 * [[-1, 1]],
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+        args=[0.5],
+    )
+
+
+def test_calibration_runner_with_inner_workers():
+    runner = CalibrationRunner(build_parallel_region_problem, number_of_workers=2, timeout=60.0)
+
+    table = runner.run(["scipy", "multistart"])
+
+    assert list(table.status) == ["success", "success"], list(table.message)
+    assert pytest.approx([0.5, 0.5], abs=1e-4) == table.loc[1, ["x_0", "x_1"]].to_numpy(float)
+    assert table.fun[0] < 1e-2
+
+
+def test_calibration_runner_results():
+    results = CalibrationRunner(build_region_problem, number_of_workers=1).calibrate(["SP"])
+
+    assert results[0].status == CalibrationStatus.SUCCESS
+    assert pytest.approx([-0.25, -0.25], abs=1e-5) == results[0].x
+    assert results[0].nfev > 0
+
+
+def test_invalid_calibration_runner():
+    with pytest.raises(ValueError):
+        CalibrationRunner(build_region_problem, number_of_workers=0)
+    with pytest.raises(ValueError):
+        CalibrationRunner(build_region_problem, timeout=0.0)
@@ -0,0 +1,141 @@
+import pytest
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from pydemic.ensemble import build_parameter_matrix, solve_ensemble
+from pydemic.models import SEIRPDQ
+
+seed = 123
+
+
+@pytest.fixture
+def seirpdq_realizations():
+    random_state = np.random.RandomState(seed)
+    number_of_realizations = 5
+    N = 6.7e6
+    beta = random_state.uniform(4e-8, 6e-8, number_of_realizations)
+    parameters = SEIRPDQ.parameter_matrix(
+        number_of_realizations,
+        beta0=beta * N,
+        mu0=beta * N,
+        omega=random_state.uniform(1e-2, 2e-2, number_of_realizations),
+        d_I=random_state.uniform(1e-4, 1e-3, number_of_realizations),
+        d_P=random_state.uniform(1e-2, 2e-2, number_of_realizations),
+        N=N,
+        t_transition=30,
+        half_life=15,
+    )
+    E0, A0, I0, P0, R0, D0, C0, H0 = 500, 200, 100, 50, 0, 1, 50, 0
+    S0 = N - (E0 + A0 + I0 + P0 + R0 + D0)
+    initial_conditions = np.array([S0, E0, A0, I0, P0, R0, D0, C0, H0])
+    return parameters, initial_conditions
+
+
+def test_seirpdq_ensemble_matches_individual_solves(seirpdq_realizations):
+    parameters, initial_conditions = seirpdq_realizations
+    t_span = (0.0, 100.0)
+    t_eval = np.linspace(*t_span, 101)
+
+    ensemble_solution = SEIRPDQ.solve_ensemble(
+        parameters, initial_conditions, t_span, t_eval=t_eval, rtol=1e-8, atol=1e-6
+    )
+
+    assert ensemble_solution.success
+    assert ensemble_solution.y.shape == (
+        parameters.shape[0],
+        SEIRPDQ.number_of_compartments,
+        t_eval.size,
+    )
+    for realization, realization_parameters in enumerate(parameters):
+        single_solution = solve_ivp(
+            lambda t, y: SEIRPDQ.rhs(t, y, realization_parameters),
+            t_span,
+            initial_conditions,
+            t_eval=t_eval,
+            method="LSODA",
+            rtol=1e-8,
+            atol=1e-6,
+        )
+        assert pytest.approx(single_solution.y, rel=1e-4) == ensemble_solution.y[realization]
+
+
+@pytest.mark.parametrize("method", ["LSODA", "BDF", "RK45"])
+def test_seirpdq_ensemble_batches(seirpdq_realizations, method):
+    parameters, initial_conditions = seirpdq_realizations
+    t_span = (0.0, 60.0)
+    t_eval = np.linspace(*t_span, 61)
+
+    full_solution = SEIRPDQ.solve_ensemble(
+        parameters, initial_conditions, t_span, t_eval=t_eval, method=method, rtol=1e-8
+    )
+    batched_solution = SEIRPDQ.solve_ensemble(
+        parameters,
+        initial_conditions,
+        t_span,
+        t_eval=t_eval,
+        method=method,
+        rtol=1e-8,
+        realizations_per_batch=2,
+    )
+
+    assert batched_solution.success
+    assert pytest.approx(full_solution.y, rel=1e-4) == batched_solution.y
+    deaths = batched_solution.get_compartment("D")
+    assert deaths.shape == (parameters.shape[0], t_eval.size)
+    assert np.all(np.diff(deaths, axis=1) >= 0)
+
+
+@pytest.mark.parametrize("method", ["LSODA", "BDF", "Radau"])
+def test_seirpdq_ensemble_analytic_jacobian(seirpdq_realizations, method):
+    parameters, initial_conditions = seirpdq_realizations
+    t_span = (0.0, 100.0)
+    t_eval = np.linspace(*t_span, 101)
+
+    analytic_solution = SEIRPDQ.solve_ensemble(
+        parameters, initial_conditions, t_span, t_eval=t_eval, method=method, rtol=1e-8
+    )
+    finite_differences_solution = solve_ensemble(
+        SEIRPDQ.ensemble_rhs,
+        parameters,
+        initial_conditions,
+        t_span,
+        t_eval=t_eval,
+        method=method,
+        rtol=1e-8,
+    )
+
+    assert analytic_solution.success
+    assert pytest.approx(finite_differences_solution.y, rel=1e-4) == analytic_solution.y
+
+
+def singular_growth(t, y, parameters):
+    # y' = 1 / (a - t)**2, singular at t = a
+    return 1.0 / (parameters[:, 0] - t) ** 2
+
+
+def test_ensemble_with_failed_first_batch():
+    parameters = np.array([[5.0], [20.0], [30.0]])
+    t_eval = np.linspace(0.0, 10.0, 11)
+
+    ensemble_solution = solve_ensemble(
+        singular_growth,
+        parameters,
+        np.array([1.0]),
+        (0.0, 10.0),
+        t_eval=t_eval,
+        method="RK45",
+        rtol=1e-8,
+        realizations_per_batch=1,
+    )
+
+    assert not ensemble_solution.success
+    assert pytest.approx(t_eval) == ensemble_solution.t
+    assert ensemble_solution.y.shape == (3, 1, t_eval.size)
+    assert np.all(np.isnan(ensemble_solution.y[0, 0, t_eval >= 5.0]))
+    expected_y = 1.0 + 1.0 / (parameters[1:] - t_eval) - 1.0 / parameters[1:]
+    assert pytest.approx(expected_y, rel=1e-5) == ensemble_solution.y[1:, 0]
+
+
+def test_build_parameter_matrix_rejects_unknown_parameters():
+    with pytest.raises(ValueError):
+        build_parameter_matrix(3, parameter_names=("beta", "gamma"), beta=1.0, kappa=1.0)
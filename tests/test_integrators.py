@@ -0,0 +1,112 @@
+import pytest
+import numpy as np
+from numba import jit
+from scipy.integrate import solve_ivp
+
+from pydemic.integrators import IntegrationMethod, integrate
+from pydemic.models import SEIRPDQ
+
+
+@jit(nopython=True)
+def exponential_decay(t, y, parameters):
+    return -parameters[0] * y
+
+
+@jit(nopython=True)
+def robertson(t, y, parameters):
+    k1, k2, k3 = parameters
+    dydt = np.empty(3)
+    dydt[0] = -k1 * y[0] + k3 * y[1] * y[2]
+    dydt[1] = k1 * y[0] - k3 * y[1] * y[2] - k2 * y[1] * y[1]
+    dydt[2] = k2 * y[1] * y[1]
+    return dydt
+
+
+@jit(nopython=True)
+def robertson_jacobian(t, y, parameters):
+    k1, k2, k3 = parameters
+    J = np.zeros((3, 3))
+    J[0, 0] = -k1
+    J[0, 1] = k3 * y[2]
+    J[0, 2] = k3 * y[1]
+    J[1, 0] = k1
+    J[1, 1] = -k3 * y[2] - 2.0 * k2 * y[1]
+    J[1, 2] = -k3 * y[1]
+    J[2, 1] = 2.0 * k2 * y[1]
+    return J
+
+
+@pytest.mark.parametrize("method", list(IntegrationMethod))
+def test_exponential_decay(method):
+    parameters = np.array([0.5])
+    y0 = np.array([1.0, 2.0])
+    t_eval = np.linspace(0.0, 10.0, 21)
+
+    solution = integrate(
+        exponential_decay, (0.0, 10.0), y0, parameters, t_eval=t_eval, method=method, rtol=1e-8
+    )
+
+    assert solution.success
+    expected_solution = y0[:, np.newaxis] * np.exp(-parameters[0] * t_eval)
+    assert pytest.approx(expected_solution, rel=1e-4, abs=1e-8) == solution.y
+
+
+@pytest.mark.parametrize("method", [IntegrationMethod.DOPRI5, IntegrationMethod.ROSENBROCK23])
+def test_seirpdq_against_scipy(method):
+    N = 6.7e6
+    parameters = SEIRPDQ.parameter_vector(
+        beta0=0.3, mu0=0.3, omega=1.5e-2, N=N, t_transition=40, half_life=10
+    )
+    y0 = np.array([N - 850, 500, 200, 100, 50, 0, 0, 50, 0])
+    t_eval = np.linspace(0.0, 120.0, 121)
+
+    solution = integrate(SEIRPDQ.rhs, (0.0, 120.0), y0, parameters, t_eval=t_eval, method=method)
+    scipy_solution = solve_ivp(
+        lambda t, y: SEIRPDQ.rhs(t, y, parameters),
+        (0.0, 120.0),
+        y0,
+        t_eval=t_eval,
+        method="LSODA",
+        rtol=1e-10,
+        atol=1e-8,
+    )
+
+    assert solution.success
+    assert pytest.approx(scipy_solution.y, rel=1e-3, abs=1e-2) == solution.y
+
+
+@pytest.mark.parametrize("jacobian", [robertson_jacobian, None])
+def test_rosenbrock_stiff_robertson(jacobian):
+    parameters = np.array([0.04, 3e7, 1e4])
+    y0 = np.array([1.0, 0.0, 0.0])
+    t_eval = np.array([0.0, 1.0, 10.0, 40.0])
+
+    solution = integrate(
+        robertson,
+        (0.0, 40.0),
+        y0,
+        parameters,
+        t_eval=t_eval,
+        method=IntegrationMethod.ROSENBROCK23,
+        jacobian=jacobian,
+        rtol=1e-6,
+        atol=1e-10,
+    )
+    scipy_solution = solve_ivp(
+        lambda t, y: robertson(t, y, parameters),
+        (0.0, 40.0),
+        y0,
+        t_eval=t_eval,
+        method="Radau",
+        rtol=1e-10,
+        atol=1e-14,
+    )
+
+    assert solution.success
+    assert solution.nsteps < 1000
+    assert pytest.approx(scipy_solution.y, rel=1e-3, abs=1e-9) == solution.y
+
+
+def test_t_eval_outside_t_span():
+    with pytest.raises(ValueError):
+        integrate(exponential_decay, (0.0, 1.0), np.ones(1), np.ones(1), t_eval=[0.0, 2.0])
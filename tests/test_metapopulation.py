@@ -0,0 +1,283 @@
+import pytest
+import numpy as np
+import scipy.sparse as sp
+
+from pydemic.models import MetaSEIR, MetaSEIRPDQ, mobility_matrix_from_edges
+
+seed = 123
+
+
+def meta_seir_reference_model(t, Y, nPatches, beta, C, mu, sigma, gamma, M):
+    """
+    The loop-based MetaSEIR RHS, as written in the metapopulation scripts.
+    """
+    S, E, I, R = np.reshape(Y, (4, nPatches))
+    dS, dE, dI, dR = np.zeros((4, nPatches))
+    transmParam = np.sum(beta * I, 1)
+    mobS = np.sum(C * S[:, np.newaxis], 0)
+    mobE = np.sum(C * E[:, np.newaxis], 0)
+    mobI = np.sum(C * I[:, np.newaxis], 0)
+    mobR = np.sum(C * R[:, np.newaxis], 0)
+    for i in range(nPatches):
+        dS[i] = mu - mu * S[i] - S[i] * transmParam[i] + M[0] * mobS[i]
+        dE[i] = S[i] * transmParam[i] - (mu + sigma) * E[i] + M[1] * mobE[i]
+        dI[i] = sigma * E[i] - (mu + gamma) * I[i] + M[2] * mobI[i]
+        dR[i] = gamma * I[i] - mu * R[i] + M[3] * mobR[i]
+    return np.reshape([dS, dE, dI, dR], 4 * nPatches)
+
+
+def meta_seirpdq_reference_model(
+    t,
+    Y,
+    nPatches,
+    beta,
+    mu,
+    gamma_I,
+    gamma_A,
+    gamma_P,
+    d_I,
+    d_P,
+    omega,
+    epsilon_I,
+    rho,
+    eta,
+    sigma,
+    N,
+):
+    """
+    The loop-based MetaSEIRPDQ RHS, as written in the metapopulation scripts.
+    """
+    S, E, A, I, P, R, D, C, H = np.reshape(Y, (9, nPatches))
+    dS, dE, dA, dI, dP, dR, dD, dC, dH = np.zeros((9, nPatches))
+    transmParam = np.sum(beta * I, 1)
+    for i in range(nPatches):
+        dS[i] = -transmParam[i] * S[i] / N[i] - mu / N[i] * S[i] * A[i] - omega * S[i] + eta * R[i]
+        dE[i] = transmParam[i] * S[i] / N[i] + mu / N[i] * S[i] * A[i] - sigma * E[i] - omega * E[i]
+        dA[i] = sigma * (1 - rho) * E[i] - gamma_A * A[i] - omega * A[i]
+        dI[i] = sigma * rho * E[i] - gamma_I * I[i] - d_I * I[i] - omega * I[i] - epsilon_I * I[i]
+        dP[i] = epsilon_I * I[i] - gamma_P * P[i] - d_P * P[i]
+        dR[i] = (
+            gamma_A * A[i]
+            + gamma_I * I[i]
+            + gamma_P * P[i]
+            + omega * (S[i] + E[i] + A[i] + I[i])
+            - eta * R[i]
+        )
+        dD[i] = d_I * I[i] + d_P * P[i]
+        dC[i] = epsilon_I * I[i]
+        dH[i] = gamma_P * P[i]
+    return np.reshape([dS, dE, dA, dI, dP, dR, dD, dC, dH], 9 * nPatches)
+
+
+def random_mobility_matrix(number_of_patches, random_state):
+    C = random_state.uniform(0, 0.02, (number_of_patches, number_of_patches))
+    np.fill_diagonal(C, 0.0)
+    np.fill_diagonal(C, -C.sum(axis=1))
+    return C
+
+
+@pytest.mark.parametrize("number_of_patches", [1, 7])
+def test_meta_seir_rhs_matches_reference(number_of_patches):
+    random_state = np.random.RandomState(seed)
+    beta = random_state.uniform(0, 10, (number_of_patches, number_of_patches))
+    C = random_mobility_matrix(number_of_patches, random_state)
+    M = np.array([1.0, 0.8, 0.2, 1.0])
+    y = random_state.uniform(0, 1, 4 * number_of_patches)
+    model = MetaSEIR(beta=beta, C=C, mu=0.1, sigma=1 / 3, gamma=1 / 2, M=M)
+
+    expected_rhs = meta_seir_reference_model(
+        0.0, y, number_of_patches, beta, C, 0.1, 1 / 3, 1 / 2, M
+    )
+
+    assert pytest.approx(expected_rhs, rel=1e-12, abs=1e-14) == model.rhs(0.0, y)
+    out = np.empty_like(y)
+    model.rhs(0.0, y, out=out)
+    assert pytest.approx(expected_rhs, rel=1e-12, abs=1e-14) == out
+
+
+def test_meta_seirpdq_rhs_matches_reference():
+    number_of_patches = 4
+    random_state = np.random.RandomState(seed)
+    beta = np.diag(random_state.uniform(0.1, 0.5, number_of_patches))
+    N = np.array([6.32e6, 1.85e5, 1.80e5, 1.13e5])
+    rates = dict(
+        mu=0.2,
+        gamma_I=0.65,
+        gamma_A=0.95,
+        gamma_P=0.4,
+        d_I=2e-4,
+        d_P=0.3,
+        omega=1e-2,
+        epsilon_I=1 / 3,
+        rho=0.85,
+        eta=1e-3,
+        sigma=1 / 5,
+    )
+    y = random_state.uniform(0, 1e3, 9 * number_of_patches)
+    model = MetaSEIRPDQ(beta=beta, N=N, **rates)
+
+    expected_rhs = meta_seirpdq_reference_model(0.0, y, number_of_patches, beta, N=N, **rates)
+
+    assert pytest.approx(expected_rhs, rel=1e-12, abs=1e-12) == model.rhs(0.0, y)
+
+
+def test_meta_seir_solve_conserves_population():
+    number_of_patches = 3
+    random_state = np.random.RandomState(seed)
+    beta = np.diag(np.full(number_of_patches, 5.0))
+    C = random_mobility_matrix(number_of_patches, random_state)
+    model = MetaSEIR(beta=beta, C=C, mu=0.0, sigma=1 / 3, gamma=1 / 2)
+    S0 = np.full(number_of_patches, 1 - 1e-3)
+    I0 = np.full(number_of_patches, 1e-3)
+    y0 = [S0, np.zeros(number_of_patches), I0, np.zeros(number_of_patches)]
+
+    solution = model.solve(y0, (0.0, 30.0), t_eval=[0.0, 30.0], rtol=1e-8)
+
+    assert solution.success
+    assert pytest.approx(number_of_patches) == solution.y[:, -1].sum()
+
+
+def test_metapopulation_rejects_mismatched_matrices():
+    with pytest.raises(ValueError):
+        MetaSEIR(beta=np.eye(3), C=np.eye(2), mu=0.1, sigma=0.3, gamma=0.5)
+
+
+def test_mobility_matrix_from_edges():
+    C = mobility_matrix_from_edges(4, [0, 0, 1, 3, 2], [1, 2, 0, 3, 1], [0.1, 0.2, 0.3, 0.4, 0.5])
+
+    assert sp.isspmatrix_csr(C)
+    assert pytest.approx(np.zeros(4)) == np.asarray(C.sum(axis=1)).ravel()
+    assert pytest.approx([-0.3, -0.3, -0.5, 0.0]) == C.diagonal()
+    assert C[0, 2] == 0.2
+
+
+@pytest.mark.parametrize("model_class", [MetaSEIR, MetaSEIRPDQ])
+def test_sparse_matches_dense(model_class):
+    number_of_patches = 6
+    random_state = np.random.RandomState(seed)
+    beta = np.diag(random_state.uniform(0.1, 0.5, number_of_patches))
+    beta[0, 1] = beta[4, 2] = 0.05
+    C = random_mobility_matrix(number_of_patches, random_state)
+    C[C < 0.01] = 0.0
+    np.fill_diagonal(C, 0.0)
+    np.fill_diagonal(C, -C.sum(axis=1))
+    if model_class is MetaSEIR:
+        rates = dict(mu=0.1, sigma=1 / 3, gamma=1 / 2)
+    else:
+        rates = dict(
+            mu=0.2,
+            gamma_I=0.65,
+            gamma_A=0.95,
+            gamma_P=0.4,
+            d_I=2e-4,
+            d_P=0.3,
+            omega=1e-2,
+            epsilon_I=1 / 3,
+            rho=0.85,
+            eta=1e-3,
+            sigma=1 / 5,
+            N=np.full(number_of_patches, 1e3),
+        )
+    dense_model = model_class(beta=beta, C=C, **rates)
+    sparse_model = model_class(beta=sp.csr_matrix(beta), C=sp.csr_matrix(C), **rates)
+    y = random_state.uniform(0, 1, sparse_model.number_of_states)
+
+    assert sparse_model.is_sparse
+    assert pytest.approx(dense_model.rhs(0.0, y), rel=1e-12, abs=1e-14) == sparse_model.rhs(0.0, y)
+
+    # The sparsity pattern must cover all the nonzeros of the Jacobian
+    step = 1e-7
+    jacobian = np.column_stack(
+        [
+            (dense_model.rhs(0.0, y + step * e) - dense_model.rhs(0.0, y)) / step
+            for e in np.eye(y.size)
+        ]
+    )
+    pattern = sparse_model.jacobian_sparsity().toarray()
+    assert np.all(pattern[np.abs(jacobian) > 1e-9] == 1)
+    assert pattern.sum() < y.size**2
+
+
+@pytest.mark.parametrize("sparse_beta, sparse_C", [(True, False), (False, True)])
+def test_mixed_sparse_and_dense_matrices(sparse_beta, sparse_C):
+    number_of_patches = 5
+    random_state = np.random.RandomState(seed)
+    beta = np.diag(random_state.uniform(0.1, 0.5, number_of_patches))
+    beta[0, 1] = 0.05
+    C = random_mobility_matrix(number_of_patches, random_state)
+    rates = dict(mu=0.1, sigma=1 / 3, gamma=1 / 2)
+    dense_model = MetaSEIR(beta=beta, C=C, **rates)
+    mixed_model = MetaSEIR(
+        beta=sp.csr_matrix(beta) if sparse_beta else beta,
+        C=sp.csr_matrix(C) if sparse_C else C,
+        **rates,
+    )
+    y = random_state.uniform(0, 1, mixed_model.number_of_states)
+
+    assert mixed_model.is_sparse
+    assert pytest.approx(dense_model.rhs(0.0, y), rel=1e-12, abs=1e-14) == mixed_model.rhs(0.0, y)
+    assert pytest.approx(dense_model.jacobian(0.0, y).toarray(), rel=1e-12, abs=1e-14) == (
+        mixed_model.jacobian(0.0, y).toarray()
+    )
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_meta_seirpdq_analytic_jacobian(sparse):
+    number_of_patches = 5
+    random_state = np.random.RandomState(seed)
+    beta = random_state.uniform(0.0, 0.5, (number_of_patches, number_of_patches))
+    C = random_mobility_matrix(number_of_patches, random_state)
+    if sparse:
+        beta, C = sp.csr_matrix(beta), sp.csr_matrix(C)
+    model = MetaSEIRPDQ(
+        beta=beta,
+        mu=0.2,
+        gamma_I=0.65,
+        gamma_A=0.95,
+        gamma_P=0.4,
+        d_I=2e-4,
+        d_P=0.3,
+        omega=1e-2,
+        epsilon_I=1 / 3,
+        rho=0.85,
+        eta=1e-3,
+        sigma=1 / 5,
+        N=random_state.uniform(1e3, 1e4, number_of_patches),
+        C=C,
+    )
+    y = random_state.uniform(0, 1e3, model.number_of_states)
+
+    # The RHS is quadratic, so central differences are exact up to rounding
+    step = 1e-3
+    expected_jacobian = np.column_stack(
+        [
+            (model.rhs(0.0, y + step * e) - model.rhs(0.0, y - step * e)) / (2 * step)
+            for e in np.eye(y.size)
+        ]
+    )
+
+    jacobian = model.jacobian(0.0, y)
+    assert sp.isspmatrix_csr(jacobian)
+    assert pytest.approx(expected_jacobian, rel=1e-6, abs=1e-9) == jacobian.toarray()
+
+
+def test_sparse_meta_seir_bdf_solve():
+    number_of_patches = 500
+    patches = np.arange(number_of_patches)
+    C = mobility_matrix_from_edges(
+        number_of_patches,
+        np.concatenate((patches, patches)),
+        np.concatenate(((patches + 1) % number_of_patches, (patches - 1) % number_of_patches)),
+        np.full(2 * number_of_patches, 0.01),
+    )
+    beta = sp.identity(number_of_patches, format="csr") * 5.0
+    model = MetaSEIR(beta=beta, C=C, mu=0.0, sigma=1 / 3, gamma=1 / 2)
+    I0 = np.zeros(number_of_patches)
+    I0[0] = 1e-3
+    y0 = [1 - I0, np.zeros(number_of_patches), I0, np.zeros(number_of_patches)]
+
+    solution = model.solve(y0, (0.0, 30.0), t_eval=[0.0, 30.0], method="BDF", rtol=1e-6)
+
+    assert solution.success
+    assert pytest.approx(number_of_patches) == solution.y[:, -1].sum()
+    assert solution.njev > 0
@@ -1,8 +1,20 @@
+import os
+import pickle
 import pytest
 import numpy as np
+import pygmo as pg
+from scipy.optimize import OptimizeResult
 
+from pydemic import minimization
 from pydemic.minimization import PygmoSelfAdaptiveDESettings, OptimizationProblem
+from pydemic.minimization import PygmoBatchFitnessEvaluator, PygmoOptimizationProblemWrapper
 from pydemic.minimization import OptimizationMethod, ScipyDifferentialEvolutionSettings
+from pydemic.minimization import ObjectiveFunctionCache, warm_start_population
+from pydemic.minimization import ArchipelagoCheckpoint, EarlyStoppingSettings
+from pydemic.minimization import MultistartLocalSettings, PygmoAlgorithmSettings
+from pydemic.minimization import SurrogateSettings, evaluations_to_target
+from pydemic.parallel import WorkerPool
+from pydemic.surrogate import SurrogateModelType
 
 seed = 123
 
@@ -59,3 +71,861 @@ def test_scipy_de_rosenbrock_minimization(problem_dimension):
     solution = problem.solve_minimization()
 
     assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+
+
+def gradient_rosenbrock(x):
+    gradient = np.zeros_like(x)
+    gradient[:-1] = -400.0 * x[:-1] * (x[1:] - x[:-1] ** 2) - 2.0 * (1.0 - x[:-1])
+    gradient[1:] += 200.0 * (x[1:] - x[:-1] ** 2)
+    return gradient
+
+
+@pytest.mark.parametrize(
+    "optimization_method", [OptimizationMethod.SCIPY_DE, OptimizationMethod.PYGMO_DE1220]
+)
+def test_rosenbrock_minimization_with_gradient(optimization_method):
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+    if optimization_method == OptimizationMethod.SCIPY_DE:
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=problem_dimension, seed=seed, tol=1e-2
+        )
+    else:
+        solver_settings = PygmoSelfAdaptiveDESettings(gen=200, popsize=30, seed=seed)
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=bounds,
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+        gradient_function=gradient_rosenbrock,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-4) == solution.x
+
+
+def f_rosenbrock_population(population):
+    population = np.asarray(population)
+    left_term = 100.0 * (population[:, 1:] - population[:, :-1] ** 2) ** 2
+    right_term = (1.0 - population[:, :-1]) ** 2
+    return np.sum(left_term + right_term, axis=1)
+
+
+@pytest.mark.parametrize(
+    "optimization_method", [OptimizationMethod.SCIPY_DE, OptimizationMethod.PYGMO_DE1220]
+)
+def test_vectorized_rosenbrock_minimization(optimization_method):
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+    if optimization_method == OptimizationMethod.SCIPY_DE:
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=problem_dimension, seed=seed
+        )
+    else:
+        solver_settings = PygmoSelfAdaptiveDESettings(gen=1000, popsize=60, seed=seed)
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock_population,
+        bounds=bounds,
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+        vectorized=True,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_scipy_vectorized_option(monkeypatch, vectorized):
+    # SciPy < 1.9 has no `vectorized` keyword, so it is only passed when needed
+    differential_evolution_options = {}
+
+    def differential_evolution(objective_function, **options):
+        differential_evolution_options.update(options)
+        return OptimizeResult(x=np.zeros(2), fun=0.0, nfev=0)
+
+    monkeypatch.setattr(minimization, "differential_evolution", differential_evolution)
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock_population if vectorized else f_rosenbrock,
+        bounds=2 * [[-6, 6]],
+        optimization_method=OptimizationMethod.SCIPY_DE,
+        solver_args=ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=2, polish=False
+        ),
+        vectorized=vectorized,
+    )
+
+    problem.solve_minimization()
+
+    assert ("vectorized" in differential_evolution_options) == vectorized
+
+
+def test_pygmo_batch_fitness():
+    bounds = 3 * [[-6, 6]]
+    population = np.random.RandomState(seed).uniform(-6, 6, (5, 3))
+    expected_fitness = [f_rosenbrock(x) for x in population]
+
+    for objective_function, vectorized in [
+        (f_rosenbrock, False),
+        (f_rosenbrock_population, True),
+    ]:
+        problem_wrapper = PygmoOptimizationProblemWrapper(
+            objective_function=objective_function, bounds=bounds, vectorized=vectorized
+        )
+        batch_fitness = problem_wrapper.batch_fitness(population.ravel())
+        assert pytest.approx(expected_fitness) == batch_fitness
+        assert pytest.approx(expected_fitness[0]) == problem_wrapper.fitness(population[0])[0]
+
+
+def test_pygmo_process_pool_batch_fitness():
+    bounds = 3 * [[-6, 6]]
+    population = np.random.RandomState(seed).uniform(-6, 6, (7, 3))
+    expected_fitness = [f_rosenbrock(x) for x in population]
+    problem = pg.problem(
+        PygmoOptimizationProblemWrapper(objective_function=f_rosenbrock, bounds=bounds)
+    )
+
+    with WorkerPool(number_of_workers=2) as worker_pool:
+        batch_evaluator = pg.bfe(PygmoBatchFitnessEvaluator(worker_pool))
+        batch_fitness = batch_evaluator(problem, population.ravel())
+        assert worker_pool.is_running
+
+    assert not worker_pool.is_running
+    assert pytest.approx(expected_fitness) == batch_fitness
+
+
+def test_pygmo_rosenbrock_minimization_with_worker_processes():
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+    solver_settings = PygmoSelfAdaptiveDESettings(
+        gen=1000, popsize=60, seed=seed, batch_evaluation_workers=2
+    )
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=bounds,
+        optimization_method=OptimizationMethod.PYGMO_DE1220,
+        solver_args=solver_settings,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+
+
+@pytest.mark.parametrize("variant_adptv", [1, 2])
+def test_pygmo_batch_de1220_evaluates_generations_in_batch(variant_adptv):
+    problem_dimension = 3
+    population_sizes = []
+
+    def objective_function(population):
+        population_sizes.append(len(population))
+        return f_rosenbrock_population(population)
+
+    solver_settings = PygmoSelfAdaptiveDESettings(
+        gen=1000, popsize=60, seed=seed, variant_adptv=variant_adptv, polish=False
+    )
+    problem = OptimizationProblem(
+        objective_function=objective_function,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=OptimizationMethod.PYGMO_BATCH_DE1220,
+        solver_args=solver_settings,
+        vectorized=True,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert set(population_sizes) == {60}
+    assert solution.solution.problem.get_fevals() == 60 * len(population_sizes)
+    assert solution.fun < 1e-3
+
+
+def test_pygmo_de1220_evaluates_trial_vectors_one_by_one():
+    population_sizes = []
+
+    def objective_function(population):
+        population_sizes.append(len(population))
+        return f_rosenbrock_population(population)
+
+    problem = OptimizationProblem(
+        objective_function=objective_function,
+        bounds=3 * [[-6, 6]],
+        optimization_method=OptimizationMethod.PYGMO_DE1220,
+        solver_args=PygmoSelfAdaptiveDESettings(gen=10, popsize=10, seed=seed, polish=False),
+        vectorized=True,
+    )
+
+    problem.solve_minimization()
+
+    # Only the initial population is evaluated in batch
+    assert population_sizes[0] == 10
+    assert set(population_sizes[1:]) == {1}
+
+
+@pytest.mark.parametrize("variant_adptv", [1, 2])
+def test_pygmo_batch_de1220_quality_is_close_to_de1220(variant_adptv):
+    problem_dimension = 3
+    seeds = range(10)
+    best_values = {}
+    for optimization_method in (
+        OptimizationMethod.PYGMO_DE1220,
+        OptimizationMethod.PYGMO_BATCH_DE1220,
+    ):
+        best_values[optimization_method] = np.array(
+            [
+                OptimizationProblem(
+                    objective_function=f_rosenbrock_population,
+                    bounds=problem_dimension * [[-6, 6]],
+                    optimization_method=optimization_method,
+                    solver_args=PygmoSelfAdaptiveDESettings(
+                        gen=300,
+                        popsize=30,
+                        seed=run_seed,
+                        variant_adptv=variant_adptv,
+                        polish=False,
+                    ),
+                    vectorized=True,
+                )
+                .solve_minimization()
+                .fun
+                for run_seed in seeds
+            ]
+        )
+
+    de1220_values = best_values[OptimizationMethod.PYGMO_DE1220]
+    batch_values = best_values[OptimizationMethod.PYGMO_BATCH_DE1220]
+    assert np.sum(batch_values < 1e-4) >= np.sum(de1220_values < 1e-4) - 2
+    assert np.median(batch_values) <= 10 * np.median(de1220_values) + 1e-8
+
+
+def test_pygmo_batch_evaluation_workers_persist_across_solves():
+    problem_dimension = 3
+    solver_settings = PygmoSelfAdaptiveDESettings(
+        gen=300, popsize=30, seed=seed, batch_evaluation_workers=2
+    )
+
+    with OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=OptimizationMethod.PYGMO_BATCH_DE1220,
+        solver_args=solver_settings,
+    ) as problem:
+        problem.solve_minimization()
+        worker_pool = problem._settings_worker_pool
+        assert worker_pool.is_running
+
+        problem.solve_minimization()
+        assert problem._settings_worker_pool is worker_pool
+        assert worker_pool.is_running
+
+    assert not worker_pool.is_running
+
+
+def test_invalid_optimization_problem():
+    with pytest.raises(ValueError):
+        OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=[[1, -1]],
+            optimization_method=OptimizationMethod.SCIPY_DE,
+            solver_args=None,
+        )
+    with pytest.raises(TypeError):
+        OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=[[-1, 1]],
+            optimization_method="scipy",
+            solver_args=None,
+        )
+    with pytest.raises(ValueError):
+        PygmoSelfAdaptiveDESettings(gen=10, popsize=10, batch_evaluation_workers=0)
+
+
+def test_invalid_worker_pool():
+    with pytest.raises(ValueError):
+        WorkerPool(number_of_workers=0)
+
+
+def f_shifted_rosenbrock(x, shift):
+    return f_rosenbrock(x - shift)
+
+
+def gradient_shifted_rosenbrock(x, shift):
+    return gradient_rosenbrock(x - shift)
+
+
+def f_shifted_rosenbrock_population(population, shift):
+    return f_rosenbrock_population(population - shift)
+
+
+def read_broadcast_value(broadcast_value):
+    return broadcast_value.get()
+
+
+def test_worker_pool_broadcast():
+    with WorkerPool(number_of_workers=2) as worker_pool:
+        broadcast_value = worker_pool.broadcast(np.arange(3.0))
+        values = worker_pool.map(read_broadcast_value, 4 * [broadcast_value])
+        worker_pool.release(broadcast_value)
+
+        assert all(pytest.approx(np.arange(3.0)) == value for value in values)
+        assert not os.path.exists(broadcast_value.path)
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+@pytest.mark.parametrize(
+    "optimization_method", [OptimizationMethod.SCIPY_DE, OptimizationMethod.PYGMO_DE1220]
+)
+def test_rosenbrock_minimization_with_worker_pool(optimization_method, vectorized):
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+    objective_function = f_shifted_rosenbrock_population if vectorized else f_shifted_rosenbrock
+
+    with WorkerPool(number_of_workers=2) as worker_pool:
+        for shift in [0.0, 0.5]:
+            if optimization_method == OptimizationMethod.SCIPY_DE:
+                solver_settings = ScipyDifferentialEvolutionSettings(
+                    number_of_decision_variables=problem_dimension, seed=seed
+                )
+            else:
+                solver_settings = PygmoSelfAdaptiveDESettings(gen=1000, popsize=60, seed=seed)
+            problem = OptimizationProblem(
+                objective_function=objective_function,
+                bounds=bounds,
+                optimization_method=optimization_method,
+                solver_args=solver_settings,
+                args=[shift],
+                vectorized=vectorized,
+                worker_pool=worker_pool,
+            )
+
+            solution = problem.solve_minimization()
+
+            assert worker_pool.is_running
+            assert pytest.approx(np.ones(problem_dimension) + shift, rel=1e-3) == solution.x
+
+
+def test_objective_function_cache():
+    cache = ObjectiveFunctionCache(maxsize=2, significant_digits=8)
+    x = np.array([0.5, 2.0])
+
+    assert pytest.approx(f_rosenbrock(x)) == cache.evaluate(f_rosenbrock, x)
+    assert pytest.approx(f_rosenbrock(x)) == cache.evaluate(f_rosenbrock, x * (1 + 1e-12))
+    assert cache.cache_info() == (1, 1, 2, 1)
+
+    population = np.array([x, x + 1.0, x + 1.0, x + 2.0])
+    values = cache.evaluate_population(f_rosenbrock_population, population)
+    assert pytest.approx(f_rosenbrock_population(population)) == values
+    assert cache.cache_info() == (3, 3, 2, 2)
+    assert pytest.approx(0.5) == cache.hit_rate
+
+    values = cache.map(map, f_rosenbrock, [x + 2.0, x])
+    assert pytest.approx(f_rosenbrock_population(np.array([x + 2.0, x]))) == values
+    assert cache.cache_info() == (4, 4, 2, 2)
+
+    unpickled_cache = pickle.loads(pickle.dumps(cache))
+    assert unpickled_cache.cache_info() == (0, 0, 2, 0)
+
+    # Values rounded to the same significant digits share a key, whatever their binary exponent
+    assert cache.key(np.array([1.0 - 1e-12, -0.0])) == cache.key(np.array([1.0, 0.0]))
+    assert cache.key(np.array([1024.0 * (1 - 1e-12)])) == cache.key(np.array([1024.0]))
+    assert cache.key(np.array([1.0 + 1e-6])) != cache.key(np.array([1.0]))
+
+    with pytest.raises(ValueError):
+        ObjectiveFunctionCache(maxsize=0)
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+@pytest.mark.parametrize(
+    "optimization_method", [OptimizationMethod.SCIPY_DE, OptimizationMethod.PYGMO_DE1220]
+)
+def test_rosenbrock_minimization_with_objective_cache(optimization_method, vectorized):
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+    if optimization_method == OptimizationMethod.SCIPY_DE:
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=problem_dimension, seed=seed
+        )
+    else:
+        solver_settings = PygmoSelfAdaptiveDESettings(gen=1000, popsize=60, seed=seed)
+    objective_cache = ObjectiveFunctionCache(maxsize=1000000)
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock_population if vectorized else f_rosenbrock,
+        bounds=bounds,
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+        vectorized=vectorized,
+        objective_cache=objective_cache,
+    )
+
+    solution = problem.solve_minimization()
+    first_solve_misses = objective_cache.misses
+    repeated_solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+    assert pytest.approx(solution.x) == repeated_solution.x
+    assert objective_cache.hits > 0
+    assert objective_cache.misses == first_solve_misses
+
+
+def test_scipy_workers_minimization_with_objective_cache():
+    problem_dimension = 2
+    objective_cache = ObjectiveFunctionCache(maxsize=1000000)
+    solver_settings = ScipyDifferentialEvolutionSettings(
+        number_of_decision_variables=problem_dimension, seed=seed, workers=2
+    )
+
+    with OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=OptimizationMethod.SCIPY_DE,
+        solver_args=solver_settings,
+        objective_cache=objective_cache,
+    ) as problem:
+        solution = problem.solve_minimization()
+        first_solve_misses = objective_cache.misses
+        repeated_solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+    assert pytest.approx(solution.x) == repeated_solution.x
+    assert objective_cache.hits > 0
+    assert objective_cache.misses == first_solve_misses
+
+
+def test_warm_start_population():
+    bounds = [[-6, 6], [0, 1]]
+    x = np.array([1.0, 1.0])
+
+    population = warm_start_population(x, bounds, size=10, spread=0.1, seed=seed)
+
+    assert population.shape == (10, 2)
+    assert pytest.approx(x) == population[0]
+    assert np.all(population >= [-6, 0]) and np.all(population <= [6, 1])
+    with pytest.raises(ValueError):
+        warm_start_population(x, bounds, size=0)
+
+
+@pytest.mark.parametrize(
+    "optimization_method, parallel_execution",
+    [
+        (OptimizationMethod.SCIPY_DE, False),
+        (OptimizationMethod.PYGMO_DE1220, False),
+        (OptimizationMethod.PYGMO_DE1220, True),
+        (OptimizationMethod.PYGMO_BATCH_DE1220, False),
+        (OptimizationMethod.PYGMO_BATCH_DE1220, True),
+    ],
+)
+def test_warm_started_rosenbrock_minimization(optimization_method, parallel_execution):
+    problem_dimension = 3
+    bounds = problem_dimension * [[-6, 6]]
+
+    def create_problem(shift, initial_population=None):
+        if optimization_method == OptimizationMethod.SCIPY_DE:
+            solver_settings = ScipyDifferentialEvolutionSettings(
+                number_of_decision_variables=problem_dimension, seed=seed
+            )
+        else:
+            solver_settings = PygmoSelfAdaptiveDESettings(
+                gen=1000,
+                popsize=60,
+                seed=seed,
+                parallel_execution=parallel_execution,
+                archipelago_gen=5,
+            )
+        return OptimizationProblem(
+            objective_function=f_shifted_rosenbrock,
+            bounds=bounds,
+            optimization_method=optimization_method,
+            solver_args=solver_settings,
+            args=[shift],
+            initial_population=initial_population,
+        )
+
+    solution = create_problem(0.0).solve_minimization()
+    warm_started_problem = create_problem(0.01, initial_population=solution.population)
+    warm_solution = warm_started_problem.solve_minimization()
+
+    assert warm_started_problem.initial_population.shape[1] == problem_dimension
+    assert pytest.approx(np.ones(problem_dimension) + 0.01, rel=1e-3) == warm_solution.x
+    if optimization_method == OptimizationMethod.SCIPY_DE:
+        assert warm_solution.nfev < solution.nfev
+
+
+def test_check_previous_solution():
+    problem_dimension = 3
+
+    def create_problem(shift):
+        return OptimizationProblem(
+            objective_function=f_shifted_rosenbrock,
+            bounds=problem_dimension * [[-6, 6]],
+            optimization_method=OptimizationMethod.SCIPY_DE,
+            solver_args=None,
+            args=[shift],
+            gradient_function=gradient_shifted_rosenbrock,
+        )
+
+    previous_solution = np.ones(problem_dimension)
+
+    check = create_problem(0.0).check_previous_solution(previous_solution)
+    assert check.is_valid
+    assert pytest.approx(previous_solution) == check.polished_x
+
+    check = create_problem(0.5).check_previous_solution(previous_solution)
+    assert not check.is_valid
+    assert check.polished_fun < check.fun
+    assert pytest.approx(previous_solution + 0.5, rel=1e-4) == check.polished_x
+    with pytest.raises(ValueError):
+        OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=problem_dimension * [[-6, 6]],
+            optimization_method=OptimizationMethod.SCIPY_DE,
+            solver_args=None,
+            initial_population=np.ones((5, 2)),
+        )
+
+
+def test_pygmo_archipelago_checkpoint_and_resume(tmp_path, monkeypatch):
+    problem_dimension = 3
+    checkpoint_path = str(tmp_path / "archipelago.pkl")
+
+    def create_problem(archipelago_gen, number_of_islands=2, popsize=30):
+        solver_settings = PygmoSelfAdaptiveDESettings(
+            gen=200,
+            popsize=popsize,
+            seed=seed,
+            parallel_execution=True,
+            number_of_islands=number_of_islands,
+            archipelago_gen=archipelago_gen,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=2,
+        )
+        return OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=problem_dimension * [[-6, 6]],
+            optimization_method=OptimizationMethod.PYGMO_DE1220,
+            solver_args=solver_settings,
+        )
+
+    def interrupt_after_first_checkpoint(problem):
+        # Simulates a run killed right after the first checkpoint is written
+        save = ArchipelagoCheckpoint.save
+
+        def save_and_interrupt(checkpoint, path):
+            save(checkpoint, path)
+            raise KeyboardInterrupt
+
+        with monkeypatch.context() as patch:
+            patch.setattr(ArchipelagoCheckpoint, "save", save_and_interrupt)
+            with pytest.raises(KeyboardInterrupt):
+                problem.solve_minimization()
+
+    interrupt_after_first_checkpoint(create_problem(archipelago_gen=5))
+    checkpoint = ArchipelagoCheckpoint.load(checkpoint_path)
+    assert checkpoint.completed_generations == 2
+    assert not checkpoint.finished
+    assert len(checkpoint.algorithms) == 2
+    assert checkpoint.decision_vectors[0].shape == (30, problem_dimension)
+
+    # Resuming with other settings is refused
+    with pytest.raises(ValueError):
+        create_problem(archipelago_gen=5, number_of_islands=3).solve_minimization()
+    with pytest.raises(ValueError):
+        create_problem(archipelago_gen=5, popsize=20).solve_minimization()
+
+    resumed_solution = create_problem(archipelago_gen=5).solve_minimization()
+    checkpoint = ArchipelagoCheckpoint.load(checkpoint_path)
+    assert checkpoint.completed_generations == 5
+    assert checkpoint.finished
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == resumed_solution.x
+
+    # A finished checkpoint is not resumed, even with other settings
+    create_problem(archipelago_gen=3, popsize=20).solve_minimization()
+    checkpoint = ArchipelagoCheckpoint.load(checkpoint_path)
+    assert checkpoint.completed_generations == 3
+    assert checkpoint.decision_vectors[0].shape == (20, problem_dimension)
+
+
+def test_invalid_checkpoint_settings():
+    with pytest.raises(ValueError):
+        PygmoSelfAdaptiveDESettings(gen=10, popsize=10, checkpoint_interval=0)
+    with pytest.raises(TypeError):
+        PygmoSelfAdaptiveDESettings(gen=10, popsize=10, checkpoint_interval=2.5)
+    with pytest.raises(TypeError):
+        PygmoAlgorithmSettings(gen=10, popsize=10, checkpoint_path=1)
+
+
+def test_invalid_early_stopping_settings():
+    with pytest.raises(ValueError):
+        EarlyStoppingSettings(stall_generations=0)
+    with pytest.raises(ValueError):
+        EarlyStoppingSettings(spread_tolerance=-1.0)
+    with pytest.raises(TypeError):
+        PygmoSelfAdaptiveDESettings(gen=10, popsize=10, early_stopping=20)
+    with pytest.raises(TypeError):
+        PygmoAlgorithmSettings(gen=10, popsize=10, record_telemetry=None)
+    with pytest.raises(TypeError):
+        ScipyDifferentialEvolutionSettings(number_of_decision_variables=2, early_stopping=20)
+
+
+@pytest.mark.parametrize(
+    "optimization_method, parallel_execution",
+    [
+        (OptimizationMethod.SCIPY_DE, False),
+        (OptimizationMethod.PYGMO_DE1220, False),
+        (OptimizationMethod.PYGMO_DE1220, True),
+        (OptimizationMethod.PYGMO_BATCH_DE1220, False),
+        (OptimizationMethod.PYGMO_BATCH_DE1220, True),
+    ],
+)
+def test_early_stopping_with_telemetry(optimization_method, parallel_execution):
+    problem_dimension = 2
+    bounds = problem_dimension * [[-6, 6]]
+    early_stopping = EarlyStoppingSettings(stall_generations=20, improvement_tolerance=1e-8)
+    if optimization_method == OptimizationMethod.SCIPY_DE:
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=problem_dimension,
+            seed=seed,
+            tol=0.0,
+            early_stopping=early_stopping,
+            record_telemetry=True,
+        )
+    else:
+        solver_settings = PygmoSelfAdaptiveDESettings(
+            gen=20 if parallel_execution else 1000,
+            popsize=60,
+            seed=seed,
+            ftol=0.0,
+            xtol=0.0,
+            parallel_execution=parallel_execution,
+            archipelago_gen=1000,
+            early_stopping=(
+                EarlyStoppingSettings(stall_generations=3) if parallel_execution else early_stopping
+            ),
+            record_telemetry=True,
+        )
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=bounds,
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+    )
+
+    solution = problem.solve_minimization()
+
+    telemetry = solution.telemetry
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+    assert 0 < len(telemetry) < 1000
+    assert [record.generation for record in telemetry] == list(range(1, len(telemetry) + 1))
+    assert np.all(np.diff([record.best_fun for record in telemetry]) <= 0)
+    assert np.all(np.diff([record.evaluations for record in telemetry]) > 0)
+    assert np.all(np.diff([record.wall_time for record in telemetry]) >= 0)
+    assert all(record.mean_fun >= record.best_fun for record in telemetry)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_scipy_telemetry_with_legacy_callbacks(monkeypatch, workers):
+    # Before SciPy 1.12, the callbacks only receive the best point
+    def solve(intermediate_result_callback):
+        monkeypatch.setattr(
+            minimization, "_SCIPY_INTERMEDIATE_RESULT_CALLBACK", intermediate_result_callback
+        )
+        solver_settings = ScipyDifferentialEvolutionSettings(
+            number_of_decision_variables=2,
+            seed=seed,
+            workers=workers,
+            polish=False,
+            early_stopping=EarlyStoppingSettings(stall_generations=10, improvement_tolerance=1e-3),
+            record_telemetry=True,
+        )
+        problem = OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=2 * [[-6, 6]],
+            optimization_method=OptimizationMethod.SCIPY_DE,
+            solver_args=solver_settings,
+        )
+        return problem.solve_minimization()
+
+    solution = solve(intermediate_result_callback=True)
+    legacy_solution = solve(intermediate_result_callback=False)
+
+    assert legacy_solution.nfev == solution.nfev
+    assert legacy_solution.message == solution.message
+    for attribute in ["generation", "best_fun", "mean_fun", "evaluations"]:
+        assert [getattr(record, attribute) for record in legacy_solution.telemetry] == [
+            getattr(record, attribute) for record in solution.telemetry
+        ]
+
+
+@pytest.mark.parametrize(
+    "local_method, workers, vectorized",
+    [("L-BFGS-B", 1, False), ("TNC", 1, True), ("L-BFGS-B", 2, False), ("Nelder-Mead", 1, False)],
+)
+def test_multistart_local_rosenbrock_minimization(local_method, workers, vectorized):
+    problem_dimension = 3
+    solver_settings = MultistartLocalSettings(
+        number_of_starts=8,
+        local_method=local_method,
+        options={"maxiter": 20000} if local_method == "Nelder-Mead" else {},
+        seed=seed,
+        workers=workers,
+    )
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock_population if vectorized else f_shifted_rosenbrock,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=OptimizationMethod.MULTISTART_LOCAL,
+        solver_args=solver_settings,
+        args=[] if vectorized else [0.0],
+        gradient_function=None if vectorized else gradient_shifted_rosenbrock,
+        vectorized=vectorized,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+    assert solution.population.shape == (8, problem_dimension)
+    assert np.all(np.diff(solution.population_fun) >= 0)
+    assert solution.nfev == sum(result.nfev for result in solution.local_results)
+
+
+def test_invalid_multistart_local_settings():
+    with pytest.raises(ValueError):
+        MultistartLocalSettings(number_of_starts=0)
+    with pytest.raises(ValueError):
+        MultistartLocalSettings(local_method="BFGS")
+
+
+@pytest.mark.parametrize(
+    "optimization_method",
+    [
+        OptimizationMethod.PYGMO_CMAES,
+        OptimizationMethod.PYGMO_XNES,
+        OptimizationMethod.PYGMO_PSO_GEN,
+        OptimizationMethod.PYGMO_SADE,
+    ],
+)
+def test_pygmo_algorithms_rosenbrock_minimization(optimization_method):
+    problem_dimension = 3
+    solver_settings = PygmoAlgorithmSettings(
+        gen=500,
+        popsize=30,
+        seed=seed,
+        early_stopping=EarlyStoppingSettings(stall_generations=50),
+        record_telemetry=True,
+    )
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=optimization_method,
+        solver_args=solver_settings,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+    assert evaluations_to_target(solution.telemetry, np.inf) == solution.telemetry[0].evaluations
+    assert evaluations_to_target(solution.telemetry, -1.0) is None
+
+
+@pytest.mark.parametrize("parallel_execution", [False, True])
+def test_pygmo_cmaes_batch_evaluation(parallel_execution):
+    problem_dimension = 3
+    solver_settings = PygmoAlgorithmSettings(
+        gen=300,
+        popsize=20,
+        seed=seed,
+        algorithm_options={"sigma0": 0.3, "force_bounds": True},
+        parallel_execution=parallel_execution,
+        archipelago_gen=2,
+    )
+
+    problem = OptimizationProblem(
+        objective_function=f_rosenbrock_population,
+        bounds=problem_dimension * [[-6, 6]],
+        optimization_method=OptimizationMethod.PYGMO_CMAES,
+        solver_args=solver_settings,
+        vectorized=True,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(problem_dimension), rel=1e-3) == solution.x
+
+
+def test_pygmo_algorithm_requires_its_settings():
+    with pytest.raises(ValueError):
+        OptimizationProblem(
+            objective_function=f_rosenbrock,
+            bounds=3 * [[-6, 6]],
+            optimization_method=OptimizationMethod.PYGMO_CMAES,
+            solver_args=PygmoSelfAdaptiveDESettings(gen=10, popsize=10),
+        )
+
+
+@pytest.mark.parametrize(
+    "surrogate_model, batch_size, workers",
+    [
+        (SurrogateModelType.GAUSSIAN_PROCESS, 1, 1),
+        (SurrogateModelType.RADIAL_BASIS_FUNCTION, 1, 1),
+        (SurrogateModelType.RADIAL_BASIS_FUNCTION, 2, 2),
+    ],
+)
+def test_surrogate_rosenbrock_minimization(surrogate_model, batch_size, workers):
+    problem_dimension = 2
+    solver_settings = SurrogateSettings(
+        max_evaluations=60,
+        surrogate_model=surrogate_model,
+        batch_size=batch_size,
+        seed=seed,
+        workers=workers,
+        record_telemetry=True,
+    )
+
+    problem = OptimizationProblem(
+        objective_function=f_shifted_rosenbrock,
+        bounds=problem_dimension * [[-2, 2]],
+        optimization_method=OptimizationMethod.SURROGATE,
+        solver_args=solver_settings,
+        args=[0.0],
+    )
+
+    solution = problem.solve_minimization()
+
+    assert solution.nfev == 60
+    assert solution.fun < 1.0
+    assert solution.population.shape == (60, problem_dimension)
+    assert solution.population_fun[0] == solution.fun
+    assert solution.telemetry[-1].evaluations == 60
+
+
+def test_surrogate_polish_rosenbrock_minimization():
+    problem = OptimizationProblem(
+        objective_function=f_shifted_rosenbrock,
+        bounds=2 * [[-2, 2]],
+        optimization_method=OptimizationMethod.SURROGATE,
+        solver_args=SurrogateSettings(max_evaluations=30, seed=seed, polish=True),
+        args=[0.0],
+        gradient_function=gradient_shifted_rosenbrock,
+    )
+
+    solution = problem.solve_minimization()
+
+    assert pytest.approx(np.ones(2), rel=1e-4) == solution.x
+    assert solution.nfev > 30
+
+
+def test_surrogate_settings_validation():
+    with pytest.raises(ValueError):
+        SurrogateSettings(max_evaluations=0)
+    with pytest.raises(ValueError):
+        SurrogateSettings(number_of_initial_samples=1)
+    with pytest.raises(ValueError):
+        SurrogateSettings(batch_size=0)
+    with pytest.raises(ValueError):
+        SurrogateSettings(exploration=-1.0)
@@ -0,0 +1,258 @@
+import pytest
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from pydemic.models import compartmental
+from pydemic.models import CompartmentalModel, Flow, SEIRPDQ, SEIRQ_DIAG
+from pydemic.models import available_models, get_model, register_model
+
+
+def seirpdq_reference_model(
+    t,
+    X,
+    beta0,
+    beta1,
+    mu0,
+    mu1,
+    gamma_I,
+    gamma_A,
+    gamma_P,
+    d_I,
+    d_P,
+    omega,
+    epsilon_I,
+    rho,
+    eta,
+    sigma,
+    N,
+    t_transition,
+    half_life,
+):
+    """
+    The SEIRPD-Q RHS as written in the post-processing scripts.
+    """
+    S, E, A, I, P, R, D, C, H = X
+    beta = beta0 * np.exp(-beta1 * t)
+    mu = mu0 * np.exp(-mu1 * t)
+    if t >= np.real(t_transition):
+        omega = omega * np.exp(-np.log(2) / half_life * (t - t_transition))
+    S_prime = -beta / N * S * I - mu / N * S * A - omega * S + eta * R
+    E_prime = beta / N * S * I + mu / N * S * A - sigma * E - omega * E
+    A_prime = sigma * (1 - rho) * E - gamma_A * A - omega * A
+    I_prime = sigma * rho * E - gamma_I * I - d_I * I - omega * I - epsilon_I * I
+    P_prime = epsilon_I * I - gamma_P * P - d_P * P
+    R_prime = gamma_A * A + gamma_I * I + gamma_P * P + omega * (S + E + A + I) - eta * R
+    D_prime = d_I * I + d_P * P
+    C_prime = epsilon_I * I
+    H_prime = gamma_P * P
+    return np.array(
+        [S_prime, E_prime, A_prime, I_prime, P_prime, R_prime, D_prime, C_prime, H_prime]
+    )
+
+
+def seirq_diag_reference_model(
+    t,
+    X,
+    beta,
+    gamma_I,
+    theta,
+    p,
+    lamb,
+    sigma,
+    rho,
+    epsilon_A,
+    epsilon_I,
+    gamma_A,
+    gamma_D,
+    d_I,
+    d_D,
+):
+    """
+    The SEIRQ-Diag RHS as written in the UQ scripts.
+    """
+    S, E, I, R, D, A, Q, F = X
+    S_prime = -beta * S * (I + theta * A) - p * S + lamb * Q
+    E_prime = beta * S * (I + theta * A) - sigma * E
+    I_prime = sigma * rho * E - gamma_I * I - d_I * I - epsilon_I * I
+    R_prime = gamma_A * A + gamma_I * I + gamma_D * D
+    D_prime = epsilon_A * A + epsilon_I * I - d_D * D - gamma_D * D
+    A_prime = sigma * (1 - rho) * E - epsilon_A * A - gamma_A * A
+    Q_prime = p * S - lamb * Q
+    F_prime = d_I * I + d_D * D
+    return np.array([S_prime, E_prime, I_prime, R_prime, D_prime, A_prime, Q_prime, F_prime])
+
+
+def complex_step_jacobian(rhs, t, y, parameters):
+    step = 1e-20
+    columns = []
+    for j in range(y.size):
+        y_perturbed = y.astype(np.complex128)
+        y_perturbed[j] += 1j * step
+        columns.append(rhs(t, y_perturbed, *parameters).imag / step)
+    return np.column_stack(columns)
+
+
+@pytest.fixture
+def seirpdq_parameters():
+    return SEIRPDQ.parameter_vector(
+        beta0=0.4, beta1=1e-2, mu0=0.3, mu1=2e-2, eta=1e-3, N=1e6, t_transition=20, half_life=7
+    )
+
+
+@pytest.mark.parametrize("t", [10.0, 35.0])
+def test_seirpdq_rhs_matches_reference(seirpdq_parameters, t):
+    y = np.array([9.9e5, 3e3, 1e3, 2e3, 5e2, 3e3, 10, 6e2, 1e2])
+
+    expected_rhs = seirpdq_reference_model(t, y, *seirpdq_parameters)
+
+    assert pytest.approx(expected_rhs, rel=1e-12) == SEIRPDQ.rhs(t, y, seirpdq_parameters)
+
+
+def test_seirq_diag_rhs_matches_reference():
+    parameters = SEIRQ_DIAG.parameter_vector(beta=2e-7)
+    y = np.array([9.9e5, 3e3, 2e3, 3e3, 5e2, 1e3, 4e3, 10])
+
+    expected_rhs = seirq_diag_reference_model(0.0, y, *parameters)
+
+    assert pytest.approx(expected_rhs, rel=1e-12) == SEIRQ_DIAG.rhs(0.0, y, parameters)
+
+
+@pytest.mark.parametrize("t", [10.0, 35.0])
+def test_seirpdq_analytic_jacobian(seirpdq_parameters, t):
+    y = np.array([9.9e5, 3e3, 1e3, 2e3, 5e2, 3e3, 10, 6e2, 1e2])
+
+    expected_jacobian = complex_step_jacobian(seirpdq_reference_model, t, y, seirpdq_parameters)
+
+    assert pytest.approx(expected_jacobian, rel=1e-12, abs=1e-15) == SEIRPDQ.jacobian(
+        t, y, seirpdq_parameters
+    )
+
+
+@pytest.mark.parametrize("t", [10.0, 35.0])
+def test_seirpdq_analytic_parameter_jacobian(seirpdq_parameters, t):
+    y = np.array([9.9e5, 3e3, 1e3, 2e3, 5e2, 3e3, 10, 6e2, 1e2])
+
+    expected_jacobian = complex_step_jacobian(
+        lambda t, parameters, *args: seirpdq_reference_model(t, y, *parameters),
+        t,
+        seirpdq_parameters,
+        [],
+    )
+
+    assert pytest.approx(expected_jacobian, rel=1e-12, abs=1e-15) == SEIRPDQ.parameter_jacobian(
+        t, y, seirpdq_parameters
+    )
+
+
+def test_seirpdq_ensemble_rhs_matches_rhs(seirpdq_parameters):
+    number_of_realizations = 4
+    parameters = np.tile(seirpdq_parameters, (number_of_realizations, 1))
+    parameters[:, 0] *= np.linspace(0.5, 1.5, number_of_realizations)
+    y = np.array([9.9e5, 3e3, 1e3, 2e3, 5e2, 3e3, 10, 6e2, 1e2])
+    stacked_y = np.tile(y, number_of_realizations)
+
+    stacked_rhs = SEIRPDQ.ensemble_rhs(5.0, stacked_y, parameters)
+
+    for realization in range(number_of_realizations):
+        expected_rhs = SEIRPDQ.rhs(5.0, y, parameters[realization])
+        realization_slice = slice(9 * realization, 9 * (realization + 1))
+        assert pytest.approx(expected_rhs, rel=1e-12) == stacked_rhs[realization_slice]
+
+
+def test_seirpdq_ensemble_jacobian_matches_jacobian(seirpdq_parameters):
+    number_of_realizations = 3
+    parameters = np.tile(seirpdq_parameters, (number_of_realizations, 1))
+    parameters[:, 2] *= np.linspace(0.5, 1.5, number_of_realizations)
+    y = np.array([9.9e5, 3e3, 1e3, 2e3, 5e2, 3e3, 10, 6e2, 1e2])
+
+    blocks = SEIRPDQ.ensemble_jacobian(25.0, np.tile(y, number_of_realizations), parameters)
+
+    assert blocks.shape == (number_of_realizations, 9, 9)
+    for realization in range(number_of_realizations):
+        expected_jacobian = SEIRPDQ.jacobian(25.0, y, parameters[realization])
+        assert pytest.approx(expected_jacobian, rel=1e-12) == blocks[realization]
+        assert np.all(SEIRPDQ.jacobian_sparsity()[expected_jacobian != 0])
+
+
+@pytest.mark.parametrize("method", ["LSODA", "BDF", "Radau"])
+def test_seirpdq_scipy_solve_with_analytic_jacobian(seirpdq_parameters, method):
+    y0 = np.array([1e6 - 850, 500, 200, 100, 50, 0, 0, 50, 0])
+    t_eval = np.linspace(0.0, 60.0, 7)
+
+    solution = SEIRPDQ.solve(y0, (0.0, 60.0), seirpdq_parameters, t_eval=t_eval, method=method)
+    reference_solution = SEIRPDQ.solve(y0, (0.0, 60.0), seirpdq_parameters, t_eval=t_eval)
+
+    assert solution.success
+    assert pytest.approx(reference_solution.y, rel=1e-2, abs=1e-2) == solution.y
+
+
+@pytest.mark.parametrize("method", ["BDF", "Radau"])
+def test_seirpdq_analytic_jacobian_saves_rhs_evaluations(seirpdq_parameters, method, monkeypatch):
+    # SciPy's nfev omits the RHS evaluations of the finite-difference Jacobians, so they are
+    # counted by wrapping the RHS
+    number_of_evaluations = []
+
+    def counted_solve_ivp(fun, **kwargs):
+        def counted_fun(t, y):
+            number_of_evaluations[-1] += 1
+            return fun(t, y)
+
+        number_of_evaluations.append(0)
+        return solve_ivp(counted_fun, **kwargs)
+
+    monkeypatch.setattr(compartmental, "solve_ivp", counted_solve_ivp)
+    y0 = np.array([1e6 - 850, 500, 200, 100, 50, 0, 0, 50, 0])
+
+    solution = SEIRPDQ.solve(y0, (0.0, 200.0), seirpdq_parameters, method=method)
+    finite_difference_solution = SEIRPDQ.solve(
+        y0, (0.0, 200.0), seirpdq_parameters, method=method, jac=None
+    )
+
+    assert solution.success and finite_difference_solution.success
+    analytic_evaluations, finite_difference_evaluations = number_of_evaluations
+    assert analytic_evaluations == solution.nfev
+    assert analytic_evaluations < finite_difference_evaluations
+
+
+def test_model_registry():
+    assert {"seirpdq", "seirq_diag"} <= set(available_models())
+    assert get_model("seirpdq") is SEIRPDQ
+    with pytest.raises(ValueError):
+        get_model("unknown model")
+    with pytest.raises(ValueError):
+        register_model(SEIRPDQ)
+
+
+def test_sir_declaration():
+    sir = CompartmentalModel(
+        name="sir",
+        compartments=("S", "I", "R"),
+        parameters=("beta", "gamma"),
+        flows=(Flow("S", "I", "beta * S * I"), Flow("I", "R", "gamma * I")),
+    )
+    parameters = sir.parameter_vector(beta=0.5, gamma=0.1)
+
+    solution = sir.solve([0.99, 0.01, 0.0], (0.0, 100.0), parameters, t_eval=[0.0, 100.0])
+
+    assert solution.success
+    assert pytest.approx(1.0) == solution.y[:, -1].sum()
+    assert "def rhs(t, y, parameters):" in sir.generate_source("rhs")
+
+
+@pytest.mark.parametrize(
+    "flows",
+    [
+        (Flow("S", "I", "beta * S * I"), Flow("I", "X", "gamma * I")),
+        (Flow("S", "I", "beta * S * I * kappa"),),
+        (Flow("S", "I", "beta * S * I.sum()"),),
+        (Flow("S", "I", "max(beta, S)"),),
+    ],
+)
+def test_invalid_declarations(flows):
+    with pytest.raises(ValueError):
+        CompartmentalModel(
+            name="invalid",
+            compartments=("S", "I", "R"),
+            parameters=("beta", "gamma"),
+            flows=flows,
+        )
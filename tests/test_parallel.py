@@ -0,0 +1,75 @@
+import os
+
+import attr
+import pytest
+
+from pydemic.minimization import PygmoSelfAdaptiveDESettings, ScipyDifferentialEvolutionSettings
+from pydemic.parallel import ExecutionConfig, thread_limits
+
+
+def read_thread_limits(_):
+    return os.environ.get("OMP_NUM_THREADS")
+
+
+@pytest.mark.parametrize(
+    "allocation, expected_allocation",
+    [
+        (dict(outer_workers=4), (4, 8, 1)),
+        (dict(outer_workers=4, threads_per_worker=2), (4, 4, 2)),
+        (dict(inner_workers=8), (4, 8, 1)),
+        (dict(outer_workers=5, inner_workers=3), (5, 3, 2)),
+        (dict(), (32, 1, 1)),
+    ],
+)
+def test_execution_config_allocation(allocation, expected_allocation):
+    config = ExecutionConfig(total_cores=32, **allocation)
+
+    assert (config.outer_workers, config.inner_workers, config.threads_per_worker) == (
+        expected_allocation
+    )
+    assert config.cores_used <= 32
+
+
+def test_invalid_execution_config():
+    with pytest.raises(ValueError):
+        ExecutionConfig(total_cores=8, outer_workers=4, inner_workers=4)
+    with pytest.raises(ValueError):
+        ExecutionConfig(total_cores=8, threads_per_worker=0)
+    with pytest.raises(ValueError):
+        ExecutionConfig(total_cores=0)
+
+
+def test_execution_config_solver_settings():
+    config = ExecutionConfig(total_cores=16, outer_workers=4, inner_workers=2)
+
+    scipy_settings = config.configure_solver(
+        ScipyDifferentialEvolutionSettings(number_of_decision_variables=2, workers=-1)
+    )
+    pygmo_settings = config.configure_solver(
+        PygmoSelfAdaptiveDESettings(gen=10, popsize=10, parallel_execution=True)
+    )
+
+    assert scipy_settings.workers == 2
+    assert pygmo_settings.number_of_islands == 4
+    assert pygmo_settings.batch_evaluation_workers == 2
+    assert attr.evolve(pygmo_settings, parallel_execution=False).gen == 10
+    assert config.smc_sampler_kwargs() == dict(parallel=True, cores=4)
+
+
+def test_thread_limits():
+    previous_limit = os.environ.get("OMP_NUM_THREADS")
+
+    with thread_limits(1):
+        assert os.environ["OMP_NUM_THREADS"] == "1"
+        assert os.environ["OPENBLAS_NUM_THREADS"] == "1"
+
+    assert os.environ.get("OMP_NUM_THREADS") == previous_limit
+
+
+def test_worker_pool_thread_limits():
+    config = ExecutionConfig(total_cores=2, outer_workers=1, inner_workers=2)
+
+    with config.worker_pool() as worker_pool:
+        limits = worker_pool.map(read_thread_limits, range(2))
+
+    assert limits == ["1", "1"]
@@ -0,0 +1,74 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from pydemic.posterior import PosteriorSamples, load_posterior_samples
+
+seed = 123
+parameter_names = ["beta", "omega", "d_I", "E0"]
+
+
+@pytest.fixture
+def posterior_samples():
+    random_state = np.random.RandomState(seed)
+    return PosteriorSamples(
+        samples=pd.DataFrame(random_state.lognormal(size=(50, 4)), columns=parameter_names),
+        model_name="SEIRPDQ",
+        chain=np.repeat([0, 1], 25),
+        stage=np.tile(np.arange(5), 10),
+        metadata=dict(bounds=dict(beta=[0.0, 2.0])),
+    )
+
+
+@pytest.mark.parametrize("file_format", ["npz", "parquet", "feather"])
+def test_posterior_samples(tmp_path, posterior_samples, file_format):
+    if file_format != "npz":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"calibration_realizations.{file_format}")
+    posterior_samples.save(path)
+
+    loaded_samples = load_posterior_samples(path)
+
+    assert loaded_samples.model_name == "SEIRPDQ"
+    assert loaded_samples.metadata == posterior_samples.metadata
+    assert loaded_samples.parameter_names == parameter_names
+    assert np.all(loaded_samples.to_matrix() == posterior_samples.to_matrix())
+    assert np.all(loaded_samples.chain == posterior_samples.chain)
+    assert np.all(loaded_samples.stage == posterior_samples.stage)
+
+    loaded_samples = load_posterior_samples(path, parameter_names=["E0", "beta"])
+
+    assert loaded_samples.parameter_names == ["E0", "beta"]
+    assert loaded_samples.samples.dtypes.tolist() == [np.float64, np.float64]
+    assert np.all(loaded_samples.to_matrix() == posterior_samples.to_matrix(["E0", "beta"]))
+
+
+def test_csv_posterior_samples(tmp_path, posterior_samples):
+    path = str(tmp_path / "calibration_realizations.csv")
+    posterior_samples.save(path)
+
+    loaded_samples = load_posterior_samples(path, parameter_names=["omega"])
+
+    assert loaded_samples.model_name is None
+    assert np.all(loaded_samples.to_matrix() == posterior_samples.to_matrix(["omega"]))
+    assert np.all(loaded_samples.stage == posterior_samples.stage)
+
+    posterior_samples.samples.to_csv(path)
+    loaded_samples = load_posterior_samples(path)
+
+    assert loaded_samples.parameter_names == parameter_names
+    assert loaded_samples.chain is None
+    assert pytest.approx(posterior_samples.to_matrix()) == loaded_samples.to_matrix()
+
+
+def test_invalid_posterior_samples(tmp_path, posterior_samples):
+    with pytest.raises(ValueError):
+        posterior_samples.save(str(tmp_path / "calibration_realizations.txt"))
+    with pytest.raises(ValueError):
+        posterior_samples.to_matrix(["gamma"])
+    path = str(tmp_path / "calibration_realizations.npz")
+    posterior_samples.save(path)
+    with pytest.raises(ValueError):
+        load_posterior_samples(path, parameter_names=["gamma"])
+    with pytest.raises(ValueError):
+        PosteriorSamples(samples=pd.DataFrame({"_chain": [1.0]})).save(path)
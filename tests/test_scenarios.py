@@ -0,0 +1,104 @@
+import pytest
+import numpy as np
+
+from pydemic.models import SEIRPDQ
+from pydemic.parallel import WorkerPool
+from pydemic.scenarios import scenario_grid, solve_scenarios
+
+seed = 123
+solver_settings = dict(method="LSODA", rtol=1e-8, atol=1e-12)
+
+
+@pytest.fixture
+def parameters():
+    random_state = np.random.RandomState(seed)
+    number_of_realizations = 6
+    return SEIRPDQ.parameter_matrix(
+        number_of_realizations,
+        beta0=random_state.uniform(0.3, 0.5, number_of_realizations),
+        mu0=random_state.uniform(0.2, 0.4, number_of_realizations),
+        omega=random_state.uniform(0.01, 0.05, number_of_realizations),
+    )
+
+
+@pytest.fixture
+def y0():
+    y0 = np.zeros(SEIRPDQ.number_of_compartments)
+    y0[:2] = [1.0 - 1e-4, 1e-4]
+    return y0
+
+
+def solve_scenarios_one_by_one(parameters, y0, t_span, t_eval, scenarios):
+    trajectories = []
+    for _, scenario in scenarios.iterrows():
+        scenario_parameters = parameters.copy()
+        for name, value in scenario.items():
+            scenario_parameters[:, SEIRPDQ.parameters.index(name)] = value
+        solution = SEIRPDQ.solve_ensemble(
+            scenario_parameters, y0, t_span, t_eval, **solver_settings
+        )
+        trajectories.append(solution.y)
+    return np.array(trajectories)
+
+
+@pytest.mark.parametrize("use_worker_pool", [False, True])
+def test_solve_scenarios(parameters, y0, use_worker_pool):
+    t_eval = np.linspace(5.0, 100.0, 39)
+    scenarios = scenario_grid(t_transition=[-10.0, 30.0, 42.0, np.inf], half_life=[7.0, 28.0])
+
+    if use_worker_pool:
+        with WorkerPool(number_of_workers=2) as worker_pool:
+            solution = solve_scenarios(
+                SEIRPDQ,
+                parameters,
+                y0,
+                (0.0, 100.0),
+                t_eval,
+                scenarios,
+                worker_pool=worker_pool,
+                **solver_settings,
+            )
+    else:
+        solution = solve_scenarios(
+            SEIRPDQ, parameters, y0, (0.0, 100.0), t_eval, scenarios, **solver_settings
+        )
+
+    expected_trajectories = solve_scenarios_one_by_one(
+        parameters, y0, (0.0, 100.0), t_eval, scenarios
+    )
+    assert solution.success
+    assert solution.number_of_scenarios == 8
+    assert pytest.approx(t_eval) == solution.t
+    assert pytest.approx(expected_trajectories, rel=1e-5, abs=1e-9) == solution.y
+    assert pytest.approx(expected_trajectories[3, :, 6], rel=1e-5, abs=1e-9) == (
+        solution.get_scenario(3).get_compartment("D")
+    )
+    assert solution.get_compartment("D").shape == (8, 6, 39)
+    # The scenarios only differ after the transition
+    assert np.all(solution.y[2, :, :, t_eval < 30.0] == solution.y[7, :, :, t_eval < 30.0])
+
+
+def test_solve_scenarios_without_divergence_time(parameters, y0):
+    t_eval = np.linspace(0.0, 60.0, 13)
+    scenarios = dict(omega=[0.0, 0.1], half_life=[14.0])
+    parameters[:, SEIRPDQ.parameters.index("t_transition")] = 20.0
+
+    solution = solve_scenarios(
+        SEIRPDQ, parameters, y0, (0.0, 60.0), t_eval, scenarios, **solver_settings
+    )
+
+    expected_trajectories = solve_scenarios_one_by_one(
+        parameters, y0, (0.0, 60.0), t_eval, scenario_grid(**scenarios)
+    )
+    assert list(solution.scenarios.columns) == ["omega", "half_life"]
+    assert pytest.approx(expected_trajectories, rel=1e-5, abs=1e-9) == solution.y
+
+
+def test_invalid_scenarios(parameters, y0):
+    t_eval = np.linspace(0.0, 60.0, 13)
+    with pytest.raises(ValueError):
+        solve_scenarios(SEIRPDQ, parameters, y0, (0.0, 60.0), t_eval, dict(kappa=[1.0]))
+    with pytest.raises(ValueError):
+        solve_scenarios(SEIRPDQ, parameters, y0, (0.0, 50.0), t_eval, dict(half_life=[1.0]))
+    with pytest.raises(ValueError):
+        solve_scenarios(SEIRPDQ, parameters, y0[:, np.newaxis], (0.0, 60.0), t_eval, dict())
@@ -0,0 +1,190 @@
+import pytest
+import numpy as np
+from scipy.optimize import minimize
+
+from pydemic.models import SEIRPDQ
+from pydemic.sensitivity import GradientMode, LeastSquaresObjective
+
+N = 1e6
+fixed_parameters = dict(
+    beta1=1e-2, mu1=2e-2, omega=1e-2, eta=1e-3, N=N, t_transition=20, half_life=7
+)
+y0 = np.array([N - 850, 500, 200, 100, 50, 0, 0, 50, 0])
+t_eval = np.linspace(0.0, 60.0, 61)
+
+
+def test_seirpdq_sensitivities_match_finite_differences():
+    parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+    sensitivity_parameters = ("beta0", "omega", "epsilon_I", "half_life")
+
+    solution = SEIRPDQ.solve_sensitivities(
+        y0,
+        (0.0, 60.0),
+        parameters,
+        sensitivity_parameters,
+        t_eval=t_eval,
+        rtol=1e-12,
+        atol=1e-10,
+    )
+
+    assert solution.success
+    assert solution.sensitivities.shape == (9, len(sensitivity_parameters), t_eval.size)
+    for j, parameter_name in enumerate(sensitivity_parameters):
+        index = SEIRPDQ.parameters.index(parameter_name)
+        step = 1e-4 * parameters[index]
+        forward_parameters, backward_parameters = parameters.copy(), parameters.copy()
+        forward_parameters[index] += step
+        backward_parameters[index] -= step
+        forward_solution, backward_solution = [
+            SEIRPDQ.solve(y0, (0.0, 60.0), p, t_eval=t_eval, rtol=1e-13, atol=1e-10)
+            for p in (forward_parameters, backward_parameters)
+        ]
+        expected_sensitivities = (forward_solution.y - backward_solution.y) / (2 * step)
+        scale = np.abs(expected_sensitivities).max()
+        assert pytest.approx(expected_sensitivities, abs=1e-5 * scale) == (
+            solution.sensitivities[:, j]
+        )
+
+
+def test_initial_sensitivities():
+    parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+
+    # t_transition does not affect the RHS before the transition, so its sensitivities only
+    # propagate the initial ones, i.e. the sensitivities with respect to E0
+    solution = SEIRPDQ.solve_sensitivities(
+        y0,
+        (0.0, 10.0),
+        parameters,
+        ("t_transition",),
+        initial_sensitivities=np.eye(9)[:, [1]],
+        rtol=1e-12,
+        atol=1e-10,
+    )
+    step = 1.0
+    perturbed_solution = SEIRPDQ.solve(
+        y0 + step * np.eye(9)[1], (0.0, 10.0), parameters, rtol=1e-12, atol=1e-10
+    )
+    reference_solution = SEIRPDQ.solve(y0, (0.0, 10.0), parameters, rtol=1e-12, atol=1e-10)
+
+    expected_sensitivities = (perturbed_solution.y - reference_solution.y) / step
+    assert pytest.approx(expected_sensitivities[:, -1], rel=1e-3, abs=1e-3) == (
+        solution.sensitivities[:, 0, -1]
+    )
+
+    with pytest.raises(ValueError):
+        SEIRPDQ.solve_sensitivities(
+            y0, (0.0, 10.0), parameters, ("beta0",), initial_sensitivities=np.eye(8)
+        )
+    with pytest.raises(ValueError):
+        SEIRPDQ.solve_sensitivities(y0, (0.0, 10.0), parameters, ("kappa",))
+
+
+def test_least_squares_objective_gradient_calibration():
+    true_parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+    observations = SEIRPDQ.solve(y0, (0.0, 60.0), true_parameters, t_eval=t_eval).y[[6, 7]]
+    objective = LeastSquaresObjective(
+        SEIRPDQ,
+        y0,
+        t_eval,
+        observations,
+        observed_compartments=("D", "C"),
+        calibrated_parameters=("beta0", "mu0"),
+        fixed_parameters=fixed_parameters,
+    )
+    x = np.array([0.35, 0.25])
+
+    value, gradient = objective.value_and_gradient(x)
+
+    step = 1e-6
+    expected_gradient = [
+        (objective(x + step * e) - objective(x - step * e)) / (2 * step) for e in np.eye(2)
+    ]
+    assert value == objective(x)
+    assert pytest.approx(expected_gradient, rel=1e-4) == gradient
+
+    result = minimize(
+        objective.value_and_gradient, x, jac=True, method="L-BFGS-B", bounds=[(0.1, 1.0)] * 2
+    )
+    assert pytest.approx([0.4, 0.3], rel=1e-3) == result.x
+
+
+def test_adjoint_gradient_matches_forward_gradient():
+    true_parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+    observations = SEIRPDQ.solve(y0, (0.0, 60.0), true_parameters, t_eval=t_eval).y[[6, 7]]
+    calibrated_parameters = ("beta0", "mu0", "gamma_I", "omega", "epsilon_I", "d_P")
+    x = np.array([0.35, 0.25, 0.6, 1.2e-2, 0.3, 0.25, 400, 250, 90])
+
+    gradients = []
+    for gradient_mode in GradientMode:
+        objective = LeastSquaresObjective(
+            SEIRPDQ,
+            y0,
+            t_eval,
+            observations,
+            observed_compartments=("D", "C"),
+            calibrated_parameters=calibrated_parameters,
+            fixed_parameters={
+                name: value
+                for name, value in fixed_parameters.items()
+                if name not in calibrated_parameters
+            },
+            calibrated_initial_conditions=("E", "A", "I"),
+            conserved_compartment="S",
+            gradient_mode=gradient_mode,
+            rtol=1e-10,
+        )
+        gradients.append(objective.gradient(x))
+
+    forward_gradient, adjoint_gradient = gradients
+    assert pytest.approx(forward_gradient, rel=1e-6) == adjoint_gradient
+
+
+def test_least_squares_objective_population_evaluation():
+    true_parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+    observations = SEIRPDQ.solve(y0, (0.0, 60.0), true_parameters, t_eval=t_eval).y[[6, 7]]
+    objective = LeastSquaresObjective(
+        SEIRPDQ,
+        y0,
+        t_eval,
+        observations,
+        observed_compartments=("D", "C"),
+        calibrated_parameters=("beta0", "mu0"),
+        fixed_parameters=fixed_parameters,
+        calibrated_initial_conditions=("E",),
+        conserved_compartment="S",
+    )
+    random_state = np.random.RandomState(123)
+    population = np.column_stack(
+        (
+            random_state.uniform(0.2, 0.6, 6),
+            random_state.uniform(0.2, 0.6, 6),
+            random_state.uniform(100, 1000, 6),
+        )
+    )
+
+    values = objective.evaluate_population(population)
+
+    expected_values = [objective(x) for x in population]
+    assert pytest.approx(expected_values, rel=1e-4) == values
+
+
+def test_least_squares_objective_population_evaluation_with_failed_candidate():
+    true_parameters = SEIRPDQ.parameter_vector(beta0=0.4, mu0=0.3, **fixed_parameters)
+    observations = SEIRPDQ.solve(y0, (0.0, 60.0), true_parameters, t_eval=t_eval).y[[6, 7]]
+    objective = LeastSquaresObjective(
+        SEIRPDQ,
+        y0,
+        t_eval,
+        observations,
+        observed_compartments=("D", "C"),
+        calibrated_parameters=("beta0", "gamma_I"),
+        fixed_parameters=dict(fixed_parameters, mu0=0.3),
+    )
+    # A negative recovery rate makes the integration of the last candidate fail
+    population = np.array([[0.4, 1 / 14], [0.41, 1 / 14], [0.4, -3.0]])
+
+    values = objective.evaluate_population(population)
+
+    expected_values = [objective(x) for x in population]
+    assert expected_values[2] == objective.failure_value
+    assert pytest.approx(expected_values, rel=1e-2) == values
@@ -0,0 +1,104 @@
+import pytest
+import numpy as np
+
+from pydemic.ensemble import EnsembleSolution
+from pydemic.store import EnsembleStore
+from pydemic.summary import summarize_ensemble
+
+seed = 123
+compartments = ("S", "I", "R", "D")
+
+
+@pytest.fixture
+def trajectories():
+    random_state = np.random.RandomState(seed)
+    return random_state.lognormal(size=(30, len(compartments), 21))
+
+
+@pytest.fixture
+def t():
+    return np.linspace(0.0, 10.0, 21)
+
+
+def test_ensemble_store(tmp_path, t, trajectories):
+    path = str(tmp_path / "ensemble")
+    with EnsembleStore.create(
+        path, t, compartments, number_of_realizations=40, metadata=dict(model="SIRD")
+    ) as store:
+        store.append(trajectories[0])
+        store.append(trajectories[1:10])
+        store.append(EnsembleSolution(t=t, y=trajectories[10:], compartments=compartments))
+        assert store.number_of_written_realizations == 30
+
+    store = EnsembleStore.open(path)
+
+    assert store.number_of_realizations == 40
+    assert store.number_of_written_realizations == 30
+    assert store.metadata == dict(model="SIRD")
+    assert store.compartments == compartments
+    assert pytest.approx(t) == store.t
+    assert np.all(store.read() == trajectories)
+    assert np.all(store.read("I", t_start=2.0, t_end=4.0) == trajectories[:, 1, 4:9])
+    assert np.all(store.read(["R", "S"]) == trajectories[:, [2, 0]])
+    assert np.all(store.read(["I", "R"], realizations=slice(5, 8)) == trajectories[5:8, 1:3])
+    with pytest.raises(ValueError):
+        store.read()[0, 0, 0] = 1.0
+
+    expected_summary = summarize_ensemble(
+        trajectories[:, :, 10:], t=t[10:], compartments=compartments, hdi_probabilities=(0.9,)
+    )
+    summary = store.summarize(t_start=5.0, hdi_probabilities=(0.9,))
+    assert summary.compartments == compartments
+    assert pytest.approx(expected_summary.quantile_values) == summary.quantile_values
+    assert pytest.approx(expected_summary.hdi) == summary.hdi
+    summary = store.summarize(["D", "I"], t_start=5.0, hdi_probabilities=(0.9,))
+    assert summary.compartments == ("D", "I")
+    assert pytest.approx(expected_summary.get_quantile("I", 0.5)) == summary.get_quantile("I", 0.5)
+    assert pytest.approx(expected_summary.get_mean("D")) == summary.get_mean("D")
+    assert pytest.approx(np.array(expected_summary.get_hdi("D", 0.9))) == np.array(
+        summary.get_hdi("D", 0.9)
+    )
+
+
+def test_append_to_ensemble_store(tmp_path, t, trajectories):
+    path = str(tmp_path / "ensemble")
+    store = EnsembleStore.create(path, t, compartments, number_of_realizations=30, dtype=np.float32)
+    store.append(trajectories[:20])
+    store.close()
+
+    with EnsembleStore.open(path, mode="r+") as store:
+        assert store.number_of_written_realizations == 20
+        store.append(trajectories[20:])
+        with pytest.raises(ValueError, match="full"):
+            store.append(trajectories[0])
+
+    store = EnsembleStore.open(path)
+    assert store.read().dtype == np.float32
+    assert pytest.approx(trajectories, rel=1e-6) == store.read()
+
+
+def test_unflushed_realizations_are_not_read(tmp_path, t, trajectories):
+    path = str(tmp_path / "ensemble")
+    store = EnsembleStore.create(path, t, compartments, number_of_realizations=30)
+    store.append(trajectories[:10])
+    store.flush()
+    store.append(trajectories[10:])
+
+    assert EnsembleStore.open(path).read().shape == (10, len(compartments), len(t))
+
+
+def test_invalid_ensemble_store(tmp_path, t, trajectories):
+    path = str(tmp_path / "ensemble")
+    with pytest.raises(ValueError):
+        EnsembleStore.create(path, t, compartments, number_of_realizations=0)
+    store = EnsembleStore.create(path, t, compartments, number_of_realizations=30)
+    with pytest.raises(ValueError):
+        EnsembleStore.create(path, t, compartments, number_of_realizations=30)
+    with pytest.raises(ValueError):
+        store.append(trajectories[:, :3])
+    with pytest.raises(ValueError):
+        store.read("E")
+    with pytest.raises(ValueError):
+        store.read(t_start=20.0)
+    with pytest.raises(ValueError):
+        EnsembleStore.open(path, mode="w+")
@@ -0,0 +1,181 @@
+import pytest
+import numpy as np
+
+from pydemic.ensemble import EnsembleSolution
+from pydemic.summary import StreamingEnsembleSummary, summarize_ensemble
+
+seed = 123
+
+
+@pytest.fixture
+def trajectories():
+    random_state = np.random.RandomState(seed)
+    return random_state.lognormal(size=(201, 3, 40))
+
+
+def reference_hdi(values, probability):
+    sorted_values = np.sort(values)
+    interval_length = int(np.floor(probability * len(values)))
+    widths = sorted_values[interval_length:] - sorted_values[: len(values) - interval_length]
+    start = np.argmin(widths)
+    return sorted_values[start], sorted_values[start + interval_length]
+
+
+@pytest.mark.parametrize("hdi_probabilities", [(), (0.5, 0.95)])
+@pytest.mark.parametrize("chunk_size, number_of_threads", [(None, 1), (7, 1), (7, 3)])
+def test_summarize_ensemble(trajectories, hdi_probabilities, chunk_size, number_of_threads):
+    quantiles = (0.0, 0.025, 0.5, 0.975, 1.0)
+
+    summary = summarize_ensemble(
+        trajectories,
+        compartments=("P", "D", "C"),
+        quantiles=quantiles,
+        hdi_probabilities=hdi_probabilities,
+        chunk_size=chunk_size,
+        number_of_threads=number_of_threads,
+    )
+
+    expected_quantiles = np.percentile(trajectories, 100 * np.array(quantiles), axis=0)
+    assert pytest.approx(expected_quantiles, rel=1e-12) == summary.quantile_values
+    assert pytest.approx(trajectories.mean(axis=0), rel=1e-12) == summary.mean
+    assert pytest.approx(expected_quantiles[2, 1]) == summary.get_quantile("D", 0.5)
+    for probability in hdi_probabilities:
+        lower, upper = summary.get_hdi("C", probability)
+        expected_hdi = [reference_hdi(trajectories[:, 2, i], probability) for i in range(40)]
+        assert pytest.approx(np.array(expected_hdi).T) == np.array([lower, upper])
+        assert np.all(
+            upper - lower <= summary.get_quantile("C", 1.0) - summary.get_quantile("C", 0.0)
+        )
+
+
+def test_summarize_ensemble_solution_with_nan(trajectories):
+    trajectories = trajectories.copy()
+    trajectories[3, 1, 30:] = np.nan
+    t = np.linspace(0.0, 39.0, 40)
+    ensemble_solution = EnsembleSolution(t=t, y=trajectories, compartments=("P", "D", "C"))
+
+    summary = summarize_ensemble(ensemble_solution, hdi_probabilities=(0.95,))
+
+    assert summary.compartments == ("P", "D", "C")
+    assert summary.number_of_realizations == 201
+    assert np.all(np.isnan(summary.get_quantile("D", 0.5)[30:]))
+    assert np.all(np.isnan(summary.get_hdi("D", 0.95)[0][30:]))
+    assert np.all(np.isnan(summary.get_mean("D")[30:]))
+    assert not np.any(np.isnan(summary.get_quantile("D", 0.5)[:30]))
+    assert not np.any(np.isnan(summary.get_quantile("C", 0.5)))
+
+    frame = summary.to_frame()
+    assert list(frame.columns) == [
+        "compartment",
+        "t",
+        "mean",
+        "quantile_0.025",
+        "quantile_0.5",
+        "quantile_0.975",
+        "hdi_0.95_lower",
+        "hdi_0.95_upper",
+    ]
+    assert len(frame) == 3 * 40
+    p_rows = frame[frame.compartment == "P"]
+    assert pytest.approx(t) == p_rows.t.values
+    assert pytest.approx(summary.get_quantile("P", 0.975)) == p_rows["quantile_0.975"].values
+
+
+def test_summarize_single_compartment(trajectories):
+    summary = summarize_ensemble(trajectories[:, 0, :], quantiles=(0.5,))
+
+    assert summary.compartments == ("X0",)
+    assert pytest.approx(np.median(trajectories[:, 0, :], axis=0)) == summary.get_quantile(
+        "X0", 0.5
+    )
+
+
+def test_invalid_summaries(trajectories):
+    with pytest.raises(ValueError):
+        summarize_ensemble(trajectories, quantiles=(1.5,))
+    with pytest.raises(ValueError):
+        summarize_ensemble(trajectories, hdi_probabilities=(1.0,))
+    with pytest.raises(ValueError):
+        summarize_ensemble(trajectories, compartments=("P",))
+    with pytest.raises(ValueError):
+        summarize_ensemble(trajectories, chunk_size=0)
+    summary = summarize_ensemble(trajectories)
+    with pytest.raises(ValueError):
+        summary.get_quantile("X0", 0.1)
+    with pytest.raises(ValueError):
+        summary.get_mean("unknown")
+
+
+def test_streaming_summary_is_exact_within_buffer(trajectories):
+    quantiles = (0.0, 0.025, 0.5, 0.975, 1.0)
+    streaming_summary = StreamingEnsembleSummary(
+        t=np.arange(40.0), compartments=("P", "D", "C"), quantiles=quantiles, buffer_size=500
+    )
+    streaming_summary.add(trajectories[:100])
+    for trajectory in trajectories[100:]:
+        streaming_summary.add(trajectory)
+
+    summary = streaming_summary.summary()
+
+    expected_summary = summarize_ensemble(trajectories, quantiles=quantiles)
+    assert summary.number_of_realizations == 201
+    assert pytest.approx(expected_summary.quantile_values, rel=1e-12) == summary.quantile_values
+    assert pytest.approx(expected_summary.mean, rel=1e-12) == summary.mean
+
+
+@pytest.mark.parametrize("number_of_parts", [1, 4])
+def test_streaming_summary_rank_error(number_of_parts):
+    random_state = np.random.RandomState(seed)
+    trajectories = random_state.lognormal(size=(4000, 2, 10))
+    quantiles = (0.0, 0.025, 0.5, 0.975, 1.0)
+    compression = 100
+    parts = [
+        StreamingEnsembleSummary(
+            t=np.arange(10.0), compartments=("D", "C"), quantiles=quantiles, buffer_size=50
+        )
+        for _ in range(number_of_parts)
+    ]
+    for index, trajectory in enumerate(trajectories):
+        parts[index % number_of_parts].add(trajectory)
+    streaming_summary = parts[0]
+    for part in parts[1:]:
+        streaming_summary.merge(part)
+
+    summary = streaming_summary.summary()
+
+    assert summary.number_of_realizations == 4000
+    assert pytest.approx(trajectories.mean(axis=0), rel=1e-12) == summary.mean
+    assert np.all(summary.get_quantile("C", 0.0) == trajectories[:, 1].min(axis=0))
+    assert np.all(summary.get_quantile("C", 1.0) == trajectories[:, 1].max(axis=0))
+    for index, quantile in enumerate(quantiles):
+        ranks = (trajectories <= summary.quantile_values[index]).mean(axis=0)
+        rank_error = 1.6 / compression * 2.0 * np.sqrt(quantile * (1.0 - quantile)) + 1e-3
+        assert np.all(np.abs(ranks - quantile) <= rank_error)
+
+
+def test_streaming_summary_with_nan():
+    streaming_summary = StreamingEnsembleSummary(t=np.arange(3.0), compartments=("C",))
+    for value in range(10):
+        streaming_summary.add(np.array([value, np.nan if value == 4 else value, value]))
+
+    summary = streaming_summary.summary()
+
+    assert pytest.approx([4.5, 4.5]) == summary.get_quantile("C", 0.5)[[0, 2]]
+    assert np.isnan(summary.get_quantile("C", 0.5)[1])
+    assert np.isnan(summary.get_mean("C")[1])
+
+
+def test_invalid_streaming_summaries(trajectories):
+    with pytest.raises(ValueError):
+        StreamingEnsembleSummary(t=np.arange(40.0), compartments=("C",), quantiles=(-0.1,))
+    with pytest.raises(ValueError):
+        StreamingEnsembleSummary(t=np.arange(40.0), compartments=("C",), compression=2)
+    streaming_summary = StreamingEnsembleSummary(t=np.arange(40.0), compartments=("P", "D"))
+    with pytest.raises(ValueError):
+        streaming_summary.summary()
+    with pytest.raises(ValueError):
+        streaming_summary.add(trajectories)
+    with pytest.raises(ValueError):
+        streaming_summary.merge(
+            StreamingEnsembleSummary(t=np.arange(40.0), compartments=("P", "D", "C"))
+        )
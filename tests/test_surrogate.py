@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+
+from pydemic.surrogate import GaussianProcessSurrogate, RadialBasisFunctionSurrogate
+from pydemic.surrogate import SurrogateModelType, create_surrogate, expected_improvement
+from pydemic.surrogate import propose_points
+
+
+def f_sphere(X):
+    return np.sum((np.atleast_2d(X) - 0.25) ** 2, axis=1)
+
+
+@pytest.fixture
+def training_points():
+    random_state = np.random.RandomState(17)
+    X = random_state.uniform(-1.0, 1.0, size=(25, 2))
+    return X, f_sphere(X)
+
+
+def test_gaussian_process_interpolates_training_points(training_points):
+    X, y = training_points
+    capped_y = np.minimum(y, np.median(y))
+    surrogate = GaussianProcessSurrogate(bounds=2 * [[-1, 1]])
+
+    surrogate.fit(X, y)
+    mean, std = surrogate.predict(X)
+
+    assert pytest.approx(capped_y, abs=1e-2) == mean
+    assert np.all(std < 1e-1)
+    assert np.all(surrogate.predict(np.array([[0.9, -0.9]]))[1] >= 0)
+
+
+def test_radial_basis_function_interpolates_training_points(training_points):
+    X, y = training_points
+    capped_y = np.minimum(y, np.median(y))
+    surrogate = create_surrogate(SurrogateModelType.RADIAL_BASIS_FUNCTION, 2 * [[-1, 1]])
+
+    surrogate.fit(X, y)
+    values, std = surrogate.predict(X)
+
+    assert isinstance(surrogate, RadialBasisFunctionSurrogate)
+    assert pytest.approx(capped_y, abs=1e-8) == values
+    assert std is None
+
+
+def test_expected_improvement():
+    improvement = expected_improvement(
+        mean=np.array([0.0, 1.0, 1.0, 2.0]), std=np.array([1.0, 1.0, 2.0, 0.0]), best_value=1.0
+    )
+
+    assert np.all(improvement >= 0)
+    assert improvement[0] > improvement[1]
+    assert improvement[2] > improvement[1]
+    assert improvement[3] == pytest.approx(0.0)
+
+
+@pytest.mark.parametrize("surrogate_model", list(SurrogateModelType))
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_propose_points(training_points, surrogate_model, batch_size):
+    X, y = training_points
+    bounds = 2 * [[-1, 1]]
+    surrogate = create_surrogate(surrogate_model, bounds)
+    surrogate.fit(X, y)
+
+    points = propose_points(
+        surrogate, X, y, bounds, batch_size=batch_size, iteration=3, random_state=3
+    )
+
+    assert points.shape == (batch_size, 2)
+    assert np.all((points >= -1) & (points <= 1))
+    assert len(np.unique(np.vstack([X, points]), axis=0)) == len(X) + batch_size
+    assert np.min(f_sphere(points)) < np.median(y)